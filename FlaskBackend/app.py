@@ -1,20 +1,46 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
-from ping3 import ping
-import mysql.connector
 import os
 from dotenv import load_dotenv
 import requests
-from pysnmp.hlapi import *
 import time
 
 # Import routes
 from routes.devices import devices_bp
+from routes.system import system_bp
+from routes.stream import stream_bp
+
+# Koneksi database dari pool bersama (db.py)
+from db import get_db_connection
 
 # Import services
-from service.network_service import check_devices, get_interface_bandwidth, get_wifi_clients
+from service.network_service import (
+    check_devices,
+    save_check_results,
+    publish_check_results,
+    get_interface_bandwidth,
+    get_wifi_clients,
+    resolve_hc_counters
+)
+from service.sweep_service import sweep
+from service.polling_pipeline import run_pipeline
+from service.metrics_writer import metrics_writer
+from service.sample_window import wifi_client_window
+from service.rollup_service import (
+    RESOLUTIONS,
+    HISTORY_MAX_POINTS,
+    choose_resolution,
+    get_rollup_history
+)
+from service.downsample import AGGREGATIONS, downsample
+from service.retention_service import retention_manager, delete_device_history
+from service.tsdb import tsdb
+from service.dashboard_snapshot import dashboard_snapshot
+from service.event_bus import event_bus
+from service.poll_cache import poll_cache
+from service.job_scheduler import monitoring_scheduler
+from service.check_scheduler import CHECK_TICK, DEFAULT_PING_TIMEOUT, device_check_scheduler
 from service.telegram_service import (
     send_device_down_alert, 
     send_device_up_alert,
@@ -31,87 +57,56 @@ CORS(app)
 
 # Register Blueprints
 app.register_blueprint(devices_bp, url_prefix='/api')
+app.register_blueprint(system_bp, url_prefix='/api')
+app.register_blueprint(stream_bp, url_prefix='/api')
 
-# snmp
-def get_snmp_value(ip, community, oid):
-    try:
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161)),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-
-        if errorIndication:
-            print(f"SNMP error: {errorIndication}")
-            return None
-        elif errorStatus:
-            print(f"SNMP error: {errorStatus.prettyPrint()}")
-            return None
-        else:
-            for varBind in varBinds:
-                return int(varBind[1])
-    except Exception as e:
-        print(f"Error SNMP {ip}: {e}")
-        return None
-
-# --- Koneksi ke Database
-def get_db_connection():
-    conn = mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", ""),
-        database=os.getenv("DB_NAME", "nms_dcc")
-    )
-    return conn
-
-# --- Kirim notifikasi Telegram
-def send_telegram_alert(message):
-    token = os.getenv("TELEGRAM_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    if not token or not chat_id:
-        print("⚠️ Telegram belum dikonfigurasi.")
+# --- Cek status perangkat via ping dengan alert yang lebih baik
+def check_devices_with_alert(deadline=None):
+    # Hanya device yang sudah jatuh tempo sesuai check_interval masing-masing
+    devices = device_check_scheduler.due()
+    if not devices:
         return
+    print(f"[{datetime.now()}] 🔍 Mengecek {len(devices)} perangkat...")
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    data = {"chat_id": chat_id, "text": message}
+    # Hanya hasil yang sudah tersimpan yang dijadwalkan satu interval lagi;
+    # jika sweep atau database gagal, device dicek lagi tick berikutnya
+    checked, changes = {}, []
     try:
-        requests.post(url, data=data)
-        print(f"📢 Notifikasi terkirim: {message}")
-    except Exception as e:
-        print(f"❌ Gagal kirim Telegram: {e}")
-
-# --- Cek status perangkat via ping dengan alert yang lebih baik
-def check_devices_with_alert():
-    print(f"[{datetime.now()}] 🔍 Mengecek perangkat...")
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM devices")
-    devices = cursor.fetchall()
-
-    for device in devices:
-        ip = device['ip_address']
-        old_status = device['status']
-        response = ping(ip, timeout=2)
-        new_status = 'up' if response else 'down'
-
-        cursor.execute(
-            "UPDATE devices SET status=%s, last_checked=%s WHERE id=%s",
-            (new_status, datetime.now(), device['id'])
-        )
-        conn.commit()
-
-        # Send alert only on status change
-        if old_status == 'up' and new_status == 'down':
-            send_device_down_alert(device['name'], ip)
-        elif old_status == 'down' and new_status == 'up':
-            send_device_up_alert(device['name'], ip)
-
-    cursor.close()
-    conn.close()
+        # Satu sweep untuk semua device jatuh tempo, timeout ICMP per device (ping_timeout)
+        timeouts = {device['ip_address']: device['ping_timeout'] for device in devices}
+        if deadline is not None:
+            deadline = max(deadline, max(timeouts.values()) + 0.5)
+        results = sweep(list(timeouts), timeout=DEFAULT_PING_TIMEOUT, deadline=deadline, timeouts=timeouts)
+
+        for device in devices:
+            if device['ip_address'] not in results:
+                print(f"⏱️ {device['name']} ({device['ip_address']}) belum dicek sebelum deadline, status tidak diubah")
+
+        # Semua hasil ditulis dalam satu transaksi per siklus
+        checked_at = datetime.now()
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            saved = save_check_results(cursor, devices, results, checked_at)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        checked, changes = results, saved
+    finally:
+        device_check_scheduler.reschedule(devices, checked, changes)
+
+    # Snapshot dashboard hanya diubah untuk device yang statusnya berubah
+    for device, new_status in changes:
+        dashboard_snapshot.set_status(device['id'], new_status)
+    publish_check_results(devices, results, changes, checked_at)
+
+    # Send alert only on status change
+    for device, new_status in changes:
+        if device['status'] == 'up' and new_status == 'down':
+            send_device_down_alert(device['name'], device['ip_address'], device['id'])
+        elif device['status'] == 'down' and new_status == 'up':
+            send_device_up_alert(device['name'], device['ip_address'], device['id'])
 
 
 # --- Poll data from HTTP API (for fake routers)
@@ -134,8 +129,36 @@ def poll_device_http_api(device):
     return None
 
 
+# --- Ambil bandwidth satu device (HTTP API untuk fake router, fallback SNMP)
+def collect_bandwidth(device, community):
+    http_data = poll_device_http_api(device)
+    if http_data and 'bandwidth_usage' in http_data:
+        bandwidth_data = {
+            'in_mbps': http_data['bandwidth_usage'].get('download_mbps', 0),
+            'out_mbps': http_data['bandwidth_usage'].get('upload_mbps', 0),
+            'total_mbps': http_data['bandwidth_usage'].get('total_mbps', 0),
+            'timestamp': datetime.now().isoformat()
+        }
+        print(f"📊 {device['name']}: {bandwidth_data['total_mbps']} Mbps (HTTP API)")
+        return {
+            'bandwidth': bandwidth_data,
+            'clients': http_data.get('connected_clients'),
+            'interface_index': None
+        }
+    
+    # Fallback to SNMP
+    interface_index = device.get('interface_index') or 2
+    hc_counters = resolve_hc_counters(device, community)
+    bandwidth_data = get_interface_bandwidth(device['ip_address'], community, interface_index, hc_counters=hc_counters)
+    if bandwidth_data:
+        print(f"📊 {device['name']}: {bandwidth_data['total_mbps']} Mbps (SNMP)")
+        return {'bandwidth': bandwidth_data, 'clients': None, 'interface_index': interface_index}
+    
+    return None
+
+
 # --- Monitoring bandwidth untuk semua device
-def monitor_bandwidth():
+def monitor_bandwidth(deadline=None):
     print(f"[{datetime.now()}] 📊 Monitoring bandwidth...")
     
     threshold_high = float(os.getenv('BANDWIDTH_THRESHOLD_HIGH', 80))  # Mbps
@@ -145,74 +168,56 @@ def monitor_bandwidth():
     cursor = conn.cursor(dictionary=True)
     cursor.execute("SELECT * FROM devices WHERE status='up'")
     devices = cursor.fetchall()
+    cursor.close()
+    conn.close()
     
     community = os.getenv('SNMP_COMMUNITY', 'public')
     
-    for device in devices:
-        try:
-            bandwidth_data = None
-            
-            # Try HTTP API first (for fake routers)
-            http_data = poll_device_http_api(device)
-            if http_data and 'bandwidth_usage' in http_data:
-                bandwidth_data = {
-                    'in_mbps': http_data['bandwidth_usage'].get('download_mbps', 0),
-                    'out_mbps': http_data['bandwidth_usage'].get('upload_mbps', 0),
-                    'total_mbps': http_data['bandwidth_usage'].get('total_mbps', 0),
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                # Store WiFi client count if available
-                if 'connected_clients' in http_data:
-                    cursor.execute("""
-                        INSERT INTO wifi_client_history (device_id, client_count, timestamp)
-                        VALUES (%s, %s, %s)
-                    """, (device['id'], http_data['connected_clients'], datetime.now()))
-                
-                print(f"📊 {device['name']}: {bandwidth_data['total_mbps']} Mbps (HTTP API)")
-            
-            # Fallback to SNMP
-            if not bandwidth_data:
-                bandwidth_data = get_interface_bandwidth(device['ip_address'], community)
-                if bandwidth_data:
-                    print(f"📊 {device['name']}: {bandwidth_data['total_mbps']} Mbps (SNMP)")
-            
-            if bandwidth_data:
-                total_mbps = bandwidth_data.get('total_mbps', 0)
-                
-                # Store bandwidth history
-                cursor.execute("""
-                    INSERT INTO bandwidth_history 
-                    (device_id, in_mbps, out_mbps, total_mbps, timestamp)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    device['id'],
-                    bandwidth_data.get('in_mbps', 0),
-                    bandwidth_data.get('out_mbps', 0),
-                    total_mbps,
-                    datetime.now()
-                ))
-                
-                # Check thresholds
-                if total_mbps > threshold_high:
-                    send_bandwidth_alert(
-                        device['name'],
-                        device['ip_address'],
-                        bandwidth_data,
-                        threshold_high
-                    )
-                elif total_mbps < threshold_low and total_mbps > 0:
-                    print(f"⚠️ Low bandwidth detected on {device['name']}: {total_mbps} Mbps")
-        except Exception as e:
-            print(f"❌ Error monitoring {device['name']}: {e}")
+    def write(device, result):
+        bandwidth_data = result['bandwidth']
+        total_mbps = bandwidth_data.get('total_mbps', 0)
+        
+        # Store WiFi client count if available
+        if result['clients'] is not None:
+            metrics_writer.write_wifi_clients(device['id'], result['clients'])
+            wifi_client_window.append(device['id'], result['clients'])
+            poll_cache.put((device['id'], 'wifi_clients'), result['clients'])
+        
+        # Store bandwidth history (ditulis batch oleh metrics writer)
+        interface_index = result['interface_index']
+        if interface_index is None:
+            # Data HTTP API bukan counter interface SNMP, jadi punya key cache sendiri
+            metrics_writer.write_bandwidth(device['id'], bandwidth_data)
+            poll_cache.put((device['id'], 'bandwidth', 'http'), bandwidth_data)
+        else:
+            metrics_writer.write_bandwidth(device['id'], bandwidth_data, interface_index)
+            poll_cache.put((device['id'], 'bandwidth', interface_index), bandwidth_data)
+        
+        # Check thresholds
+        if total_mbps > threshold_high:
+            send_bandwidth_alert(
+                device['name'],
+                device['ip_address'],
+                bandwidth_data,
+                threshold_high,
+                device['id']
+            )
+        elif total_mbps < threshold_low and total_mbps > 0:
+            print(f"⚠️ Low bandwidth detected on {device['name']}: {total_mbps} Mbps")
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # Semua device dipoll paralel, hasil diproses berurutan oleh satu writer
+    run_pipeline(
+        devices,
+        lambda device: collect_bandwidth(device, community),
+        write,
+        target_key=lambda device: device['ip_address'],
+        deadline=deadline,
+        name='Bandwidth'
+    )
 
 
 # --- Monitor WiFi clients
-def monitor_wifi_clients():
+def monitor_wifi_clients(deadline=None):
     print(f"[{datetime.now()}] 📡 Monitoring WiFi clients...")
     
     try:
@@ -220,47 +225,41 @@ def monitor_wifi_clients():
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM devices WHERE device_type='wifi_ap' AND status='up'")
         wifi_devices = cursor.fetchall()
+        cursor.close()
+        conn.close()
         
-        community = os.getenv('SNMP_COMMUNITY', 'public')
+        # No-op jika window sudah di-seed saat startup
+        wifi_client_window.seed()
         
-        for device in wifi_devices:
-            try:
-                # Get WiFi client count
-                clients = get_wifi_clients(device['ip_address'], community)
-                
-                if clients is not None:
-                    # Store client count
-                    cursor.execute("""
-                        INSERT INTO wifi_client_history (device_id, client_count, timestamp)
-                        VALUES (%s, %s, %s)
-                    """, (device['id'], clients, datetime.now()))
-                    conn.commit()
-                    
-                    # Check if client count dropped significantly
-                    cursor.execute("""
-                        SELECT client_count FROM wifi_client_history
-                        WHERE device_id=%s AND timestamp > %s
-                        ORDER BY timestamp DESC LIMIT 5
-                    """, (device['id'], datetime.now() - timedelta(minutes=30)))
-                    
-                    history = cursor.fetchall()
-                    if len(history) > 1:
-                        avg_clients = sum(h['client_count'] for h in history) / len(history)
-                        if clients < avg_clients * 0.5:  # Drop 50%
-                            send_wifi_client_alert(
-                                device['name'],
-                                device['ip_address'],
-                                clients,
-                                int(avg_clients)
-                            )
-                    
-                    print(f"📡 {device['name']}: {clients} clients connected")
-                    
-            except Exception as e:
-                print(f"❌ Error monitoring WiFi on {device['name']}: {e}")
+        community = os.getenv('SNMP_COMMUNITY', 'public')
         
-        cursor.close()
-        conn.close()
+        def write(device, clients):
+            # Store client count
+            metrics_writer.write_wifi_clients(device['id'], clients)
+            wifi_client_window.append(device['id'], clients)
+            poll_cache.put((device['id'], 'wifi_clients'), clients)
+            
+            # Check if client count dropped significantly (5 sampel terakhir dalam 30 menit)
+            avg_clients, samples = wifi_client_window.average(device['id'])
+            if samples > 1 and clients < avg_clients * 0.5:  # Drop 50%
+                send_wifi_client_alert(
+                    device['name'],
+                    device['ip_address'],
+                    clients,
+                    int(avg_clients),
+                    device['id']
+                )
+            
+            print(f"📡 {device['name']}: {clients} clients connected")
+        
+        run_pipeline(
+            wifi_devices,
+            lambda device: get_wifi_clients(device['ip_address'], community),
+            write,
+            target_key=lambda device: device['ip_address'],
+            deadline=deadline,
+            name='WiFi clients'
+        )
         
     except Exception as e:
         print(f"❌ Error in WiFi monitoring: {e}")
@@ -325,60 +324,50 @@ def add_device():
         (name, ip, "unknown", None)
     )
     conn.commit()
+    dashboard_snapshot.set_status(cursor.lastrowid, "unknown")
+    event_bus.publish('devices', {'action': 'added', 'device_id': cursor.lastrowid})
+    device_check_scheduler.invalidate()
     cursor.close()
     conn.close()
     return jsonify({"message": "Device added successfully"}), 201
 
 # --- Ambil data SNMP (trafik jaringan)
-from pysnmp.hlapi import *
-
-def get_snmp_value(ip, community, oid):
-    try:
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161)),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-
-        if errorIndication:
-            print(f"SNMP error: {errorIndication}")
-            return None
-        elif errorStatus:
-            print(f"SNMP error: {errorStatus.prettyPrint()}")
-            return None
-        else:
-            for varBind in varBinds:
-                return int(varBind[1])
-    except Exception as e:
-        print(f"Error SNMP {ip}: {e}")
-        return None
-
 @app.route("/traffic/<ip>", methods=["GET"])
 def get_traffic(ip):
     community = os.getenv("SNMP_COMMUNITY", "public")
 
-    # OID untuk interface pertama (bisa disesuaikan)
-    oid_in = "1.3.6.1.2.1.2.2.1.10.1"  # ifInOctets
-    oid_out = "1.3.6.1.2.1.2.2.1.16.1" # ifOutOctets
+    # Interface pertama (bisa disesuaikan), counter 64-bit jika device mendukung
+    interface_index = 1
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM devices WHERE ip_address=%s", (ip,))
+    device = cursor.fetchone()
+    cursor.close()
+    conn.close()
 
-    in_bytes = get_snmp_value(ip, community, oid_in)
-    out_bytes = get_snmp_value(ip, community, oid_out)
+    # Hanya device terdaftar yang boleh di-poll lewat endpoint ini
+    if not device:
+        return jsonify({"error": "Device not found"}), 404
 
-    if in_bytes is None or out_bytes is None:
-        return jsonify({"error": "Gagal ambil data SNMP"}), 500
+    def fetch():
+        if (device.get('interface_index') or 2) == interface_index:
+            hc_counters = resolve_hc_counters(device, community)
+        else:
+            # devices.hc_counters berlaku untuk interface_index device, bukan interface ini;
+            # deteksi untuk (ip, interface) disimpan di memori saja
+            hc_counters = resolve_hc_counters({'ip_address': ip, 'interface_index': interface_index}, community)
+        return get_interface_bandwidth(ip, community, interface_index, hc_counters=hc_counters)
+
+    bandwidth_data, _ = poll_cache.get((device['id'], 'bandwidth', interface_index), fetch)
 
-    # Konversi ke Mbps
-    in_mbps = round((in_bytes * 8) / (1024*1024), 2)
-    out_mbps = round((out_bytes * 8) / (1024*1024), 2)
+    if bandwidth_data is None:
+        return jsonify({"error": "Gagal ambil data SNMP"}), 500
 
     return jsonify({
         "ip": ip,
-        "in_mbps": in_mbps,
-        "out_mbps": out_mbps,
+        "in_mbps": bandwidth_data['in_mbps'],
+        "out_mbps": bandwidth_data['out_mbps'],
         "timestamp": datetime.now().strftime("%H:%M:%S")
     })
 
@@ -398,6 +387,9 @@ def update_device(id):
         (name, ip, id)
     )
     conn.commit()
+    event_bus.publish('devices', {'action': 'updated', 'device_id': id})
+    device_check_scheduler.invalidate()
+    poll_cache.forget(id)
     cursor.close()
     conn.close()
     return jsonify({"message": "Device updated successfully"})
@@ -407,8 +399,14 @@ def update_device(id):
 def delete_device(id):
     conn = get_db_connection()
     cursor = conn.cursor()
+    delete_device_history(cursor, id)
     cursor.execute("DELETE FROM devices WHERE id=%s", (id,))
     conn.commit()
+    dashboard_snapshot.remove_device(id)
+    event_bus.forget(id)
+    poll_cache.forget(id)
+    event_bus.publish('devices', {'action': 'deleted', 'device_id': id})
+    device_check_scheduler.invalidate()
     cursor.close()
     conn.close()
     return jsonify({"message": "Device deleted successfully"})
@@ -422,21 +420,24 @@ def get_wifi_clients_api(device_id):
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM devices WHERE id=%s AND device_type='wifi_ap'", (device_id,))
         device = cursor.fetchone()
+        cursor.close()
+        conn.close()
         
         if not device:
             return jsonify({"error": "WiFi AP not found"}), 404
         
         community = os.getenv('SNMP_COMMUNITY', 'public')
-        clients = get_wifi_clients(device['ip_address'], community)
-        
-        cursor.close()
-        conn.close()
+        clients, age = poll_cache.get(
+            (device_id, 'wifi_clients'),
+            lambda: get_wifi_clients(device['ip_address'], community)
+        )
         
         if clients is not None:
             return jsonify({
                 "success": True,
                 "device": device,
                 "client_count": clients,
+                "cache_age": age,
                 "timestamp": datetime.now().isoformat()
             })
         else:
@@ -448,26 +449,43 @@ def get_wifi_clients_api(device_id):
 
 @app.route("/api/wifi/history/<int:device_id>", methods=["GET"])
 def get_wifi_history(device_id):
-    """Get WiFi client history for past 24 hours"""
+    """
+    Get WiFi client history for past 24 hours.
+    
+    Query params: hours (default 24), max_points (default HISTORY_MAX_POINTS),
+    agg (lttb|minmax|avg, default lttb) untuk downsampling di server.
+    """
     try:
         hours = request.args.get('hours', 24, type=int)
+        max_points = request.args.get('max_points', HISTORY_MAX_POINTS, type=int)
+        agg = request.args.get('agg', 'lttb')
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        if agg not in AGGREGATIONS:
+            return jsonify({"error": f"Invalid agg: {agg}"}), 400
         
-        cursor.execute("""
-            SELECT * FROM wifi_client_history
-            WHERE device_id=%s AND timestamp > %s
-            ORDER BY timestamp DESC
-        """, (device_id, datetime.now() - timedelta(hours=hours)))
+        since = datetime.now() - timedelta(hours=hours)
+        if tsdb is not None:
+            rows = tsdb.read_rows(device_id, since, table='wifi_client_history')
+        else:
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute("""
+                SELECT * FROM wifi_client_history
+                WHERE device_id=%s AND timestamp > %s
+                ORDER BY timestamp DESC
+            """, (device_id, since))
+            
+            rows = cursor.fetchall()
+            cursor.close()
+            conn.close()
         
-        history = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        history = downsample(rows, max_points, agg, y_key='client_count')
         
         return jsonify({
             "success": True,
             "device_id": device_id,
+            "total_rows": len(rows),
             "count": len(history),
             "history": history
         })
@@ -478,26 +496,59 @@ def get_wifi_history(device_id):
 
 @app.route("/api/bandwidth/history/<int:device_id>", methods=["GET"])
 def get_bandwidth_history(device_id):
-    """Get bandwidth history for device"""
+    """
+    Get bandwidth history for device.
+    
+    Query params: hours (default 24), max_points (default HISTORY_MAX_POINTS),
+    resolution (auto|raw|1m|1h|1d, default auto), agg (lttb|minmax|avg,
+    default lttb). Auto memilih rollup paling detail yang jumlah bucket-nya
+    dalam rentang `hours` muat di max_points; sisa kelebihan baris
+    di-downsample dengan `agg` sebelum dikirim.
+    """
     try:
         hours = request.args.get('hours', 24, type=int)
+        max_points = request.args.get('max_points', HISTORY_MAX_POINTS, type=int)
+        resolution = request.args.get('resolution', 'auto')
+        agg = request.args.get('agg', 'lttb')
+        
+        if agg not in AGGREGATIONS:
+            return jsonify({"error": f"Invalid agg: {agg}"}), 400
+        if resolution == 'auto':
+            resolution = choose_resolution(hours, max_points)
+        elif resolution != 'raw' and resolution not in RESOLUTIONS:
+            return jsonify({"error": f"Invalid resolution: {resolution}"}), 400
+        
+        since = datetime.now() - timedelta(hours=hours)
         
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("""
-            SELECT * FROM bandwidth_history
-            WHERE device_id=%s AND timestamp > %s
-            ORDER BY timestamp DESC
-        """, (device_id, datetime.now() - timedelta(hours=hours)))
+        if resolution == 'raw' and tsdb is not None:
+            rows = tsdb.read_rows(device_id, since)
+        elif resolution == 'raw':
+            cursor.execute("""
+                SELECT * FROM bandwidth_history
+                WHERE device_id=%s AND timestamp > %s
+                ORDER BY timestamp DESC
+            """, (device_id, since))
+            rows = cursor.fetchall()
+        else:
+            rows = get_rollup_history(cursor, device_id, since, resolution)
         
-        history = cursor.fetchall()
         cursor.close()
         conn.close()
         
+        history = downsample(
+            rows, max_points, agg,
+            y_key='total_mbps',
+            fields=('in_mbps', 'out_mbps', 'total_mbps')
+        )
+        
         return jsonify({
             "success": True,
             "device_id": device_id,
+            "resolution": resolution,
+            "total_rows": len(rows),
             "count": len(history),
             "history": history
         })
@@ -508,94 +559,66 @@ def get_bandwidth_history(device_id):
 
 @app.route("/api/dashboard/summary", methods=["GET"])
 def get_dashboard_summary():
-    """Get dashboard summary data"""
+    """
+    Get dashboard summary data dari snapshot di memori (diperbarui oleh job
+    check dan monitoring). Mendukung If-None-Match: 304 jika tidak berubah.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get device stats
-        cursor.execute("SELECT COUNT(*) as total FROM devices")
-        total_devices = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as up FROM devices WHERE status='up'")
-        up_devices = cursor.fetchone()['up']
-        
-        # Get WiFi clients
-        cursor.execute("""
-            SELECT SUM(wch.client_count) as total_clients
-            FROM (
-                SELECT device_id, MAX(timestamp) as max_time
-                FROM wifi_client_history
-                WHERE timestamp > %s
-                GROUP BY device_id
-            ) latest
-            JOIN wifi_client_history wch ON wch.device_id = latest.device_id 
-                AND wch.timestamp = latest.max_time
-        """, (datetime.now() - timedelta(minutes=10),))
-        
-        wifi_result = cursor.fetchone()
-        total_wifi_clients = wifi_result['total_clients'] if wifi_result['total_clients'] else 0
-        
-        # Get recent alerts
-        cursor.execute("""
-            SELECT * FROM alert_history
-            ORDER BY created_at DESC
-            LIMIT 10
-        """)
-        recent_alerts = cursor.fetchall()
-        
-        # Get average bandwidth
-        cursor.execute("""
-            SELECT AVG(total_mbps) as avg_bandwidth
-            FROM bandwidth_history
-            WHERE timestamp > %s
-        """, (datetime.now() - timedelta(hours=1),))
-        
-        bw_result = cursor.fetchone()
-        avg_bandwidth = round(bw_result['avg_bandwidth'], 2) if bw_result['avg_bandwidth'] else 0
-        
-        cursor.close()
-        conn.close()
+        body, etag = dashboard_snapshot.get(app.json.dumps)
         
-        return jsonify({
-            "success": True,
-            "summary": {
-                "total_devices": total_devices,
-                "up_devices": up_devices,
-                "down_devices": total_devices - up_devices,
-                "total_wifi_clients": int(total_wifi_clients),
-                "avg_bandwidth_mbps": avg_bandwidth,
-                "recent_alerts": recent_alerts
-            }
-        })
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response.make_conditional(request)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-# --- Jalankan pengecekan otomatis
-scheduler = BackgroundScheduler()
-
-# Check device status every 1 minute
-scheduler.add_job(func=check_devices_with_alert, trigger="interval", seconds=60)
-
-# Monitor bandwidth every 5 minutes
-scheduler.add_job(func=monitor_bandwidth, trigger="interval", minutes=5)
+# --- Isi window drop detection WiFi dari database (sekali saat startup)
+try:
+    wifi_client_window.seed()
+except Exception as e:
+    print(f"⚠️ Gagal seed window WiFi clients, dicoba lagi saat monitoring: {e}")
 
-# Monitor WiFi clients every 3 minutes
-scheduler.add_job(func=monitor_wifi_clients, trigger="interval", minutes=3)
+# --- Isi snapshot dashboard dari database (sekali saat startup)
+try:
+    dashboard_snapshot.seed()
+except Exception as e:
+    print(f"⚠️ Gagal seed snapshot dashboard, dicoba lagi saat endpoint dipanggil: {e}")
 
-# Send summary every 6 hours
-scheduler.add_job(func=send_periodic_summary, trigger="interval", hours=6)
+# --- Jalankan pengecekan otomatis
+# Setiap job: max 1 instance (run yang tumpang tindih dilewati), coalesce, jitter,
+# dan deadline per siklus untuk job polling (lihat service/job_scheduler.py)
+# Device check berjalan tiap CHECK_TICK detik; tiap device dicek sesuai check_interval-nya
+monitoring_scheduler.add(
+    'device_check', check_devices_with_alert, CHECK_TICK,
+    uses_deadline=True, description="Device status check (per-device interval)"
+)
+monitoring_scheduler.add(
+    'bandwidth', monitor_bandwidth, 5 * 60,
+    uses_deadline=True, description="Bandwidth monitoring"
+)
+monitoring_scheduler.add(
+    'wifi_clients', monitor_wifi_clients, 3 * 60,
+    uses_deadline=True, description="WiFi client monitoring"
+)
+monitoring_scheduler.add(
+    'summary', send_periodic_summary, 6 * 3600,
+    description="Summary report"
+)
+# Retention history (drop partisi / delete lama), run pertama 1 menit setelah start
+monitoring_scheduler.add(
+    'retention', retention_manager.run, 6 * 3600,
+    first_run=datetime.now() + timedelta(minutes=1),
+    description="History retention"
+)
 
-scheduler.start()
+monitoring_scheduler.start()
 
 print("✅ NMS System started successfully!")
 print("📊 Scheduled tasks:")
-print("  - Device status check: Every 60 seconds")
-print("  - Bandwidth monitoring: Every 5 minutes")
-print("  - WiFi client monitoring: Every 3 minutes")
-print("  - Summary report: Every 6 hours")
+for line in monitoring_scheduler.describe():
+    print(f"  - {line}")
 
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5000)
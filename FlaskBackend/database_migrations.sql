@@ -0,0 +1,142 @@
+-- Migrasi untuk database NMS yang dibuat dari versi database_schema.sql sebelumnya.
+-- Database baru cukup menjalankan database_schema.sql.
+USE nms_dcc;
+
+-- Deteksi counter 64-bit (IF-MIB ifHCInOctets/ifHCOutOctets) per device
+ALTER TABLE devices ADD COLUMN hc_counters BOOLEAN DEFAULT NULL AFTER interface_index;
+
+-- Rollup bandwidth per menit / jam / hari (diisi otomatis oleh metrics writer)
+CREATE TABLE IF NOT EXISTS bandwidth_rollup_1m (
+    device_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    in_avg DECIMAL(10, 2), in_min DECIMAL(10, 2), in_max DECIMAL(10, 2), in_p95 DECIMAL(10, 2),
+    out_avg DECIMAL(10, 2), out_min DECIMAL(10, 2), out_max DECIMAL(10, 2), out_p95 DECIMAL(10, 2),
+    total_avg DECIMAL(10, 2), total_min DECIMAL(10, 2), total_max DECIMAL(10, 2), total_p95 DECIMAL(10, 2),
+    last_timestamp DATETIME,
+    PRIMARY KEY (device_id, bucket),
+    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    INDEX idx_bucket (bucket)
+);
+
+CREATE TABLE IF NOT EXISTS bandwidth_rollup_1h (
+    device_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    in_avg DECIMAL(10, 2), in_min DECIMAL(10, 2), in_max DECIMAL(10, 2), in_p95 DECIMAL(10, 2),
+    out_avg DECIMAL(10, 2), out_min DECIMAL(10, 2), out_max DECIMAL(10, 2), out_p95 DECIMAL(10, 2),
+    total_avg DECIMAL(10, 2), total_min DECIMAL(10, 2), total_max DECIMAL(10, 2), total_p95 DECIMAL(10, 2),
+    last_timestamp DATETIME,
+    PRIMARY KEY (device_id, bucket),
+    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    INDEX idx_bucket (bucket)
+);
+
+CREATE TABLE IF NOT EXISTS bandwidth_rollup_1d (
+    device_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    in_avg DECIMAL(10, 2), in_min DECIMAL(10, 2), in_max DECIMAL(10, 2), in_p95 DECIMAL(10, 2),
+    out_avg DECIMAL(10, 2), out_min DECIMAL(10, 2), out_max DECIMAL(10, 2), out_p95 DECIMAL(10, 2),
+    total_avg DECIMAL(10, 2), total_min DECIMAL(10, 2), total_max DECIMAL(10, 2), total_p95 DECIMAL(10, 2),
+    last_timestamp DATETIME,
+    PRIMARY KEY (device_id, bucket),
+    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    INDEX idx_bucket (bucket)
+);
+
+-- Isi rollup dari history yang sudah ada (p95 tidak dihitung untuk data lama)
+INSERT IGNORE INTO bandwidth_rollup_1m
+    (device_id, bucket, samples, in_avg, in_min, in_max, out_avg, out_min, out_max,
+     total_avg, total_min, total_max, last_timestamp)
+SELECT device_id, DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'), COUNT(*),
+       AVG(in_mbps), MIN(in_mbps), MAX(in_mbps),
+       AVG(out_mbps), MIN(out_mbps), MAX(out_mbps),
+       AVG(total_mbps), MIN(total_mbps), MAX(total_mbps), MAX(timestamp)
+FROM bandwidth_history
+GROUP BY device_id, DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00');
+
+INSERT IGNORE INTO bandwidth_rollup_1h
+    (device_id, bucket, samples, in_avg, in_min, in_max, out_avg, out_min, out_max,
+     total_avg, total_min, total_max, last_timestamp)
+SELECT device_id, DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00'), COUNT(*),
+       AVG(in_mbps), MIN(in_mbps), MAX(in_mbps),
+       AVG(out_mbps), MIN(out_mbps), MAX(out_mbps),
+       AVG(total_mbps), MIN(total_mbps), MAX(total_mbps), MAX(timestamp)
+FROM bandwidth_history
+GROUP BY device_id, DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00');
+
+INSERT IGNORE INTO bandwidth_rollup_1d
+    (device_id, bucket, samples, in_avg, in_min, in_max, out_avg, out_min, out_max,
+     total_avg, total_min, total_max, last_timestamp)
+SELECT device_id, DATE(timestamp), COUNT(*),
+       AVG(in_mbps), MIN(in_mbps), MAX(in_mbps),
+       AVG(out_mbps), MIN(out_mbps), MAX(out_mbps),
+       AVG(total_mbps), MIN(total_mbps), MAX(total_mbps), MAX(timestamp)
+FROM bandwidth_history
+GROUP BY device_id, DATE(timestamp);
+
+-- View untuk bandwidth statistics (24 jam terakhir, dari rollup per jam)
+CREATE OR REPLACE VIEW bandwidth_stats AS
+SELECT 
+    d.id as device_id,
+    d.name as device_name,
+    d.ip_address,
+    SUM(br.total_avg * br.samples) / SUM(br.samples) as avg_mbps,
+    MAX(br.total_max) as max_mbps,
+    MIN(br.total_min) as min_mbps,
+    SUM(br.samples) as total_records,
+    MAX(br.last_timestamp) as last_recorded
+FROM devices d
+LEFT JOIN bandwidth_rollup_1h br ON d.id = br.device_id
+WHERE br.bucket >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+GROUP BY d.id, d.name, d.ip_address;
+
+-- Partisi harian untuk history mentah dan rollup 1 menit (retention = DROP PARTITION).
+-- Tabel yang dipartisi tidak boleh punya foreign key; history device yang
+-- dihapus dibersihkan oleh aplikasi. REORGANIZE pertama oleh retention
+-- manager akan menyalin data lama ke partisi hari ini.
+ALTER TABLE bandwidth_history DROP FOREIGN KEY bandwidth_history_ibfk_1;
+ALTER TABLE bandwidth_history DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp);
+ALTER TABLE bandwidth_history PARTITION BY RANGE (TO_DAYS(timestamp)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+ALTER TABLE wifi_client_history DROP FOREIGN KEY wifi_client_history_ibfk_1;
+ALTER TABLE wifi_client_history DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp);
+ALTER TABLE wifi_client_history PARTITION BY RANGE (TO_DAYS(timestamp)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+ALTER TABLE bandwidth_rollup_1m DROP FOREIGN KEY bandwidth_rollup_1m_ibfk_1;
+ALTER TABLE bandwidth_rollup_1m PARTITION BY RANGE (TO_DAYS(bucket)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Metadata segmen TSDB lokal (hanya dipakai jika TSDB_ENABLED=true; sampel mentah
+-- bandwidth disimpan di file segmen, bukan di bandwidth_history)
+CREATE TABLE IF NOT EXISTS tsdb_segments (
+    device_id INT NOT NULL,
+    metric VARCHAR(32) NOT NULL,
+    segment_start DATETIME NOT NULL,
+    sample_count INT NOT NULL DEFAULT 0,
+    first_timestamp DATETIME,
+    last_timestamp DATETIME,
+    bytes BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (device_id, metric, segment_start),
+    INDEX idx_segment_start (segment_start)
+);
+
+-- Outbox alert Telegram di alert_history
+ALTER TABLE alert_history
+    MODIFY alert_type ENUM('device_down', 'device_up', 'bandwidth_high', 'bandwidth_low', 'wifi_client_drop', 'zabbix_trigger', 'summary', 'general') NOT NULL,
+    ADD COLUMN summary VARCHAR(1024) AFTER message,
+    ADD COLUMN category VARCHAR(64) AFTER summary,
+    ADD COLUMN attempts INT NOT NULL DEFAULT 0 AFTER sent_at,
+    ADD COLUMN next_attempt_at DATETIME AFTER attempts,
+    ADD COLUMN last_error VARCHAR(500) AFTER next_attempt_at,
+    ADD INDEX idx_outbox (is_sent, next_attempt_at);
+
+-- Alert lama tidak perlu dikirim ulang
+UPDATE alert_history SET is_sent = TRUE WHERE is_sent = FALSE;
@@ -13,6 +13,7 @@ CREATE TABLE IF NOT EXISTS devices (
     last_checked DATETIME,
     snmp_community VARCHAR(50) DEFAULT 'public',
     interface_index INT DEFAULT 2,
+    hc_counters BOOLEAN DEFAULT NULL,  -- NULL = belum dideteksi, TRUE = ifHCInOctets/ifHCOutOctets tersedia
     location VARCHAR(255),
     description TEXT,
     vendor VARCHAR(100),
@@ -25,8 +26,9 @@ CREATE TABLE IF NOT EXISTS devices (
 );
 
 -- Table untuk menyimpan history bandwidth
+-- Dipartisi per hari (dikelola retention manager), sehingga tanpa foreign key
 CREATE TABLE IF NOT EXISTS bandwidth_history (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     device_id INT NOT NULL,
     interface_index INT DEFAULT 2,
     in_bytes_per_sec BIGINT DEFAULT 0,
@@ -36,39 +38,111 @@ CREATE TABLE IF NOT EXISTS bandwidth_history (
     total_mbps DECIMAL(10, 2) DEFAULT 0,
     timestamp DATETIME NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    PRIMARY KEY (id, timestamp),
     INDEX idx_device_time (device_id, timestamp),
     INDEX idx_timestamp (timestamp)
+)
+PARTITION BY RANGE (TO_DAYS(timestamp)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Rollup bandwidth per menit / jam / hari (diisi otomatis oleh metrics writer).
+-- Rollup 1 menit dipartisi per hari seperti bandwidth_history.
+CREATE TABLE IF NOT EXISTS bandwidth_rollup_1m (
+    device_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    in_avg DECIMAL(10, 2), in_min DECIMAL(10, 2), in_max DECIMAL(10, 2), in_p95 DECIMAL(10, 2),
+    out_avg DECIMAL(10, 2), out_min DECIMAL(10, 2), out_max DECIMAL(10, 2), out_p95 DECIMAL(10, 2),
+    total_avg DECIMAL(10, 2), total_min DECIMAL(10, 2), total_max DECIMAL(10, 2), total_p95 DECIMAL(10, 2),
+    last_timestamp DATETIME,
+    PRIMARY KEY (device_id, bucket),
+    INDEX idx_bucket (bucket)
+)
+PARTITION BY RANGE (TO_DAYS(bucket)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS bandwidth_rollup_1h (
+    device_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    in_avg DECIMAL(10, 2), in_min DECIMAL(10, 2), in_max DECIMAL(10, 2), in_p95 DECIMAL(10, 2),
+    out_avg DECIMAL(10, 2), out_min DECIMAL(10, 2), out_max DECIMAL(10, 2), out_p95 DECIMAL(10, 2),
+    total_avg DECIMAL(10, 2), total_min DECIMAL(10, 2), total_max DECIMAL(10, 2), total_p95 DECIMAL(10, 2),
+    last_timestamp DATETIME,
+    PRIMARY KEY (device_id, bucket),
+    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    INDEX idx_bucket (bucket)
+);
+
+CREATE TABLE IF NOT EXISTS bandwidth_rollup_1d (
+    device_id INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    samples INT NOT NULL DEFAULT 0,
+    in_avg DECIMAL(10, 2), in_min DECIMAL(10, 2), in_max DECIMAL(10, 2), in_p95 DECIMAL(10, 2),
+    out_avg DECIMAL(10, 2), out_min DECIMAL(10, 2), out_max DECIMAL(10, 2), out_p95 DECIMAL(10, 2),
+    total_avg DECIMAL(10, 2), total_min DECIMAL(10, 2), total_max DECIMAL(10, 2), total_p95 DECIMAL(10, 2),
+    last_timestamp DATETIME,
+    PRIMARY KEY (device_id, bucket),
+    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    INDEX idx_bucket (bucket)
+);
+
+-- Metadata segmen TSDB lokal (hanya dipakai jika TSDB_ENABLED=true; sampel mentah
+-- bandwidth disimpan di file segmen, bukan di bandwidth_history)
+CREATE TABLE IF NOT EXISTS tsdb_segments (
+    device_id INT NOT NULL,
+    metric VARCHAR(32) NOT NULL,
+    segment_start DATETIME NOT NULL,
+    sample_count INT NOT NULL DEFAULT 0,
+    first_timestamp DATETIME,
+    last_timestamp DATETIME,
+    bytes BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (device_id, metric, segment_start),
+    INDEX idx_segment_start (segment_start)
 );
 
 -- Table untuk menyimpan alert history
+-- Juga berfungsi sebagai outbox Telegram: baris dengan is_sent = FALSE dikirim
+-- oleh dispatcher, gagal dicoba lagi pada next_attempt_at (backoff)
 CREATE TABLE IF NOT EXISTS alert_history (
     id INT AUTO_INCREMENT PRIMARY KEY,
     device_id INT,
-    alert_type ENUM('device_down', 'device_up', 'bandwidth_high', 'bandwidth_low', 'zabbix_trigger') NOT NULL,
+    alert_type ENUM('device_down', 'device_up', 'bandwidth_high', 'bandwidth_low', 'wifi_client_drop', 'zabbix_trigger', 'summary', 'general') NOT NULL,
     severity ENUM('info', 'warning', 'critical') DEFAULT 'warning',
     message TEXT NOT NULL,
+    summary VARCHAR(1024),
+    category VARCHAR(64),
     alert_data JSON,
     is_sent BOOLEAN DEFAULT FALSE,
     sent_at DATETIME,
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME,
+    last_error VARCHAR(500),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE SET NULL,
     INDEX idx_device (device_id),
     INDEX idx_type (alert_type),
-    INDEX idx_created (created_at)
+    INDEX idx_created (created_at),
+    INDEX idx_outbox (is_sent, next_attempt_at)
 );
 
--- Table untuk menyimpan WiFi client history
+-- Table untuk menyimpan WiFi client history (dipartisi per hari, tanpa foreign key)
 CREATE TABLE IF NOT EXISTS wifi_client_history (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     device_id INT NOT NULL,
     client_count INT DEFAULT 0,
     avg_signal_strength DECIMAL(5, 2),
     timestamp DATETIME NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE,
+    PRIMARY KEY (id, timestamp),
     INDEX idx_device_time (device_id, timestamp),
     INDEX idx_timestamp (timestamp)
+)
+PARTITION BY RANGE (TO_DAYS(timestamp)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
 );
 
 -- Table untuk konfigurasi threshold per device
@@ -120,18 +194,18 @@ LEFT JOIN devices d ON ah.device_id = d.id
 ORDER BY ah.created_at DESC
 LIMIT 100;
 
--- View untuk bandwidth statistics
+-- View untuk bandwidth statistics (24 jam terakhir, dari rollup per jam)
 CREATE OR REPLACE VIEW bandwidth_stats AS
 SELECT 
     d.id as device_id,
     d.name as device_name,
     d.ip_address,
-    AVG(bh.total_mbps) as avg_mbps,
-    MAX(bh.total_mbps) as max_mbps,
-    MIN(bh.total_mbps) as min_mbps,
-    COUNT(*) as total_records,
-    MAX(bh.timestamp) as last_recorded
+    SUM(br.total_avg * br.samples) / SUM(br.samples) as avg_mbps,
+    MAX(br.total_max) as max_mbps,
+    MIN(br.total_min) as min_mbps,
+    SUM(br.samples) as total_records,
+    MAX(br.last_timestamp) as last_recorded
 FROM devices d
-LEFT JOIN bandwidth_history bh ON d.id = bh.device_id
-WHERE bh.timestamp >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+LEFT JOIN bandwidth_rollup_1h br ON d.id = br.device_id
+WHERE br.bucket >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
 GROUP BY d.id, d.name, d.ip_address;
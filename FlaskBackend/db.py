@@ -1,14 +1,224 @@
 import mysql.connector
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_db_connection():
-    conn = mysql.connector.connect(
+# Konfigurasi connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))         # detik menunggu koneksi bebas
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", 3600))       # umur maksimum koneksi (detik)
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", 30))   # cek koneksi jika idle lebih lama
+
+
+class PoolTimeout(Exception):
+    """Tidak ada koneksi database yang bebas dalam DB_POOL_TIMEOUT detik"""
+
+
+def _connect():
+    return mysql.connector.connect(
         host=os.getenv("DB_HOST", "localhost"),
         user=os.getenv("DB_USER", "root"),
         password=os.getenv("DB_PASSWORD", ""),
         database=os.getenv("DB_NAME", "nms_dcc")
     )
-    return conn
+
+
+class PooledConnection:
+    """
+    Pembungkus koneksi MySQL dari pool. Semua atribut diteruskan ke koneksi
+    asli, kecuali close() yang mengembalikan koneksi ke pool.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to pool")
+        return getattr(self._entry[0], name)
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Jaring pengaman untuk jalur kode yang lupa memanggil close()
+        if getattr(self, '_entry', None) is not None:
+            self._pool.record_leak()
+            self.close()
+
+
+class ConnectionPool:
+    """
+    Pool koneksi MySQL yang dipakai bersama oleh semua route dan job.
+
+    Koneksi dibuat saat dibutuhkan sampai `size`; jika semua sedang dipakai,
+    checkout menunggu sampai `timeout` detik. Saat checkout, koneksi yang
+    sudah lebih tua dari `recycle` detik diganti baru dan koneksi yang idle
+    lebih dari `ping_after` detik dicek dulu dengan ping.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, ping_after=DB_POOL_PING_AFTER, connect=_connect):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._connect = connect
+        self._idle = queue.LifoQueue()   # [conn, created_at, last_used]
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'recycled': 0,
+            'failed_health_checks': 0,
+            'leaked': 0
+        }
+
+    def _open(self):
+        now = time.monotonic()
+        return [self._connect(), now, now]
+
+    def _discard(self, entry):
+        with self._lock:
+            self._opened -= 1
+        try:
+            entry[0].close()
+        except Exception:
+            pass
+
+    def _try_open(self):
+        with self._lock:
+            if self._opened >= self.size:
+                return None
+            self._opened += 1
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _checkout_entry(self):
+        try:
+            return self._idle.get_nowait(), False
+        except queue.Empty:
+            pass
+
+        entry = self._try_open()
+        if entry is not None:
+            return entry, False
+
+        # Pool penuh: tunggu koneksi dikembalikan (atau slot kosong karena
+        # ada koneksi rusak yang dibuang)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise PoolTimeout(f"No database connection available after {self.timeout}s")
+            try:
+                return self._idle.get(timeout=min(remaining, 0.5)), True
+            except queue.Empty:
+                entry = self._try_open()
+                if entry is not None:
+                    return entry, True
+
+    def _replace(self, entry):
+        self._discard(entry)
+        entry = self._try_open()
+        if entry is None:
+            # Slot sudah diambil thread lain, tunggu seperti checkout biasa
+            entry, _ = self._checkout_entry()
+        return entry
+
+    def _ensure_healthy(self, entry):
+        now = time.monotonic()
+        conn, created_at, last_used = entry
+
+        if now - created_at > self.recycle:
+            with self._lock:
+                self._stats['recycled'] += 1
+            return self._replace(entry)
+
+        if now - last_used > self.ping_after:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                with self._lock:
+                    self._stats['failed_health_checks'] += 1
+                return self._replace(entry)
+        return entry
+
+    def get_connection(self):
+        started = time.monotonic()
+        entry, waited = self._checkout_entry()
+        wait_time = time.monotonic() - started
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['wait_time_total'] += wait_time
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+        return PooledConnection(self, self._ensure_healthy(entry))
+
+    def release(self, entry):
+        conn = entry[0]
+        try:
+            # Akhiri transaksi yang belum di-commit agar peminjam berikutnya
+            # tidak membaca snapshot lama
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+        entry[2] = time.monotonic()
+        self._idle.put(entry)
+
+    def record_leak(self):
+        with self._lock:
+            self._stats['leaked'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            opened = self._opened
+        idle = self._idle.qsize()
+        checkouts = stats['checkouts']
+        stats.update({
+            'size': self.size,
+            'open': opened,
+            'idle': idle,
+            'in_use': opened - idle,
+            'wait_time_avg': round(stats['wait_time_total'] / checkouts, 4) if checkouts else 0.0,
+            'wait_time_total': round(stats['wait_time_total'], 4),
+            'wait_time_max': round(stats['wait_time_max'], 4)
+        })
+        return stats
+
+
+pool = ConnectionPool()
+
+
+def get_db_connection():
+    """Pinjam koneksi dari pool; conn.close() mengembalikannya ke pool"""
+    return pool.get_connection()
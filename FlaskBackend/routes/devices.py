@@ -6,8 +6,15 @@ from service.network_service import (
     get_interface_info, 
     get_wifi_clients,
     get_signal_strength,
-    scan_network
+    resolve_hc_counters
 )
+from service.discovery_service import start_scan, get_scan, ScanRejected
+from service.metrics_writer import metrics_writer
+from service.retention_service import delete_device_history
+from service.dashboard_snapshot import dashboard_snapshot
+from service.event_bus import event_bus
+from service.poll_cache import poll_cache
+from service.check_scheduler import device_check_scheduler
 import os
 
 devices_bp = Blueprint('devices', __name__)
@@ -87,6 +94,9 @@ def add_device():
         
         conn.commit()
         device_id = cursor.lastrowid
+        dashboard_snapshot.set_status(device_id, 'unknown')
+        event_bus.publish('devices', {'action': 'added', 'device_id': device_id})
+        device_check_scheduler.invalidate()
         cursor.close()
         conn.close()
         
@@ -130,6 +140,10 @@ def update_device(device_id):
         
         cursor.execute(query, values)
         conn.commit()
+        # IP/community/interface bisa berubah, hasil poll lama tidak berlaku
+        poll_cache.forget(device_id)
+        event_bus.publish('devices', {'action': 'updated', 'device_id': device_id})
+        device_check_scheduler.invalidate()
         cursor.close()
         conn.close()
         
@@ -150,10 +164,16 @@ def delete_device(device_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    delete_device_history(cursor, device_id)
     cursor.execute("DELETE FROM devices WHERE id=%s", (device_id,))
     conn.commit()
     
     if cursor.rowcount > 0:
+        dashboard_snapshot.remove_device(device_id)
+        event_bus.forget(device_id)
+        poll_cache.forget(device_id)
+        event_bus.publish('devices', {'action': 'deleted', 'device_id': device_id})
+        device_check_scheduler.invalidate()
         cursor.close()
         conn.close()
         return jsonify({
@@ -180,36 +200,25 @@ def get_device_bandwidth(device_id):
         return jsonify({"error": "Device not found"}), 404
     
     community = device.get('snmp_community', 'public')
-    interface_index = device.get('interface_index', 2)
+    interface_index = device.get('interface_index') or 2
     
-    bandwidth_data = get_interface_bandwidth(device['ip_address'], community, interface_index)
+    def fetch():
+        hc_counters = resolve_hc_counters(device, community)
+        bandwidth_data = get_interface_bandwidth(device['ip_address'], community, interface_index, hc_counters)
+        if bandwidth_data:
+            # Save to history (ditulis batch oleh metrics writer)
+            metrics_writer.write_bandwidth(device_id, bandwidth_data, interface_index)
+        return bandwidth_data
+    
+    # SNMP hanya dijalankan jika hasil poll terakhir lebih tua dari TTL
+    bandwidth_data, age = poll_cache.get((device_id, 'bandwidth', interface_index), fetch)
     
     if bandwidth_data:
-        # Save to history
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO bandwidth_history 
-            (device_id, interface_index, in_bytes_per_sec, out_bytes_per_sec, in_mbps, out_mbps, total_mbps, timestamp)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            device_id,
-            interface_index,
-            bandwidth_data['in_bytes_per_sec'],
-            bandwidth_data['out_bytes_per_sec'],
-            bandwidth_data['in_mbps'],
-            bandwidth_data['out_mbps'],
-            bandwidth_data['total_mbps'],
-            datetime.now()
-        ))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
         return jsonify({
             "success": True,
             "device": device,
-            "bandwidth": bandwidth_data
+            "bandwidth": bandwidth_data,
+            "cache_age": age
         })
     else:
         return jsonify({
@@ -232,26 +241,56 @@ def get_device_interfaces(device_id):
         return jsonify({"error": "Device not found"}), 404
     
     community = device.get('snmp_community', 'public')
-    interfaces = get_interface_info(device['ip_address'], community)
+    interfaces, age = poll_cache.get(
+        (device_id, 'interfaces'),
+        lambda: get_interface_info(device['ip_address'], community)
+    )
+    
+    if interfaces is None:
+        return jsonify({
+            "success": False,
+            "error": "Could not retrieve interface data"
+        }), 500
     
     return jsonify({
         "success": True,
         "device": device,
-        "interfaces": interfaces
+        "interfaces": interfaces,
+        "cache_age": age
     })
 
 
 @devices_bp.route('/network/scan', methods=['POST'])
 def scan_network_range():
-    """Scan network range for active devices"""
-    data = request.json
+    """Start background scan of a network range for active devices"""
+    data = request.json or {}
     network_range = data.get('network_range', '192.168.1.0/24')
+    # Divalidasi dan dibatasi ke SCAN_RATE_PPS oleh start_scan
+    rate = data.get('rate_pps')
     
-    active_devices = scan_network(network_range)
+    try:
+        job_id = start_scan(network_range, rate=rate)
+    except ScanRejected as e:
+        return jsonify({"error": str(e)}), 400
     
     return jsonify({
         "success": True,
+        "job_id": job_id,
         "network_range": network_range,
-        "found_devices": len(active_devices),
-        "devices": active_devices
+        "status_url": f"/api/network/scan/{job_id}"
+    }), 202
+
+
+@devices_bp.route('/network/scan/<job_id>', methods=['GET'])
+def get_scan_status(job_id):
+    """Get progress and (partial) results of a network scan"""
+    offset = request.args.get('offset', 0, type=int)
+    
+    job = get_scan(job_id, offset=max(offset, 0))
+    if not job:
+        return jsonify({"error": "Scan job not found"}), 404
+    
+    return jsonify({
+        "success": True,
+        **job
     })
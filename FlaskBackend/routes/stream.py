@@ -0,0 +1,22 @@
+from flask import Blueprint, Response, jsonify, stream_with_context
+from service.event_bus import event_bus, TooManySubscribers
+
+stream_bp = Blueprint('stream', __name__)
+
+
+@stream_bp.route('/stream', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events untuk dashboard: status, bandwidth, wifi, devices.
+    Data dikirim saat scheduler menghasilkannya, bukan di-poll per viewer.
+    """
+    try:
+        subscription = event_bus.subscribe()
+    except TooManySubscribers as e:
+        return jsonify({"error": str(e)}), 503
+
+    response = Response(stream_with_context(subscription.frames()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Nonaktifkan buffering reverse proxy (nginx) agar event langsung terkirim
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
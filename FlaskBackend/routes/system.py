@@ -0,0 +1,88 @@
+from flask import Blueprint, jsonify
+from db import pool
+from service.metrics_writer import metrics_writer
+from service.retention_service import retention_manager
+from service.event_bus import event_bus
+from service.poll_cache import poll_cache
+from service.alert_dispatcher import alert_dispatcher
+from service.job_scheduler import monitoring_scheduler
+from service.check_scheduler import device_check_scheduler
+
+system_bp = Blueprint('system', __name__)
+
+
+@system_bp.route('/system/db-pool', methods=['GET'])
+def get_db_pool_stats():
+    """Statistik connection pool MySQL (checkout, waktu tunggu, recycle)"""
+    return jsonify({
+        "success": True,
+        "pool": pool.stats()
+    })
+
+
+@system_bp.route('/system/metrics-writer', methods=['GET'])
+def get_metrics_writer_stats():
+    """Statistik buffer time-series (antrian, batch, sampel dibuang)"""
+    return jsonify({
+        "success": True,
+        "writer": metrics_writer.stats()
+    })
+
+
+@system_bp.route('/system/retention', methods=['GET'])
+def get_retention_stats():
+    """Progress dan hasil run retention terakhir per tabel"""
+    return jsonify({
+        "success": True,
+        "retention": retention_manager.stats()
+    })
+
+
+@system_bp.route('/system/stream', methods=['GET'])
+def get_stream_stats():
+    """Jumlah client stream dan event yang sudah dikirim"""
+    return jsonify({
+        "success": True,
+        "stream": event_bus.stats()
+    })
+
+
+@system_bp.route('/system/poll-cache', methods=['GET'])
+def get_poll_cache_stats():
+    """Hit/miss cache hasil poll yang dipakai endpoint API"""
+    return jsonify({
+        "success": True,
+        "poll_cache": poll_cache.stats()
+    })
+
+
+@system_bp.route('/system/alerts', methods=['GET'])
+def get_alert_dispatcher_stats():
+    """Isi outbox dan hasil pengiriman alert Telegram"""
+    try:
+        outbox = alert_dispatcher.outbox_counts()
+    except Exception as e:
+        outbox = {"error": str(e)}
+    return jsonify({
+        "success": True,
+        "alerts": alert_dispatcher.stats(),
+        "outbox": outbox
+    })
+
+
+@system_bp.route('/system/scheduler', methods=['GET'])
+def get_scheduler_stats():
+    """Durasi run tiap job dibanding interval, run yang dilewati/terlambat"""
+    return jsonify({
+        "success": True,
+        "scheduler": monitoring_scheduler.stats()
+    })
+
+
+@system_bp.route('/system/device-checks', methods=['GET'])
+def get_device_check_stats():
+    """Jadwal check per device: interval, device jatuh tempo, keterlambatan tick"""
+    return jsonify({
+        "success": True,
+        "device_checks": device_check_scheduler.stats()
+    })
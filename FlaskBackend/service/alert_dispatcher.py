@@ -0,0 +1,460 @@
+from db import get_db_connection
+from service.metrics_writer import TABLES, metrics_writer
+from service.rollup_service import percentile
+from collections import deque
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+import atexit
+import os
+import requests
+import threading
+import time
+
+load_dotenv()
+
+TOKEN = os.getenv("TELEGRAM_TOKEN")
+CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+
+# Konfigurasi dispatcher alert
+ALERT_CONNECT_TIMEOUT = float(os.getenv('ALERT_CONNECT_TIMEOUT', 3))     # detik
+ALERT_READ_TIMEOUT = float(os.getenv('ALERT_READ_TIMEOUT', 10))          # detik
+ALERT_DRAIN_TIMEOUT = float(os.getenv('ALERT_DRAIN_TIMEOUT', 5))         # detik saat shutdown
+ALERT_FALLBACK_SIZE = int(os.getenv('ALERT_FALLBACK_SIZE', 1000))        # alert yang dikirim langsung tanpa outbox
+
+# Outbox alert_history: alert yang belum terkirim dicoba lagi dengan backoff
+ALERT_OUTBOX_POLL = float(os.getenv('ALERT_OUTBOX_POLL', 15))            # detik antar pengecekan outbox
+ALERT_CLAIM_LEASE = float(os.getenv('ALERT_CLAIM_LEASE', 120))           # detik klaim berlaku
+ALERT_MAX_ATTEMPTS = int(os.getenv('ALERT_MAX_ATTEMPTS', 10))
+ALERT_RETRY_BASE = float(os.getenv('ALERT_RETRY_BASE', 30))              # detik, dikali 2 tiap gagal
+ALERT_RETRY_MAX = float(os.getenv('ALERT_RETRY_MAX', 1800))
+
+# Alert yang masuk dalam satu window digabung menjadi satu pesan digest
+ALERT_COALESCE_WINDOW = float(os.getenv('ALERT_COALESCE_WINDOW', 5))     # detik
+ALERT_DIGEST_MAX = int(os.getenv('ALERT_DIGEST_MAX', 100))               # alert per digest
+
+# Token bucket pengiriman (Telegram membatasi ~20 pesan/menit per grup)
+ALERT_RATE_PER_MINUTE = float(os.getenv('ALERT_RATE_PER_MINUTE', 20))
+ALERT_BURST = int(os.getenv('ALERT_BURST', 3))
+ALERT_MAX_RETRIES = int(os.getenv('ALERT_MAX_RETRIES', 3))               # percobaan ulang langsung saat 429
+
+# last_error untuk alert yang dicatat saat Telegram belum dikonfigurasi
+NOT_CONFIGURED = 'Telegram not configured'
+
+# Batas panjang pesan Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+class TokenBucket:
+    """Rate limiter: `rate` token per detik, maksimal `burst` token tersimpan"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def acquire(self):
+        """Ambil satu token, tidur sampai tersedia. Return lama menunggu (detik)"""
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return waited
+            delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Kosongkan bucket selama `seconds` (mis. retry_after dari server)"""
+        self._tokens = 0.0
+        self._updated = time.monotonic() + seconds
+
+
+def build_digest(alerts):
+    """
+    Gabungkan alert yang punya `summary` menjadi pesan digest per kategori.
+    Return list (pesan, alert di pesan itu); digest dipecah agar tidak
+    melewati batas panjang Telegram.
+    """
+    groups = {}
+    for alert in alerts:
+        groups.setdefault(alert['category'] or 'Alert', []).append(alert)
+
+    header = (
+        f"📦 <b>ALERT DIGEST</b> ({len(alerts)} alerts)\n"
+        f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    )
+    lines = []
+    for category, members in groups.items():
+        lines.append((f"\n<b>{category}</b> ({len(members)})", None))
+        lines.extend((f"• {alert['summary']}", alert) for alert in members)
+
+    parts, current, included = [], header, []
+    for line, alert in lines:
+        if len(current) + len(line) + 1 > TELEGRAM_MESSAGE_LIMIT:
+            parts.append((current, included))
+            current, included = header, []
+        current += line + "\n"
+        if alert is not None:
+            included.append(alert)
+    parts.append((current, included))
+    return parts
+
+
+def retry_delay(attempts):
+    """Backoff eksponensial setelah `attempts` kali gagal"""
+    return min(ALERT_RETRY_MAX, ALERT_RETRY_BASE * 2 ** max(0, attempts - 1))
+
+
+class AlertDispatcher:
+    """
+    Pengiriman alert Telegram lewat outbox di tabel alert_history.
+
+    Producer (job check dan monitoring) hanya memasukkan alert ke antrian
+    metrics writer tanpa menunggu (INSERT batch, tidak pernah menunggu
+    database maupun Telegram). Satu worker thread
+    mengklaim baris yang belum terkirim secara bulk (SELECT ... FOR UPDATE
+    SKIP LOCKED, lalu next_attempt_at digeser sebagai lease), mengirimnya
+    lewat requests.Session dengan timeout, lalu menandai is_sent/sent_at.
+    Pengiriman yang gagal dicoba lagi dengan backoff eksponensial sampai
+    ALERT_MAX_ATTEMPTS, dan alert yang belum terkirim tetap ada setelah
+    restart.
+
+    Worker menunggu ALERT_COALESCE_WINDOW detik setelah ada alert baru: jika
+    lebih dari satu alert yang diklaim punya `summary`, semuanya dikirim
+    sebagai satu digest. Setiap request dibatasi token bucket, dan respons
+    429 menghentikan pengiriman selama `retry_after`.
+
+    Alert yang tidak bisa masuk outbox (antrian metrics writer penuh atau
+    database tetap gagal) diserahkan langsung ke worker dan dikirim tanpa
+    dicatat; alert yang juga tidak bisa dikirim dihitung sebagai dropped.
+    """
+
+    def __init__(self, token=TOKEN, chat_id=CHAT_ID):
+        self.token = token
+        self.chat_id = chat_id
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._bucket = TokenBucket(ALERT_RATE_PER_MINUTE / 60, ALERT_BURST)
+        self._latencies = deque(maxlen=1000)
+        self._direct = deque()
+        self._stats = {
+            'recorded': 0,
+            'dropped': 0,
+            'claimed': 0,
+            'sent': 0,
+            'failed': 0,
+            'gave_up': 0,
+            'requests': 0,
+            'digests': 0,
+            'coalesced': 0,
+            'rate_limited': 0,
+            'throttled_seconds': 0.0,
+            'last_error': None,
+            'last_sent_at': None
+        }
+        self._worker = None
+        if self.configured:
+            self._worker = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+            self._worker.start()
+
+    @property
+    def configured(self):
+        return bool(self.token and self.chat_id)
+
+    def enqueue(self, message, summary=None, category=None, alert_type='general',
+                device_id=None, severity='warning', alert_data=None):
+        """
+        Simpan alert ke outbox (ditulis batch oleh metrics writer). `summary`
+        (satu baris) dan `category` dipakai jika alert digabung ke digest;
+        alert tanpa summary selalu dikirim utuh. Return False jika dibuang.
+
+        Tanpa konfigurasi Telegram alert hanya dicatat sebagai history: baris
+        langsung ditandai tidak terkirim (attempts = ALERT_MAX_ATTEMPTS)
+        sehingga tidak menumpuk di outbox dan tidak dikirim massal saat
+        Telegram dikonfigurasi belakangan.
+        """
+        if self.configured:
+            attempts, last_error = 0, None
+        else:
+            print("⚠️ Telegram belum dikonfigurasi, alert hanya dicatat.")
+            attempts, last_error = ALERT_MAX_ATTEMPTS, NOT_CONFIGURED
+        queued = metrics_writer.write_alert(
+            device_id, alert_type, severity, message, summary, category, alert_data,
+            attempts=attempts, last_error=last_error
+        )
+        if not queued:
+            self._hand_over([{
+                'id': None, 'message': message, 'summary': summary, 'category': category,
+                'attempts': attempts, 'created_at': datetime.now()
+            }])
+        return queued
+
+    def hook(self, rows):
+        """Hook metrics writer untuk alert_history: bangunkan worker"""
+        with self._lock:
+            self._stats['recorded'] += len(rows)
+        self._wake.set()
+
+    def fallback(self, rows):
+        """Fallback metrics writer untuk alert_history yang tidak bisa disimpan"""
+        self._hand_over([dict(zip(TABLES['alert_history'], row), id=None) for row in rows])
+
+    def _hand_over(self, alerts):
+        """Serahkan alert tanpa baris outbox (id None) ke worker untuk dikirim langsung"""
+        sendable = [alert for alert in alerts if self.configured and alert['attempts'] < ALERT_MAX_ATTEMPTS]
+        with self._lock:
+            accepted = sendable[:max(0, ALERT_FALLBACK_SIZE - len(self._direct))]
+            self._direct.extend(accepted)
+            self._stats['dropped'] += len(alerts) - len(accepted)
+        if len(accepted) < len(alerts):
+            print(f"❌ {len(alerts) - len(accepted)} alert hilang: tidak tersimpan dan tidak bisa dikirim")
+        if accepted:
+            self._wake.set()
+
+    def _take_direct(self):
+        with self._lock:
+            alerts = list(self._direct)
+            self._direct.clear()
+        return alerts
+
+    # --- Outbox
+
+    def _claim(self):
+        """Klaim alert yang jatuh tempo (maksimal ALERT_DIGEST_MAX)"""
+        now = datetime.now()
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT id, message, summary, category, attempts, created_at
+                FROM alert_history
+                WHERE is_sent = FALSE AND attempts < %s
+                  AND (next_attempt_at IS NULL OR next_attempt_at <= %s)
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (ALERT_MAX_ATTEMPTS, now, ALERT_DIGEST_MAX))
+            alerts = cursor.fetchall()
+            if alerts:
+                # Lease: jika proses mati sebelum selesai, alert diklaim ulang setelah lease habis
+                ids = [alert['id'] for alert in alerts]
+                cursor.execute(
+                    f"UPDATE alert_history SET next_attempt_at=%s "
+                    f"WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                    [now + timedelta(seconds=ALERT_CLAIM_LEASE)] + ids
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        with self._lock:
+            self._stats['claimed'] += len(alerts)
+        return alerts
+
+    def _mark_sent(self, alerts):
+        sent_at = datetime.now()
+        ids = [alert['id'] for alert in alerts if alert['id'] is not None]
+        if ids:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE alert_history SET is_sent=TRUE, sent_at=%s, attempts=attempts+1, last_error=NULL "
+                f"WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                [sent_at] + ids
+            )
+            conn.commit()
+            cursor.close()
+            conn.close()
+
+        with self._lock:
+            self._stats['sent'] += len(alerts)
+            self._stats['last_sent_at'] = sent_at.isoformat(timespec='seconds')
+            self._latencies.extend((sent_at - alert['created_at']).total_seconds() for alert in alerts)
+
+    def _mark_failed(self, alerts, error):
+        now = datetime.now()
+        stored = [alert for alert in alerts if alert['id'] is not None]
+        if stored:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.executemany(
+                "UPDATE alert_history SET attempts=attempts+1, next_attempt_at=%s, last_error=%s WHERE id=%s",
+                [
+                    (now + timedelta(seconds=retry_delay(alert['attempts'] + 1)), error[:500], alert['id'])
+                    for alert in stored
+                ]
+            )
+            conn.commit()
+            cursor.close()
+            conn.close()
+
+        # Alert tanpa outbox dicoba lagi pada putaran worker berikutnya
+        retry = [
+            dict(alert, attempts=alert['attempts'] + 1) for alert in alerts
+            if alert['id'] is None and alert['attempts'] + 1 < ALERT_MAX_ATTEMPTS
+        ]
+        gave_up = sum(1 for alert in alerts if alert['attempts'] + 1 >= ALERT_MAX_ATTEMPTS)
+        with self._lock:
+            self._direct.extend(retry)
+            self._stats['failed'] += len(alerts)
+            self._stats['gave_up'] += gave_up
+            self._stats['dropped'] += sum(1 for alert in alerts if alert['id'] is None) - len(retry)
+            self._stats['last_error'] = error
+        if gave_up:
+            print(f"❌ {gave_up} alert tidak terkirim setelah {ALERT_MAX_ATTEMPTS} percobaan")
+
+    # --- Pengiriman
+
+    def _post(self, message):
+        """Satu request sendMessage. Return (ok, error, retry_after)"""
+        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        data = {"chat_id": self.chat_id, "text": message, "parse_mode": "HTML"}
+        try:
+            response = self._session.post(
+                url, data=data,
+                timeout=(ALERT_CONNECT_TIMEOUT, ALERT_READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            return False, str(e), None
+        finally:
+            with self._lock:
+                self._stats['requests'] += 1
+
+        if response.status_code == 200:
+            return True, None, None
+        retry_after = None
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get('parameters', {}).get('retry_after', 1))
+            except ValueError:
+                retry_after = float(response.headers.get('Retry-After', 1))
+        return False, f"HTTP {response.status_code}: {response.text[:200]}", retry_after
+
+    def _send(self, message, alerts):
+        """Kirim satu pesan yang mewakili `alerts`, lalu catat hasilnya di outbox"""
+        for attempt in range(ALERT_MAX_RETRIES + 1):
+            waited = self._bucket.acquire()
+            ok, error, retry_after = self._post(message)
+            with self._lock:
+                self._stats['throttled_seconds'] = round(self._stats['throttled_seconds'] + waited, 1)
+            if ok:
+                print(f"✅ Telegram alert sent: {message.strip()[:50]}...")
+                self._mark_sent(alerts)
+                return True
+            if retry_after is None or attempt == ALERT_MAX_RETRIES or self._stopped.is_set():
+                break
+            print(f"⏳ Telegram rate limit, dicoba lagi dalam {retry_after}s")
+            with self._lock:
+                self._stats['rate_limited'] += 1
+            self._bucket.pause(retry_after)
+
+        print(f"❌ Failed to send Telegram: {error}")
+        self._mark_failed(alerts, error)
+        return False
+
+    def _dispatch(self, alerts):
+        digestible = [alert for alert in alerts if alert['summary']]
+        single = [alert for alert in alerts if not alert['summary']]
+        if len(digestible) == 1:
+            single.insert(0, digestible.pop())
+
+        if digestible:
+            with self._lock:
+                self._stats['digests'] += 1
+                self._stats['coalesced'] += len(digestible)
+            for message, included in build_digest(digestible):
+                self._send(message, included)
+        for alert in single:
+            self._send(alert['message'], [alert])
+
+    def deliver_pending(self):
+        """Kirim semua alert yang jatuh tempo. Return jumlah alert yang diproses"""
+        total = 0
+        # Alert tanpa outbox dikirim dulu, tidak bergantung pada database
+        direct = self._take_direct()
+        if direct:
+            self._dispatch(direct)
+            total += len(direct)
+        while not self._stopped.is_set():
+            alerts = self._claim()
+            if not alerts:
+                break
+            self._dispatch(alerts)
+            total += len(alerts)
+            if len(alerts) < ALERT_DIGEST_MAX:
+                break
+        return total
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self._wake.wait(ALERT_OUTBOX_POLL):
+                # Tunggu alert lain yang muncul bersamaan agar bisa digabung
+                self._stopped.wait(ALERT_COALESCE_WINDOW)
+                self._wake.clear()
+            try:
+                self.deliver_pending()
+            except Exception as e:
+                with self._lock:
+                    self._stats['last_error'] = str(e)
+                print(f"❌ Outbox alert gagal diproses: {e}")
+                self._stopped.wait(ALERT_OUTBOX_POLL)
+
+    def stop(self, timeout=ALERT_DRAIN_TIMEOUT):
+        """Hentikan worker; alert yang belum terkirim tetap di outbox"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._session.close()
+
+    def outbox_counts(self):
+        """Jumlah alert di outbox per status"""
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT
+                COALESCE(SUM(is_sent = FALSE AND attempts < %s), 0) AS pending,
+                COALESCE(SUM(is_sent = FALSE AND attempts >= %s AND NOT (last_error <=> %s)), 0) AS undeliverable,
+                COALESCE(SUM(is_sent = FALSE AND last_error <=> %s), 0) AS not_configured,
+                MIN(CASE WHEN is_sent = FALSE AND attempts < %s THEN created_at END) AS oldest_pending
+            FROM alert_history
+        """, (ALERT_MAX_ATTEMPTS, ALERT_MAX_ATTEMPTS, NOT_CONFIGURED, NOT_CONFIGURED, ALERT_MAX_ATTEMPTS))
+        counts = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return {
+            'pending': int(counts['pending']),
+            'undeliverable': int(counts['undeliverable']),
+            'not_configured': int(counts['not_configured']),
+            'oldest_pending': counts['oldest_pending'].isoformat() if counts['oldest_pending'] else None
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        stats['configured'] = self.configured
+        stats['delivery_latency'] = {
+            'samples': len(latencies),
+            'avg': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p95': round(percentile(latencies, 95), 2) if latencies else None,
+            'max': round(latencies[-1], 2) if latencies else None
+        }
+        return stats
+
+
+alert_dispatcher = AlertDispatcher()
+metrics_writer.add_hook('alert_history', alert_dispatcher.hook)
+metrics_writer.add_fallback('alert_history', alert_dispatcher.fallback)
+atexit.register(alert_dispatcher.stop)
@@ -0,0 +1,174 @@
+from db import get_db_connection
+from service.dashboard_snapshot import dashboard_snapshot
+from collections import Counter
+import heapq
+import os
+import random
+import threading
+import time
+
+# Job check berjalan setiap CHECK_TICK detik dan hanya mengecek device yang jatuh tempo
+CHECK_TICK = float(os.getenv('CHECK_TICK', 5))
+DEFAULT_CHECK_INTERVAL = float(os.getenv('DEFAULT_CHECK_INTERVAL', 60))   # jika tidak ada di device_thresholds
+DEFAULT_PING_TIMEOUT = float(os.getenv('DEFAULT_PING_TIMEOUT', 2))
+CHECK_MIN_INTERVAL = float(os.getenv('CHECK_MIN_INTERVAL', 10))
+CHECK_REFRESH_INTERVAL = float(os.getenv('CHECK_REFRESH_INTERVAL', 60))   # detik antar reload daftar device
+
+
+class DeviceCheckScheduler:
+    """
+    Jadwal check per device berdasarkan device_thresholds.check_interval
+    dan ping_timeout.
+
+    Device disimpan di priority queue (heap) berdasarkan waktu jatuh tempo.
+    Setiap tick, due() mengambil device yang sudah jatuh tempo saja, dan
+    setelah dicek reschedule() menjadwalkannya lagi satu interval kemudian.
+    Device baru mendapat fase acak di dalam intervalnya sehingga probe
+    tersebar merata, bukan satu burst setiap menit. Daftar device dan
+    threshold dibaca ulang setiap CHECK_REFRESH_INTERVAL detik. Entry heap
+    yang sudah usang (device dihapus atau interval berubah) dibuang saat
+    keluar dari heap. Device yang sudah diambil due() tetapi tidak pernah
+    di-reschedule (siklus check gagal) dijadwalkan ulang saat refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []          # (due monotonic, device_id, version)
+        self._devices = {}       # device_id -> {'device', 'interval', 'timeout', 'version', 'due', 'queued'}
+        self._versions = 0
+        self._refreshed_at = None
+        self._stats = {'checks': 0, 'ticks': 0, 'overdue': 0, 'last_lag': None, 'recovered': 0}
+
+    def _load(self):
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT d.*, dt.check_interval, dt.ping_timeout
+            FROM devices d
+            LEFT JOIN device_thresholds dt ON dt.device_id = d.id
+        """)
+        devices = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return devices
+
+    def _push(self, entry, device_id, due):
+        self._versions += 1
+        entry['version'] = self._versions
+        entry['due'] = due
+        entry['queued'] = True
+        heapq.heappush(self._heap, (due, device_id, entry['version']))
+
+    def refresh(self, devices=None):
+        """
+        Sinkronkan jadwal dengan tabel devices + device_thresholds. Return
+        list semua device (dict baris devices).
+        """
+        devices = self._load() if devices is None else devices
+        now = time.monotonic()
+        with self._lock:
+            seen = set()
+            for device in devices:
+                device_id = device['id']
+                seen.add(device_id)
+                interval = max(CHECK_MIN_INTERVAL, float(device.get('check_interval') or DEFAULT_CHECK_INTERVAL))
+                timeout = float(device.get('ping_timeout') or DEFAULT_PING_TIMEOUT)
+                entry = self._devices.get(device_id)
+                if entry is None:
+                    entry = self._devices[device_id] = {'device': device, 'interval': interval, 'timeout': timeout}
+                    # Fase acak agar device dengan interval sama tidak dicek bersamaan
+                    self._push(entry, device_id, now + random.uniform(0, interval))
+                    continue
+                entry['device'] = device
+                entry['timeout'] = timeout
+                if not entry['queued']:
+                    # Diambil due() tapi siklusnya gagal sebelum reschedule()
+                    entry['interval'] = interval
+                    self._push(entry, device_id, now)
+                    self._stats['recovered'] += 1
+                elif interval != entry['interval']:
+                    entry['interval'] = interval
+                    self._push(entry, device_id, min(entry['due'], now + interval))
+
+            for device_id in set(self._devices) - seen:
+                del self._devices[device_id]
+            self._refreshed_at = now
+
+        # Snapshot dashboard ikut daftar device terbaru (device baru/terhapus)
+        dashboard_snapshot.sync_devices(devices)
+        return devices
+
+    def invalidate(self):
+        """Paksa reload daftar device pada tick berikutnya (mis. device ditambah)"""
+        with self._lock:
+            self._refreshed_at = None
+
+    def due(self):
+        """Ambil device yang sudah jatuh tempo (list dict device + ping_timeout)"""
+        now = time.monotonic()
+        if self._refreshed_at is None or now - self._refreshed_at >= CHECK_REFRESH_INTERVAL:
+            self.refresh()
+
+        due = []
+        with self._lock:
+            self._stats['ticks'] += 1
+            lag = 0.0
+            while self._heap and self._heap[0][0] <= now:
+                due_at, device_id, version = heapq.heappop(self._heap)
+                entry = self._devices.get(device_id)
+                if entry is None or entry['version'] != version:
+                    continue
+                entry['queued'] = False
+                lag = max(lag, now - due_at)
+                due.append(entry)
+            self._stats['last_lag'] = round(lag, 2)
+            if lag > CHECK_TICK:
+                self._stats['overdue'] += 1
+
+        return [
+            dict(entry['device'], ping_timeout=entry['timeout'], check_interval=entry['interval'])
+            for entry in due
+        ]
+
+    def reschedule(self, devices, results, changes=()):
+        """
+        Jadwalkan lagi device yang sudah dicek satu interval kemudian; device
+        yang tidak ada di `results` (terpotong deadline atau hasilnya gagal
+        disimpan) dicek lagi tick berikutnya. `changes` (device, status baru)
+        memperbarui status di memori. Harus dipanggil untuk setiap list dari
+        due(), juga jika siklus check gagal.
+        """
+        now = time.monotonic()
+        new_status = {device['id']: status for device, status in changes}
+        with self._lock:
+            for device in devices:
+                entry = self._devices.get(device['id'])
+                if entry is None:
+                    continue
+                if device['id'] in new_status:
+                    entry['device'] = dict(entry['device'], status=new_status[device['id']])
+                if device['ip_address'] in results:
+                    # Pertahankan fase, kecuali sudah tertinggal lebih dari satu interval
+                    due = entry['due'] + entry['interval']
+                    self._push(entry, device['id'], due if due > now else now + entry['interval'])
+                    self._stats['checks'] += 1
+                else:
+                    self._push(entry, device['id'], now + CHECK_TICK)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            entries = list(self._devices.values())
+        intervals = Counter(entry['interval'] for entry in entries)
+        stats.update({
+            'devices': len(entries),
+            'tick': CHECK_TICK,
+            'checks_per_minute': round(sum(60 / entry['interval'] for entry in entries), 1),
+            'due_next_minute': sum(1 for entry in entries if entry['due'] - now <= 60),
+            'intervals': {f"{interval:g}s": count for interval, count in sorted(intervals.items())}
+        })
+        return stats
+
+
+device_check_scheduler = DeviceCheckScheduler()
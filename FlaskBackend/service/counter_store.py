@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+
+# Sampel lebih tua dari ini tidak dipakai untuk menghitung rate (detik)
+COUNTER_MAX_AGE = float(os.getenv('COUNTER_MAX_AGE', 900))
+
+
+class CounterStore:
+    """
+    Menyimpan sampel counter terakhir (ifInOctets/ifOutOctets) per
+    (device, ifIndex) sehingga rate bisa dihitung dari dua polling berurutan
+    tanpa harus sleep di antara dua pembacaan SNMP.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def update(self, key, in_octets, out_octets, uptime=None, bits=32, timestamp=None):
+        """
+        Simpan sampel baru dan hitung rate terhadap sampel sebelumnya.
+
+        Return (in_bytes_per_sec, out_bytes_per_sec, elapsed) atau None jika
+        belum ada sampel sebelumnya, sampel lama sudah kadaluarsa, atau
+        counter di-reset (sysUpTime mundur / lebar counter berubah).
+        Counter yang lebih kecil dari sebelumnya tanpa reset dianggap wrap.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        sample = (timestamp, in_octets, out_octets, uptime, bits)
+
+        with self._lock:
+            previous = self._samples.get(key)
+            self._samples[key] = sample
+
+        if previous is None:
+            return None
+
+        prev_time, prev_in, prev_out, prev_uptime, prev_bits = previous
+        elapsed = timestamp - prev_time
+        if elapsed <= 0 or elapsed > COUNTER_MAX_AGE or prev_bits != bits:
+            return None
+
+        # Device reboot: counter mulai dari nol lagi
+        if uptime is not None and prev_uptime is not None and uptime < prev_uptime:
+            return None
+
+        modulus = 2 ** bits
+        in_delta = (in_octets - prev_in) % modulus
+        out_delta = (out_octets - prev_out) % modulus
+
+        return in_delta / elapsed, out_delta / elapsed, elapsed
+
+
+counter_store = CounterStore()
@@ -0,0 +1,257 @@
+from db import get_db_connection
+from service.tsdb import tsdb
+from collections import deque
+from datetime import datetime, timedelta
+import hashlib
+import heapq
+import json
+import threading
+
+# Rentang data yang dipakai summary (sama dengan query dashboard sebelumnya)
+WIFI_CLIENT_WINDOW = timedelta(minutes=10)
+BANDWIDTH_WINDOW = timedelta(hours=1)
+RECENT_ALERTS = 10
+RECENT_ALERTS_QUERY = "SELECT * FROM alert_history ORDER BY created_at DESC LIMIT %s"
+
+
+def _dumps(data):
+    return json.dumps(data, default=str, sort_keys=True)
+
+
+def _alert_row(row):
+    """Baris alert_history dengan alert_data (kolom JSON) sebagai object"""
+    alert = dict(row)
+    data = alert.get('alert_data')
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode()
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            pass
+    alert['alert_data'] = data
+    return alert
+
+
+class DashboardSnapshot:
+    """
+    Summary dashboard yang dipelihara di memori.
+
+    Job check dan monitoring memperbarui snapshot saat menulis data (status
+    device, sampel bandwidth dan jumlah client WiFi), sehingga endpoint
+    summary cukup membaca nilai yang sudah dihitung. Isi awal diambil sekali
+    dari database. Setiap perubahan menaikkan versi; body JSON dan ETag
+    dihitung ulang hanya jika versi berubah.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seeded = False
+        self._statuses = {}                  # device_id -> status
+        self._wifi_latest = {}               # device_id -> (timestamp, client_count)
+        self._wifi_total = 0
+        self._wifi_expiry = []               # heap (timestamp, device_id)
+        self._bandwidth = deque()            # (timestamp, sum_mbps, samples)
+        self._bandwidth_sum = 0.0
+        self._bandwidth_samples = 0
+        self._alerts = deque(maxlen=RECENT_ALERTS)
+        self._version = 0
+        self._cached = None                  # (version, body, etag)
+
+    def seed(self):
+        """Isi snapshot dari database (sekali saja, dicoba lagi jika gagal)"""
+        with self._lock:
+            if self._seeded:
+                return
+
+        now = datetime.now()
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("SELECT id, status FROM devices")
+        devices = cursor.fetchall()
+
+        if tsdb is not None:
+            # Baris terbaru per device (read_table mengurutkan terbaru dulu)
+            latest = {}
+            for row in tsdb.read_table('wifi_client_history', now - WIFI_CLIENT_WINDOW):
+                latest.setdefault(row['device_id'], row)
+            wifi = list(latest.values())
+        else:
+            cursor.execute("""
+                SELECT wch.device_id, wch.client_count, wch.timestamp
+                FROM (
+                    SELECT device_id, MAX(timestamp) as max_time
+                    FROM wifi_client_history
+                    WHERE timestamp > %s
+                    GROUP BY device_id
+                ) latest
+                JOIN wifi_client_history wch ON wch.device_id = latest.device_id
+                    AND wch.timestamp = latest.max_time
+            """, (now - WIFI_CLIENT_WINDOW,))
+            wifi = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT bucket, total_avg * samples as total, samples
+            FROM bandwidth_rollup_1m
+            WHERE bucket > %s
+            ORDER BY bucket
+        """, (now - BANDWIDTH_WINDOW,))
+        bandwidth = cursor.fetchall()
+
+        cursor.execute(RECENT_ALERTS_QUERY, (RECENT_ALERTS,))
+        alerts = [_alert_row(row) for row in cursor.fetchall()]
+
+        cursor.close()
+        conn.close()
+
+        with self._lock:
+            if self._seeded:
+                return
+            for device in devices:
+                self._statuses.setdefault(device['id'], device['status'])
+            for row in wifi:
+                if row['device_id'] not in self._wifi_latest:
+                    self._set_wifi(row['device_id'], row['client_count'], row['timestamp'])
+            seeded = [(row['bucket'], float(row['total'] or 0), int(row['samples'])) for row in bandwidth]
+            self._bandwidth = deque(sorted(seeded + list(self._bandwidth), key=lambda sample: sample[0]))
+            self._bandwidth_sum += sum(sample[1] for sample in seeded)
+            self._bandwidth_samples += sum(sample[2] for sample in seeded)
+            # Jika alert_hook sudah membaca ulang daftar alert, isinya lebih baru
+            if not self._alerts:
+                self._alerts = deque(alerts, maxlen=RECENT_ALERTS)
+            self._seeded = True
+            self._version += 1
+
+    # --- Update dari job
+
+    def sync_devices(self, devices, changes=()):
+        """
+        Samakan daftar device dan statusnya dengan hasil siklus check.
+        `changes` adalah list (device, status baru) dari save_check_results.
+        """
+        statuses = {device['id']: device['status'] for device in devices}
+        statuses.update((device['id'], status) for device, status in changes)
+        with self._lock:
+            if statuses != self._statuses:
+                self._statuses = statuses
+                self._version += 1
+
+    def set_status(self, device_id, status):
+        with self._lock:
+            if self._statuses.get(device_id) != status:
+                self._statuses[device_id] = status
+                self._version += 1
+
+    def remove_device(self, device_id):
+        with self._lock:
+            self._statuses.pop(device_id, None)
+            latest = self._wifi_latest.pop(device_id, None)
+            if latest is not None:
+                self._wifi_total -= latest[1]
+            self._version += 1
+
+    def _set_wifi(self, device_id, client_count, timestamp):
+        previous = self._wifi_latest.get(device_id)
+        if previous is not None:
+            if previous[0] > timestamp:
+                return
+            self._wifi_total -= previous[1]
+        self._wifi_latest[device_id] = (timestamp, client_count)
+        self._wifi_total += client_count
+        heapq.heappush(self._wifi_expiry, (timestamp, device_id))
+
+    def add_wifi_clients(self, device_id, client_count, timestamp=None):
+        with self._lock:
+            self._set_wifi(device_id, int(client_count), timestamp or datetime.now())
+            self._version += 1
+
+    def add_bandwidth(self, total_mbps, timestamp=None):
+        with self._lock:
+            self._bandwidth.append((timestamp or datetime.now(), float(total_mbps or 0), 1))
+            self._bandwidth_sum += float(total_mbps or 0)
+            self._bandwidth_samples += 1
+            self._version += 1
+
+    def set_alerts(self, alerts):
+        with self._lock:
+            self._alerts = deque(alerts, maxlen=RECENT_ALERTS)
+            self._version += 1
+
+    def bandwidth_hook(self, rows):
+        """Hook metrics writer untuk bandwidth_history"""
+        for row in rows:
+            self.add_bandwidth(row[6], row[-1])
+
+    def wifi_hook(self, rows):
+        """Hook metrics writer untuk wifi_client_history"""
+        for device_id, client_count, timestamp in rows:
+            self.add_wifi_clients(device_id, client_count, timestamp)
+
+    def alert_hook(self, rows):
+        """
+        Hook metrics writer untuk alert_history. Baris dari antrian belum
+        punya id dan kolom outbox, jadi setelah INSERT di-commit daftar alert
+        terbaru dibaca ulang dengan query yang sama seperti seed().
+        """
+        def apply(cursor):
+            cursor.execute(RECENT_ALERTS_QUERY, (RECENT_ALERTS,))
+            self.set_alerts([_alert_row(zip(cursor.column_names, row)) for row in cursor.fetchall()])
+        return apply
+
+    # --- Baca
+
+    def _expire(self, now):
+        changed = False
+        cutoff = now - BANDWIDTH_WINDOW
+        while self._bandwidth and self._bandwidth[0][0] <= cutoff:
+            _, total, samples = self._bandwidth.popleft()
+            self._bandwidth_sum -= total
+            self._bandwidth_samples -= samples
+            changed = True
+
+        cutoff = now - WIFI_CLIENT_WINDOW
+        while self._wifi_expiry and self._wifi_expiry[0][0] <= cutoff:
+            timestamp, device_id = heapq.heappop(self._wifi_expiry)
+            latest = self._wifi_latest.get(device_id)
+            # Hanya buang jika belum ada sampel yang lebih baru
+            if latest is not None and latest[0] == timestamp:
+                del self._wifi_latest[device_id]
+                self._wifi_total -= latest[1]
+                changed = True
+
+        if changed:
+            self._version += 1
+
+    def get(self, dumps=None):
+        """
+        Return (body JSON, etag) snapshot terbaru. `dumps` adalah encoder
+        JSON yang dipakai (default json.dumps dengan datetime sebagai str).
+        """
+        self.seed()
+        with self._lock:
+            self._expire(datetime.now())
+            if self._cached is not None and self._cached[0] == self._version:
+                return self._cached[1], self._cached[2]
+
+            total = len(self._statuses)
+            up = sum(1 for status in self._statuses.values() if status == 'up')
+            avg_bandwidth = (
+                round(self._bandwidth_sum / self._bandwidth_samples, 2)
+                if self._bandwidth_samples else 0
+            )
+            summary = {
+                "total_devices": total,
+                "up_devices": up,
+                "down_devices": total - up,
+                "total_wifi_clients": int(self._wifi_total),
+                "avg_bandwidth_mbps": avg_bandwidth,
+                "recent_alerts": list(self._alerts)
+            }
+            body = (dumps or _dumps)({"success": True, "summary": summary})
+            etag = hashlib.sha1(body.encode()).hexdigest()[:16]
+            self._cached = (self._version, body, etag)
+            return body, etag
+
+
+dashboard_snapshot = DashboardSnapshot()
@@ -0,0 +1,158 @@
+from service.icmp_prober import probe
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+import ipaddress
+import math
+import os
+import threading
+import uuid
+
+# Konfigurasi discovery
+SCAN_CHUNK_SIZE = int(os.getenv('SCAN_CHUNK_SIZE', 256))      # host per batch probe
+SCAN_RATE_PPS = float(os.getenv('SCAN_RATE_PPS', 500))        # paket ICMP per detik
+SCAN_MAX_IN_FLIGHT = int(os.getenv('SCAN_MAX_IN_FLIGHT', 256))
+SCAN_MAX_HOSTS = int(os.getenv('SCAN_MAX_HOSTS', 65536))      # /16
+SCAN_MAX_RUNNING_JOBS = int(os.getenv('SCAN_MAX_RUNNING_JOBS', 2))
+SCAN_JOB_HISTORY = 20
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+class ScanRejected(Exception):
+    """Scan tidak bisa dijalankan (range tidak valid, terlalu besar, atau antrian penuh)"""
+
+
+def _parse_range(network_range):
+    try:
+        network = ipaddress.ip_network(network_range, strict=False)
+    except ValueError as e:
+        raise ScanRejected(f"Invalid network range: {e}")
+
+    total = network.num_addresses if network.num_addresses <= 2 else network.num_addresses - 2
+    if total > SCAN_MAX_HOSTS:
+        raise ScanRejected(f"Network range too large: {total} hosts (max {SCAN_MAX_HOSTS})")
+    return network, total
+
+
+def _scan_rate(rate):
+    """Rate dari client dibatasi ke (0, SCAN_RATE_PPS]; None = SCAN_RATE_PPS"""
+    if rate is None:
+        return SCAN_RATE_PPS
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        raise ScanRejected(f"Invalid rate_pps: {rate!r}")
+    if not math.isfinite(rate) or rate <= 0:
+        raise ScanRejected(f"Invalid rate_pps: {rate}")
+    return min(rate, SCAN_RATE_PPS)
+
+
+def _scan_chunks(network, timeout, rate, on_found):
+    """Probe host dalam network per chunk, panggil on_found(list_device) per chunk"""
+    hosts = (str(ip) for ip in network.hosts())
+
+    while True:
+        chunk = list(islice(hosts, SCAN_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        results = probe(chunk, timeout=timeout, max_in_flight=SCAN_MAX_IN_FLIGHT, rate=rate)
+        found = []
+        for ip_str in chunk:
+            rtt = results.get(ip_str, {}).get('rtt')
+            if rtt is not None:
+                found.append({
+                    'ip': ip_str,
+                    'latency': round(rtt * 1000, 2),  # Convert to ms
+                    'status': 'up'
+                })
+                print(f"✅ Found: {ip_str}")
+        on_found(len(chunk), found)
+
+
+def run_scan(network_range, timeout=1, rate=None):
+    """Scan network secara sinkron, return list device yang aktif"""
+    network, _ = _parse_range(network_range)
+    rate = _scan_rate(rate)
+    active_devices = []
+    _scan_chunks(network, timeout, rate,
+                 lambda scanned, found: active_devices.extend(found))
+    return active_devices
+
+
+def _run_job(job_id, network, timeout, rate):
+    job = _jobs[job_id]
+    print(f"🔍 Scanning network {job['network_range']} (job {job_id})...")
+
+    def on_found(scanned, found):
+        with _jobs_lock:
+            job['scanned_hosts'] += scanned
+            job['devices'].extend(found)
+
+    try:
+        _scan_chunks(network, timeout, rate, on_found)
+        status, error = 'completed', None
+    except Exception as e:
+        print(f"❌ Error scanning network: {e}")
+        status, error = 'failed', str(e)
+
+    with _jobs_lock:
+        job['status'] = status
+        job['error'] = error
+        job['finished_at'] = datetime.now().isoformat()
+    print(f"🔍 Scan {job_id} {status}: {len(job['devices'])} device ditemukan")
+
+
+def start_scan(network_range, timeout=1, rate=None):
+    """Mulai scan di background thread, return job_id"""
+    network, total = _parse_range(network_range)
+    rate = _scan_rate(rate)
+
+    with _jobs_lock:
+        running = sum(1 for job in _jobs.values() if job['status'] == 'running')
+        if running >= SCAN_MAX_RUNNING_JOBS:
+            raise ScanRejected("Too many scans running, try again later")
+
+        # Buang job lama yang sudah selesai
+        finished = [job_id for job_id, job in _jobs.items() if job['status'] != 'running']
+        for job_id in finished[:max(0, len(_jobs) - SCAN_JOB_HISTORY + 1)]:
+            del _jobs[job_id]
+
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            'job_id': job_id,
+            'network_range': str(network),
+            'status': 'running',
+            'total_hosts': total,
+            'scanned_hosts': 0,
+            'devices': [],
+            'error': None,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None
+        }
+
+    thread = threading.Thread(
+        target=_run_job,
+        args=(job_id, network, timeout, rate),
+        name=f'scan-{job_id[:8]}',
+        daemon=True
+    )
+    thread.start()
+    return job_id
+
+
+def get_scan(job_id, offset=0):
+    """
+    Snapshot status job scan. `offset` memungkinkan client hanya mengambil
+    device yang ditemukan sejak polling sebelumnya.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = dict(job)
+        snapshot['found_devices'] = len(job['devices'])
+        snapshot['devices'] = job['devices'][offset:]
+    return snapshot
@@ -0,0 +1,127 @@
+# Downsampling deret waktu di server sebelum dikirim ke chart. Semua fungsi
+# menerima list baris (dict) yang terurut waktu (terlama dulu) dan
+# mengembalikan paling banyak `max_points` baris.
+
+import os
+
+AGGREGATIONS = ('lttb', 'minmax', 'avg')
+
+# Batas atas max_points yang boleh diminta client
+HISTORY_MAX_POINTS_LIMIT = int(os.getenv('HISTORY_MAX_POINTS_LIMIT', 5000))
+
+
+def _x(row, x_key):
+    return row[x_key].timestamp()
+
+
+def _y(row, y_key):
+    value = row.get(y_key)
+    return float(value) if value is not None else 0.0
+
+
+def _buckets(count, bucket_count):
+    """Batas index [start, end) untuk `bucket_count` bucket yang hampir sama besar"""
+    size = count / bucket_count
+    return [(int(i * size), int((i + 1) * size)) for i in range(bucket_count)]
+
+
+def lttb(rows, max_points, x_key='timestamp', y_key='total_mbps'):
+    """
+    Largest-Triangle-Three-Buckets: pertahankan bentuk kurva dengan memilih
+    dari setiap bucket titik yang membentuk segitiga terbesar terhadap titik
+    terpilih sebelumnya dan rata-rata bucket berikutnya. Titik pertama dan
+    terakhir selalu dipertahankan.
+    """
+    if max_points >= len(rows) or max_points < 3:
+        return rows[:max_points] if max_points < 3 else rows
+
+    sampled = [rows[0]]
+    inner = _buckets(len(rows) - 2, max_points - 2)
+    previous = rows[0]
+
+    for i, (start, end) in enumerate(inner):
+        start, end = start + 1, end + 1
+
+        if i + 1 < len(inner):
+            next_start, next_end = inner[i + 1][0] + 1, inner[i + 1][1] + 1
+        else:
+            next_start, next_end = len(rows) - 1, len(rows)
+        next_rows = rows[next_start:next_end]
+        avg_x = sum(_x(row, x_key) for row in next_rows) / len(next_rows)
+        avg_y = sum(_y(row, y_key) for row in next_rows) / len(next_rows)
+
+        prev_x, prev_y = _x(previous, x_key), _y(previous, y_key)
+        best, best_area = None, -1.0
+        for row in rows[start:end]:
+            area = abs(
+                (prev_x - avg_x) * (_y(row, y_key) - prev_y)
+                - (prev_x - _x(row, x_key)) * (avg_y - prev_y)
+            )
+            if area > best_area:
+                best, best_area = row, area
+
+        sampled.append(best)
+        previous = best
+
+    sampled.append(rows[-1])
+    return sampled
+
+
+def minmax(rows, max_points, y_key='total_mbps'):
+    """
+    Ambil titik minimum dan maksimum dari setiap bucket (urut waktu), sehingga
+    puncak dan lembah tidak hilang.
+    """
+    if max_points >= len(rows):
+        return rows
+    if max_points < 2:
+        return rows[:max_points]
+
+    sampled = []
+    for start, end in _buckets(len(rows), max_points // 2):
+        bucket = rows[start:end]
+        if not bucket:
+            continue
+        low = min(range(len(bucket)), key=lambda i: _y(bucket[i], y_key))
+        high = max(range(len(bucket)), key=lambda i: _y(bucket[i], y_key))
+        for i in sorted({low, high}):
+            sampled.append(bucket[i])
+    return sampled
+
+
+def average(rows, max_points, fields, x_key='timestamp'):
+    """Rata-rata `fields` per bucket; timestamp diambil dari baris pertama bucket"""
+    if max_points >= len(rows):
+        return rows
+    if max_points < 1:
+        return []
+
+    sampled = []
+    for start, end in _buckets(len(rows), max_points):
+        bucket = rows[start:end]
+        if not bucket:
+            continue
+        row = dict(bucket[0])
+        for field in fields:
+            row[field] = round(sum(_y(item, field) for item in bucket) / len(bucket), 2)
+        row['samples'] = sum(item.get('samples', 1) for item in bucket)
+        sampled.append(row)
+    return sampled
+
+
+def downsample(rows, max_points, agg='lttb', y_key='total_mbps', fields=None, x_key='timestamp'):
+    """
+    Downsample dengan metode `agg` (lihat AGGREGATIONS). `rows` boleh terurut
+    terbaru dulu seperti hasil query history; urutan itu dipertahankan.
+    """
+    max_points = max(1, min(max_points, HISTORY_MAX_POINTS_LIMIT))
+    if len(rows) <= max_points:
+        return rows
+    if len(rows) > 1 and rows[0][x_key] > rows[-1][x_key]:
+        return downsample(rows[::-1], max_points, agg, y_key, fields, x_key)[::-1]
+
+    if agg == 'minmax':
+        return minmax(rows, max_points, y_key)
+    if agg == 'avg':
+        return average(rows, max_points, fields or (y_key,), x_key)
+    return lttb(rows, max_points, x_key, y_key)
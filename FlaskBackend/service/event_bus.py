@@ -0,0 +1,158 @@
+from datetime import datetime
+from decimal import Decimal
+import json
+import os
+import queue
+import threading
+
+# Konfigurasi stream Server-Sent Events
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 256))        # event tertunda per client
+SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', 100))
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', 15))         # detik
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """Antrian event milik satu client stream"""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.queue = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.closed = False
+
+    def offer(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            return False
+
+    def frames(self, heartbeat=SSE_HEARTBEAT):
+        """Generator frame SSE; kirim komentar heartbeat jika tidak ada event"""
+        try:
+            while not self.closed:
+                try:
+                    frame = self.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Broadcast event dari scheduler ke semua client stream (/api/stream).
+
+    Setiap event di-serialize sekali menjadi frame SSE lalu dimasukkan ke
+    antrian setiap subscriber, sehingga biaya per viewer hanya satu put ke
+    queue. Client yang antriannya penuh (terlalu lambat) diputus dan akan
+    reconnect sendiri lewat EventSource. Event terakhir per key (mis.
+    bandwidth per device) disimpan dan dikirim ke client baru agar dashboard
+    langsung punya data tanpa polling.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._retained = {}          # (event, key) -> frame
+        self._next_id = 0
+        self._stats = {
+            'published': 0,
+            'dropped_clients': 0,
+            'rejected_clients': 0
+        }
+
+    def _frame(self, event, data):
+        self._next_id += 1
+        payload = json.dumps(data, default=_default)
+        return f"id: {self._next_id}\nevent: {event}\ndata: {payload}\n\n"
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            if len(self._subscribers) >= SSE_MAX_CLIENTS:
+                self._stats['rejected_clients'] += 1
+                raise TooManySubscribers(f"Maksimal {SSE_MAX_CLIENTS} client stream")
+            for frame in self._retained.values():
+                subscription.offer(frame)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.closed = True
+
+    def publish(self, event, data, key=None):
+        """Kirim event ke semua subscriber; `key` menyimpan event untuk client baru"""
+        with self._lock:
+            frame = self._frame(event, data)
+            if key is not None:
+                self._retained[(event, key)] = frame
+            slow = [sub for sub in self._subscribers if not sub.offer(frame)]
+            for subscription in slow:
+                self._subscribers.discard(subscription)
+                subscription.closed = True
+            self._stats['published'] += 1
+            self._stats['dropped_clients'] += len(slow)
+
+    def forget(self, key):
+        """Hapus event tersimpan untuk `key` (mis. device yang dihapus)"""
+        with self._lock:
+            for retained in [k for k in self._retained if k[1] == key]:
+                del self._retained[retained]
+
+    def close(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.closed = True
+            subscription.offer(None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['clients'] = len(self._subscribers)
+            stats['retained'] = len(self._retained)
+        return stats
+
+    # --- Hook metrics writer (urutan kolom TABLES di metrics_writer)
+
+    def bandwidth_hook(self, rows):
+        for device_id, interface_index, in_bps, out_bps, in_mbps, out_mbps, total_mbps, timestamp in rows:
+            self.publish('bandwidth', {
+                'device_id': device_id,
+                'interface_index': interface_index,
+                'in_bytes_per_sec': in_bps,
+                'out_bytes_per_sec': out_bps,
+                'in_mbps': in_mbps,
+                'out_mbps': out_mbps,
+                'total_mbps': total_mbps,
+                'timestamp': timestamp
+            }, key=device_id)
+
+    def wifi_hook(self, rows):
+        for device_id, client_count, timestamp in rows:
+            self.publish('wifi', {
+                'device_id': device_id,
+                'connected_clients': client_count,
+                'timestamp': timestamp
+            }, key=device_id)
+
+
+event_bus = EventBus()
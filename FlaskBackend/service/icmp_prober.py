@@ -0,0 +1,192 @@
+import heapq
+import itertools
+import os
+import select
+import socket
+import struct
+import time
+from collections import deque
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# Identifier unik per batch agar batch yang berjalan bersamaan (mis. check
+# perangkat dan network scan) tidak saling "mencuri" reply di raw socket
+_identifiers = itertools.count((os.getpid() * 31) & 0xFFFF)
+
+
+def _checksum(data):
+    """Internet checksum (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _build_echo(identifier, sequence, payload=b'nms-probe'):
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = _checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence) + payload
+
+
+def _open_socket():
+    """
+    Buka satu socket ICMP untuk seluruh batch.
+    Coba datagram ICMP dulu (tidak butuh root di Linux jika ping_group_range
+    mengizinkan), lalu raw socket. Return (socket, is_raw).
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        is_raw = False
+    except PermissionError:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        is_raw = True
+
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    except OSError:
+        pass
+    sock.setblocking(False)
+    return sock, is_raw
+
+
+def _parse_reply(packet, is_raw):
+    """Return (identifier, sequence) untuk echo reply, None untuk paket lain"""
+    if is_raw:
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, identifier, sequence = struct.unpack('!BBHHH', packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return identifier, sequence
+
+
+def probe(ips, timeout=2, count=1, max_in_flight=256, deadline=None, rate=None, timeouts=None):
+    """
+    Kirim ICMP echo ke banyak target lewat SATU socket dan kumpulkan reply.
+
+    Reply dicocokkan berdasarkan identifier + sequence number (dan alamat
+    pengirim). Paling banyak `max_in_flight` echo yang menunggu reply pada
+    satu waktu, dan jika `rate` diisi pengiriman dibatasi sekian paket per
+    detik. Jika `deadline` (detik) habis, pengiriman dihentikan dan target
+    yang belum selesai tidak dimasukkan ke hasil. `timeouts` ({ip: detik})
+    menggantikan `timeout` untuk target tertentu.
+
+    Return dict per IP:
+        {'sent', 'received', 'loss' (persen), 'rtt', 'rtt_min', 'rtt_max'}
+    dengan rtt dalam detik (rata-rata) atau None jika tidak ada reply.
+    """
+    targets = list(dict.fromkeys(ips))
+    if not targets:
+        return {}
+
+    stats = {ip: {'done': 0, 'rtts': []} for ip in targets}
+    addresses = {}
+    for ip in targets:
+        try:
+            addresses[ip] = socket.gethostbyname(ip)
+        except OSError:
+            # Tidak bisa di-resolve: semua echo dianggap hilang
+            stats[ip]['done'] = count
+
+    started = time.monotonic()
+    deadline_at = started + deadline if deadline is not None else None
+
+    sock, is_raw = _open_socket()
+    identifier = next(_identifiers) & 0xFFFF
+    sequences = itertools.count()
+    queue = deque((ip, n) for n in range(count) for ip in targets if ip in addresses)
+    outstanding = {}   # sequence -> (ip, sent_at)
+    expiries = []       # heap (expire_at, sequence)
+    timeouts = timeouts or {}
+    sent_count = 0
+    next_send_at = started
+
+    try:
+        while queue or outstanding:
+            now = time.monotonic()
+            if deadline_at is not None and now >= deadline_at:
+                break
+
+            while queue and len(outstanding) < max_in_flight:
+                if rate and time.monotonic() < next_send_at:
+                    break
+                ip, attempt = queue.popleft()
+                sequence = next(sequences) & 0xFFFF
+                try:
+                    sock.sendto(_build_echo(identifier, sequence), (addresses[ip], 0))
+                except BlockingIOError:
+                    queue.appendleft((ip, attempt))
+                    break
+                except OSError:
+                    # Mis. network unreachable: hitung sebagai loss
+                    stats[ip]['done'] += 1
+                    continue
+                sent_at = time.monotonic()
+                outstanding[sequence] = (ip, sent_at)
+                heapq.heappush(expiries, (sent_at + timeouts.get(ip, timeout), sequence))
+                sent_count += 1
+                if rate:
+                    next_send_at = started + sent_count / rate
+
+            # Echo yang melewati timeout dianggap hilang
+            now = time.monotonic()
+            while expiries and expiries[0][0] <= now:
+                _, sequence = heapq.heappop(expiries)
+                entry = outstanding.pop(sequence, None)
+                if entry:
+                    stats[entry[0]]['done'] += 1
+
+            if not outstanding and not queue:
+                continue
+
+            wait = expiries[0][0] - now if expiries else timeout
+            if rate and queue and len(outstanding) < max_in_flight:
+                wait = min(wait, next_send_at - now)
+            if deadline_at is not None:
+                wait = min(wait, deadline_at - now)
+            readable, _, _ = select.select([sock], [], [], max(wait, 0))
+            if not readable:
+                continue
+
+            while True:
+                try:
+                    packet, (source, _) = sock.recvfrom(2048)
+                except (BlockingIOError, InterruptedError):
+                    break
+                received_at = time.monotonic()
+
+                reply = _parse_reply(packet, is_raw)
+                if reply is None:
+                    continue
+                # Socket datagram: kernel mengganti identifier, cukup cocokkan sequence
+                if is_raw and reply[0] != identifier:
+                    continue
+                entry = outstanding.get(reply[1])
+                if entry is None or addresses[entry[0]] != source:
+                    continue
+
+                del outstanding[reply[1]]
+                ip, sent_at = entry
+                stats[ip]['done'] += 1
+                stats[ip]['rtts'].append(received_at - sent_at)
+    finally:
+        sock.close()
+
+    results = {}
+    for ip, stat in stats.items():
+        if not stat['done']:
+            continue
+        rtts = stat['rtts']
+        results[ip] = {
+            'sent': stat['done'],
+            'received': len(rtts),
+            'loss': round(100.0 * (stat['done'] - len(rtts)) / stat['done'], 1),
+            'rtt': sum(rtts) / len(rtts) if rtts else None,
+            'rtt_min': min(rtts) if rtts else None,
+            'rtt_max': max(rtts) if rtts else None,
+        }
+    return results
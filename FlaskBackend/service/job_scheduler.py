@@ -0,0 +1,179 @@
+from apscheduler.events import (
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED
+)
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from collections import deque
+from datetime import datetime
+import os
+import threading
+import time
+
+# Konfigurasi scheduler monitoring
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 10))
+SCHEDULER_JITTER_RATIO = float(os.getenv('SCHEDULER_JITTER_RATIO', 0.05))      # bagian dari interval
+SCHEDULER_DEADLINE_RATIO = float(os.getenv('SCHEDULER_DEADLINE_RATIO', 0.8))  # bagian dari interval
+
+# Jumlah run terakhir yang dipakai untuk rata-rata durasi
+DURATION_WINDOW = 20
+
+
+class MonitoringScheduler:
+    """
+    BackgroundScheduler untuk job monitoring dengan kontrol overlap dan
+    laporan waktu eksekusi.
+
+    Setiap job punya max_instances (default 1: run berikutnya dilewati jika
+    run sebelumnya belum selesai, dan dicatat sebagai `skipped`), coalesce
+    (run yang tertunda digabung menjadi satu) dan jitter agar job yang
+    intervalnya sama tidak mulai bersamaan. Job yang menerima deadline
+    diberi argumen `deadline` (detik, default SCHEDULER_DEADLINE_RATIO x
+    interval) untuk membatasi satu siklus. Durasi tiap run dibandingkan
+    dengan interval sehingga job yang tertinggal terlihat di stats().
+    """
+
+    def __init__(self, workers=SCHEDULER_WORKERS):
+        self._scheduler = BackgroundScheduler(
+            executors={'default': ThreadPoolExecutor(workers)},
+            job_defaults={'coalesce': True, 'max_instances': 1}
+        )
+        self._scheduler.add_listener(
+            self._on_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+        )
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def add(self, name, func, seconds, jitter=None, deadline=None, uses_deadline=False,
+            max_instances=1, first_run=None, description=None):
+        """
+        Daftarkan `func` setiap `seconds` detik. Jika `uses_deadline`, func
+        dipanggil dengan keyword `deadline` (detik).
+        """
+        jitter = seconds * SCHEDULER_JITTER_RATIO if jitter is None else jitter
+        if uses_deadline and deadline is None:
+            deadline = seconds * SCHEDULER_DEADLINE_RATIO
+        self._jobs[name] = {
+            'description': description or name,
+            'interval': seconds,
+            'jitter': round(jitter, 1),
+            'deadline': round(deadline, 1) if uses_deadline else None,
+            'max_instances': max_instances,
+            'runs': 0,
+            'running': 0,
+            'errors': 0,
+            'skipped': 0,
+            'missed': 0,
+            'overran_interval': 0,
+            'overran_deadline': 0,
+            'last_scheduled_at': None,
+            'last_started_at': None,
+            'last_start_lag': None,
+            'last_duration': None,
+            'max_duration': None,
+            'last_error': None,
+            'durations': deque(maxlen=DURATION_WINDOW)
+        }
+        self._scheduler.add_job(
+            self._run,
+            IntervalTrigger(seconds=seconds, jitter=jitter or None),
+            args=(name, func, {'deadline': deadline} if uses_deadline else {}),
+            id=name,
+            name=name,
+            max_instances=max_instances,
+            coalesce=True,
+            # Run yang terlambat kurang dari satu interval tetap dijalankan
+            misfire_grace_time=max(1, int(seconds)),
+            **({'next_run_time': first_run} if first_run is not None else {})
+        )
+
+    def _on_event(self, event):
+        job = self._jobs.get(event.job_id)
+        if job is None:
+            return
+        with self._lock:
+            if event.code == EVENT_JOB_SUBMITTED:
+                job['last_scheduled_at'] = event.scheduled_run_times[-1]
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                job['skipped'] += 1
+                print(f"⏳ Job {event.job_id} masih berjalan, run ini dilewati")
+            elif event.code == EVENT_JOB_MISSED:
+                job['missed'] += 1
+                print(f"⚠️ Job {event.job_id} terlambat lebih dari satu interval, run dilewati")
+
+    def _run(self, name, func, kwargs):
+        job = self._jobs[name]
+        started_at = datetime.now().astimezone()
+        started = time.monotonic()
+        with self._lock:
+            job['running'] += 1
+            job['last_started_at'] = started_at
+            if job['last_scheduled_at'] is not None:
+                job['last_start_lag'] = round((started_at - job['last_scheduled_at']).total_seconds(), 2)
+
+        error = None
+        try:
+            func(**kwargs)
+        except Exception as e:
+            error = str(e)
+            print(f"❌ Job {name} gagal: {e}")
+        finally:
+            duration = round(time.monotonic() - started, 2)
+            with self._lock:
+                job['running'] -= 1
+                job['runs'] += 1
+                job['last_duration'] = duration
+                job['max_duration'] = max(job['max_duration'] or 0, duration)
+                job['durations'].append(duration)
+                if error is not None:
+                    job['errors'] += 1
+                    job['last_error'] = error
+                if duration > job['interval']:
+                    job['overran_interval'] += 1
+                if job['deadline'] is not None and duration > job['deadline']:
+                    job['overran_deadline'] += 1
+
+        if duration > job['interval']:
+            print(f"⚠️ Job {name} berjalan {duration}s, lebih lama dari interval {job['interval']}s")
+
+    def start(self):
+        self._scheduler.start()
+
+    def shutdown(self, wait=False):
+        self._scheduler.shutdown(wait=wait)
+
+    def describe(self):
+        """Baris ringkas per job untuk log startup"""
+        return [
+            f"{job['description']}: every {job['interval']}s"
+            + (f" (deadline {job['deadline']}s)" if job['deadline'] is not None else "")
+            for job in self._jobs.values()
+        ]
+
+    def stats(self):
+        jobs = {}
+        with self._lock:
+            for name, job in self._jobs.items():
+                info = {key: value for key, value in job.items() if key != 'durations'}
+                durations = list(job['durations'])
+                info['avg_duration'] = round(sum(durations) / len(durations), 2) if durations else None
+                # Rasio durasi terhadap interval; mendekati/di atas 1 berarti job tertinggal
+                info['load'] = round(info['avg_duration'] / job['interval'], 3) if durations else None
+                info['behind'] = bool(
+                    durations and (durations[-1] > job['interval'] or info['load'] > SCHEDULER_DEADLINE_RATIO)
+                )
+                for key in ('last_scheduled_at', 'last_started_at'):
+                    info[key] = info[key].isoformat() if info[key] else None
+                scheduled = self._scheduler.get_job(name)
+                info['next_run_at'] = (
+                    scheduled.next_run_time.isoformat()
+                    if scheduled is not None and scheduled.next_run_time else None
+                )
+                jobs[name] = info
+        return {'running': self._scheduler.running, 'jobs': jobs}
+
+
+monitoring_scheduler = MonitoringScheduler()
@@ -0,0 +1,366 @@
+from db import get_db_connection
+from service.rollup_service import bandwidth_rollup
+from service.dashboard_snapshot import dashboard_snapshot
+from service.event_bus import event_bus
+from service.tsdb import tsdb
+from datetime import datetime
+from mysql.connector.errors import DataError, IntegrityError
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+# Konfigurasi writer time-series
+METRICS_BATCH_SIZE = int(os.getenv('METRICS_BATCH_SIZE', 500))            # baris per flush
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 2))     # detik
+METRICS_QUEUE_SIZE = int(os.getenv('METRICS_QUEUE_SIZE', 10000))
+METRICS_PUT_TIMEOUT = float(os.getenv('METRICS_PUT_TIMEOUT', 5))           # detik producer menunggu saat antrian penuh
+METRICS_MAX_RETRIES = int(os.getenv('METRICS_MAX_RETRIES', 5))
+
+# Kolom yang ditulis per tabel
+TABLES = {
+    'bandwidth_history': (
+        'device_id', 'interface_index', 'in_bytes_per_sec', 'out_bytes_per_sec',
+        'in_mbps', 'out_mbps', 'total_mbps', 'timestamp'
+    ),
+    'wifi_client_history': ('device_id', 'client_count', 'timestamp'),
+    'alert_history': (
+        'device_id', 'alert_type', 'severity', 'message', 'summary', 'category',
+        'alert_data', 'attempts', 'last_error', 'created_at'
+    )
+}
+
+_STOP = object()
+
+
+class MetricsWriter:
+    """
+    Buffer sampel time-series dari semua producer (job scheduler dan route)
+    yang ditulis ke database dalam INSERT multi-baris.
+
+    Flush dilakukan oleh satu thread setiap `batch_size` baris terkumpul atau
+    setiap `flush_interval` detik. Antrian dibatasi `queue_size`: jika
+    database lambat dan antrian penuh, producer menunggu sampai `put_timeout`
+    detik (backpressure) sebelum sampel dibuang.
+
+    Setiap tabel ditulis dan di-retry dalam transaksinya sendiri, sehingga
+    tabel yang gagal tidak ikut membuang baris tabel lain. Hook dijalankan
+    setelah commit berhasil, hanya dengan baris yang benar-benar tersimpan.
+    Baris tabel yang punya fallback (alert_history) tidak dibuang saat retry
+    habis, lihat add_fallback.
+    """
+
+    def __init__(self, batch_size=METRICS_BATCH_SIZE, flush_interval=METRICS_FLUSH_INTERVAL,
+                 queue_size=METRICS_QUEUE_SIZE, put_timeout=METRICS_PUT_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._hooks = {}
+        self._replace_hooks = {}
+        self._replaced = set()
+        self._fallbacks = {}
+        self._stats = {
+            'queued': 0,
+            'written': 0,
+            'batches': 0,
+            'dropped': 0,
+            'failed_batches': 0,
+            'requeued': 0,
+            'last_flush_rows': 0,
+            'last_flush_ms': 0.0
+        }
+
+    def add_hook(self, table, hook, replace_insert=False):
+        """
+        Daftarkan hook(rows) yang dipanggil sekali per flush untuk baris
+        `table` yang sudah di-commit. Hook boleh mengembalikan callable
+        apply(cursor) yang dijalankan dalam transaksi terpisah sesudahnya
+        (mis. upsert rollup).
+
+        Dengan replace_insert=True baris tidak di-INSERT ke `table` karena
+        hook sudah menyimpannya di tempat lain (mis. TSDB lokal). Hook ini
+        dipanggil sebelum commit dan apply-nya ikut transaksi tabel.
+        """
+        if replace_insert:
+            self._replace_hooks.setdefault(table, []).append(hook)
+            self._replaced.add(table)
+        else:
+            self._hooks.setdefault(table, []).append(hook)
+
+    def add_fallback(self, table, handler):
+        """
+        Baris `table` yang gagal ditulis setelah semua retry dikembalikan ke
+        antrian untuk flush berikutnya. Baris yang tidak muat di antrian
+        diserahkan ke handler(rows) (mis. dikirim langsung tanpa outbox).
+        """
+        self._fallbacks[table] = handler
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, table, row, block=True):
+        """
+        Masukkan satu baris (tuple sesuai TABLES[table]) ke antrian. Dengan
+        block=False baris langsung dibuang jika antrian penuh.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put((table, row), block=block, timeout=self.put_timeout if block else None)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            print(f"⚠️ Antrian metrics penuh, sampel {table} dibuang")
+            return False
+        with self._lock:
+            self._stats['queued'] += 1
+        return True
+
+    def write_bandwidth(self, device_id, bandwidth_data, interface_index=2, timestamp=None):
+        return self.submit('bandwidth_history', (
+            device_id,
+            interface_index,
+            bandwidth_data.get('in_bytes_per_sec', 0),
+            bandwidth_data.get('out_bytes_per_sec', 0),
+            bandwidth_data.get('in_mbps', 0),
+            bandwidth_data.get('out_mbps', 0),
+            bandwidth_data.get('total_mbps', 0),
+            timestamp or datetime.now()
+        ))
+
+    def write_wifi_clients(self, device_id, client_count, timestamp=None):
+        return self.submit('wifi_client_history', (device_id, client_count, timestamp or datetime.now()))
+
+    def write_alert(self, device_id, alert_type, severity, message, summary=None, category=None,
+                    alert_data=None, attempts=0, last_error=None, created_at=None):
+        # Tidak menunggu antrian: producer alert adalah job check yang tidak boleh tertahan
+        return self.submit('alert_history', (
+            device_id,
+            alert_type,
+            severity,
+            message,
+            summary,
+            category,
+            json.dumps(alert_data, default=str) if alert_data is not None else None,
+            attempts,
+            last_error,
+            created_at or datetime.now()
+        ), block=False)
+
+    def _run(self):
+        while True:
+            batch = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            if batch:
+                self._flush(batch)
+            if stop:
+                return
+
+    def _insert(self, cursor, table, values):
+        columns = TABLES[table]
+        # executemany pada INSERT ... VALUES dikirim sebagai satu INSERT multi-baris
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})",
+            values
+        )
+
+    def _insert_rows(self, cursor, table, values, error):
+        """
+        INSERT multi-baris ditolak karena isi baris (mis. device_id yang sudah
+        dihapus). Retry tidak akan berhasil, jadi tulis per baris dan buang
+        hanya baris yang bermasalah. Return baris yang berhasil.
+        """
+        print(f"⚠️ INSERT {table} ditolak ({error}), ditulis per baris")
+        written = []
+        for row in values:
+            try:
+                self._insert(cursor, table, [row])
+            except (IntegrityError, DataError) as e:
+                print(f"❌ Baris {table} dibuang: {e}")
+                continue
+            written.append(row)
+        return written
+
+    def _write_table(self, table, values):
+        """
+        Tulis baris satu tabel dalam satu transaksi, retry jika database
+        bermasalah. Return baris yang tersimpan, None jika database tetap
+        gagal setelah METRICS_MAX_RETRIES percobaan.
+        """
+        extra = []
+        for hook in self._replace_hooks.get(table, []):
+            try:
+                apply = hook(values)
+            except Exception as e:
+                print(f"❌ Hook metrics {table} gagal, {len(values)} sampel tidak tersimpan: {e}")
+                return []
+            if apply is not None:
+                extra.append(apply)
+
+        for attempt in range(1, METRICS_MAX_RETRIES + 1):
+            conn = None
+            try:
+                conn = get_db_connection()
+                cursor = conn.cursor()
+                written = values
+                if table not in self._replaced:
+                    try:
+                        self._insert(cursor, table, values)
+                    except (IntegrityError, DataError) as e:
+                        written = self._insert_rows(cursor, table, values, e)
+                for apply in extra:
+                    apply(cursor)
+                conn.commit()
+                cursor.close()
+                return written
+            except Exception as e:
+                print(f"❌ Gagal menulis {len(values)} sampel {table} (percobaan {attempt}): {e}")
+                if attempt == METRICS_MAX_RETRIES:
+                    with self._lock:
+                        self._stats['failed_batches'] += 1
+                    return None
+                # Selama retry antrian tidak dikosongkan, producer ikut tertahan
+                time.sleep(min(2 ** attempt, 30))
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _run_hooks(self, table, values):
+        """Jalankan hook untuk baris yang sudah di-commit, apply-nya dalam satu transaksi"""
+        extra = []
+        for hook in self._hooks.get(table, []):
+            try:
+                apply = hook(values)
+            except Exception as e:
+                print(f"❌ Hook metrics {table} gagal: {e}")
+                continue
+            if apply is not None:
+                extra.append(apply)
+        if not extra:
+            return
+
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            for apply in extra:
+                apply(cursor)
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            print(f"❌ Update turunan {table} gagal: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _recover(self, table, values):
+        """Kembalikan baris yang gagal ke antrian. Return jumlah baris yang tertangani"""
+        handler = self._fallbacks.get(table)
+        if handler is None:
+            return 0
+
+        overflow = []
+        for row in values:
+            try:
+                self._queue.put_nowait((table, row))
+            except queue.Full:
+                overflow.append(row)
+        requeued = len(values) - len(overflow)
+        with self._lock:
+            self._stats['requeued'] += requeued
+        print(f"🔁 {requeued} sampel {table} dikembalikan ke antrian")
+
+        if overflow:
+            try:
+                handler(overflow)
+            except Exception as e:
+                print(f"❌ Fallback {table} gagal, {len(overflow)} sampel dibuang: {e}")
+                return requeued
+        return len(values)
+
+    def _flush(self, batch):
+        rows = {}
+        for table, row in batch:
+            rows.setdefault(table, []).append(row)
+
+        started = time.monotonic()
+        written = 0
+        recovered = 0
+        for table, values in rows.items():
+            saved = self._write_table(table, values)
+            if saved is None:
+                recovered += self._recover(table, values)
+                continue
+            written += len(saved)
+            if saved:
+                self._run_hooks(table, saved)
+
+        with self._lock:
+            self._stats['written'] += written
+            self._stats['dropped'] += len(batch) - written - recovered
+            self._stats['batches'] += 1
+            self._stats['last_flush_rows'] = written
+            self._stats['last_flush_ms'] = round((time.monotonic() - started) * 1000, 2)
+
+    def stop(self, timeout=10):
+        """Flush sisa antrian lalu hentikan thread writer"""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'pending': self._queue.qsize(),
+            'queue_size': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval
+        })
+        return stats
+
+
+metrics_writer = MetricsWriter()
+# Rollup 1m/1h/1d diperbarui setiap flush bandwidth_history
+metrics_writer.add_hook('bandwidth_history', bandwidth_rollup.hook)
+# Jika TSDB lokal aktif, sampel mentah bandwidth dan WiFi disimpan di sana, bukan di MySQL
+if tsdb is not None:
+    metrics_writer.add_hook('bandwidth_history', tsdb.hook, replace_insert=True)
+    metrics_writer.add_hook('wifi_client_history', tsdb.wifi_hook, replace_insert=True)
+# Snapshot dashboard ikut diperbarui dari sampel yang ditulis
+metrics_writer.add_hook('bandwidth_history', dashboard_snapshot.bandwidth_hook)
+metrics_writer.add_hook('wifi_client_history', dashboard_snapshot.wifi_hook)
+metrics_writer.add_hook('alert_history', dashboard_snapshot.alert_hook)
+# Sampel baru di-broadcast ke client /api/stream
+metrics_writer.add_hook('bandwidth_history', event_bus.bandwidth_hook)
+metrics_writer.add_hook('wifi_client_history', event_bus.wifi_hook)
+atexit.register(metrics_writer.stop)
@@ -1,58 +1,211 @@
-from ping3 import ping
 from db import get_db_connection
 from datetime import datetime
-from pysnmp.hlapi import *
+from service.discovery_service import run_scan
+from service.sweep_service import sweep
+from service import snmp_client
+from service.counter_store import counter_store
+from service.dashboard_snapshot import dashboard_snapshot
+from service.event_bus import event_bus
 import time
 
+# Jumlah device per statement UPDATE saat menyimpan hasil check
+STATUS_WRITE_BATCH = 1000
+
+
+def save_check_results(cursor, devices, results, checked_at=None):
+    """
+    Simpan hasil sweep untuk semua device dengan satu UPDATE per batch.
+
+    Status hanya ditulis ulang untuk device yang statusnya berubah (CASE),
+    device lain cukup mendapat last_checked baru. Device yang tidak ada di
+    `results` (belum dicek sebelum deadline) tidak disentuh. Commit
+    dilakukan oleh pemanggil.
+
+    Return list (device, new_status) untuk device yang statusnya berubah.
+    """
+    checked_at = checked_at or datetime.now()
+    checked = []
+    changes = []
+    for device in devices:
+        if device['ip_address'] not in results:
+            continue
+        new_status = 'up' if results[device['ip_address']] is not None else 'down'
+        checked.append(device['id'])
+        if new_status != device['status']:
+            changes.append((device, new_status))
+
+    changed_status = {device['id']: status for device, status in changes}
+    for i in range(0, len(checked), STATUS_WRITE_BATCH):
+        batch = checked[i:i + STATUS_WRITE_BATCH]
+        batch_changes = [(device_id, changed_status[device_id]) for device_id in batch if device_id in changed_status]
+
+        params = []
+        status_sql = "status"
+        if batch_changes:
+            status_sql = "CASE id " + " ".join("WHEN %s THEN %s" for _ in batch_changes) + " ELSE status END"
+            for device_id, status in batch_changes:
+                params.extend((device_id, status))
+        params.append(checked_at)
+        params.extend(batch)
+
+        cursor.execute(
+            f"UPDATE devices SET status={status_sql}, last_checked=%s "
+            f"WHERE id IN ({', '.join(['%s'] * len(batch))})",
+            params
+        )
+
+    return changes
+
+
+def publish_check_results(devices, results, changes, checked_at):
+    """Broadcast hasil satu siklus check ke client stream (satu event per siklus)"""
+    event_bus.publish('status', {
+        'checked_at': checked_at,
+        'checked': [device['id'] for device in devices if device['ip_address'] in results],
+        'changes': [{'device_id': device['id'], 'status': status} for device, status in changes]
+    })
+
+
 def check_devices():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     cursor.execute("SELECT * FROM devices")
     devices = cursor.fetchall()
 
-    for device in devices:
-        response = ping(device['ip_address'], timeout=2)
-        status = 'up' if response else 'down'
+    results = sweep([device['ip_address'] for device in devices], timeout=2)
 
-        cursor.execute("""
-            UPDATE devices SET status=%s, last_checked=%s WHERE id=%s
-        """, (status, datetime.now(), device['id']))
-        conn.commit()
+    checked_at = datetime.now()
+    changes = save_check_results(cursor, devices, results, checked_at)
+    conn.commit()
+    dashboard_snapshot.sync_devices(devices, changes)
+    publish_check_results(devices, results, changes, checked_at)
 
     cursor.close()
     conn.close()
 
 
-def get_interface_bandwidth(ip, community='public', interface_index=2):
+# sysUpTime, dipakai untuk mendeteksi counter reset (device reboot)
+OID_SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+
+# Counter 32-bit (IF-MIB ifTable) dan 64-bit (IF-MIB ifXTable)
+OID_IF_IN_OCTETS = '1.3.6.1.2.1.2.2.1.10'
+OID_IF_OUT_OCTETS = '1.3.6.1.2.1.2.2.1.16'
+OID_IF_HC_IN_OCTETS = '1.3.6.1.2.1.31.1.1.1.6'
+OID_IF_HC_OUT_OCTETS = '1.3.6.1.2.1.31.1.1.1.10'
+
+# Hasil deteksi untuk IP yang tidak ada di tabel devices (mis. /traffic/<ip>)
+_hc_support = {}
+
+
+def detect_hc_counters(ip, community='public', interface_index=2):
+    """
+    Cek apakah agent menyediakan ifHCInOctets/ifHCOutOctets (Counter64, butuh SNMPv2c).
+    Return True/False, atau None jika device tidak merespon (coba lagi nanti).
+    """
+    oid_in = f'{OID_IF_HC_IN_OCTETS}.{interface_index}'
+    oid_out = f'{OID_IF_HC_OUT_OCTETS}.{interface_index}'
+    
+    error, values = snmp_client.get_many(ip, community, [oid_in, oid_out], mp_model=1)
+    if error and not values:
+        # Tidak ada jawaban SNMPv2c: agent v1-only jika v1 masih menjawab
+        error, values = snmp_client.get_many(ip, community, [OID_SYS_UPTIME])
+        return False if not error else None
+    return values.get(oid_in) is not None and values.get(oid_out) is not None
+
+
+def resolve_hc_counters(device, community='public'):
+    """
+    Tentukan apakah device dipoll dengan counter 64-bit.
+    Hasil deteksi disimpan di kolom devices.hc_counters sehingga deteksi hanya
+    berjalan sekali per device.
+    """
+    if device.get('hc_counters') is not None:
+        return bool(device['hc_counters'])
+    
+    ip = device['ip_address']
+    interface_index = device.get('interface_index') or 2
+    
+    if not device.get('id'):
+        key = (ip, interface_index)
+        if key not in _hc_support:
+            detected = detect_hc_counters(ip, community, interface_index)
+            if detected is None:
+                return False
+            _hc_support[key] = detected
+        return _hc_support[key]
+    
+    detected = detect_hc_counters(ip, community, interface_index)
+    if detected is None:
+        return False
+    
+    device['hc_counters'] = detected
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE devices SET hc_counters=%s WHERE id=%s", (detected, device['id']))
+        conn.commit()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error saving counter capability for {ip}: {e}")
+    
+    print(f"🔎 {ip}: {'64-bit (ifHC*)' if detected else '32-bit'} counters")
+    return detected
+
+
+def _read_counters(ip, community, oid_in, oid_out, mp_model=0):
+    """Baca counter in/out + sysUpTime dalam satu PDU"""
+    error, values = snmp_client.get_many(ip, community, [oid_in, oid_out, OID_SYS_UPTIME], mp_model=mp_model)
+    
+    if error or values.get(oid_in) is None or values.get(oid_out) is None:
+        return None
+    
+    uptime = values.get(OID_SYS_UPTIME)
+    return int(values[oid_in]), int(values[oid_out]), int(uptime) if uptime is not None else None
+
+
+def get_interface_bandwidth(ip, community='public', interface_index=2, hc_counters=False):
     """
     Mengambil data bandwidth interface menggunakan SNMP
     interface_index: 1=lo, 2=eth0, dll (sesuaikan dengan perangkat)
+    hc_counters: pakai counter 64-bit ifHCInOctets/ifHCOutOctets (lihat resolve_hc_counters)
+    
+    Rate dihitung dari selisih dengan sampel polling sebelumnya (counter_store),
+    jadi cukup satu round trip SNMP. Hanya jika belum ada sampel sebelumnya
+    (atau counter reset) diambil sampel kedua setelah 1 detik.
     """
     # OID untuk traffic counter
-    oid_in = f'1.3.6.1.2.1.2.2.1.10.{interface_index}'   # ifInOctets
-    oid_out = f'1.3.6.1.2.1.2.2.1.16.{interface_index}'  # ifOutOctets
+    if hc_counters:
+        oid_in = f'{OID_IF_HC_IN_OCTETS}.{interface_index}'    # ifHCInOctets
+        oid_out = f'{OID_IF_HC_OUT_OCTETS}.{interface_index}'  # ifHCOutOctets
+        mp_model, bits = 1, 64
+    else:
+        oid_in = f'{OID_IF_IN_OCTETS}.{interface_index}'       # ifInOctets
+        oid_out = f'{OID_IF_OUT_OCTETS}.{interface_index}'     # ifOutOctets
+        mp_model, bits = 0, 32
+    key = (ip, interface_index)
     
     try:
-        # Ambil nilai pertama
-        in_octets_1 = get_snmp_value(ip, community, oid_in)
-        out_octets_1 = get_snmp_value(ip, community, oid_out)
-        
-        if in_octets_1 is None or out_octets_1 is None:
+        counters = _read_counters(ip, community, oid_in, oid_out, mp_model)
+        if counters is None:
             return None
         
-        # Tunggu 1 detik
-        time.sleep(1)
+        rates = counter_store.update(key, *counters, bits=bits)
         
-        # Ambil nilai kedua
-        in_octets_2 = get_snmp_value(ip, community, oid_in)
-        out_octets_2 = get_snmp_value(ip, community, oid_out)
-        
-        if in_octets_2 is None or out_octets_2 is None:
-            return None
+        if rates is None:
+            # Belum ada baseline: tunggu 1 detik lalu ambil sampel kedua
+            time.sleep(1)
+            
+            counters = _read_counters(ip, community, oid_in, oid_out, mp_model)
+            if counters is None:
+                return None
+            
+            rates = counter_store.update(key, *counters, bits=bits)
+            if rates is None:
+                return None
         
-        # Hitung bandwidth (bytes per second)
-        in_bps = (in_octets_2 - in_octets_1)
-        out_bps = (out_octets_2 - out_octets_1)
+        # Bandwidth (bytes per second)
+        in_bps, out_bps, elapsed = rates
         
         # Convert ke Mbps
         in_mbps = (in_bps * 8) / (1024 * 1024)
@@ -61,8 +214,9 @@ def get_interface_bandwidth(ip, community='public', interface_index=2):
         return {
             'ip': ip,
             'interface_index': interface_index,
-            'in_bytes_per_sec': in_bps,
-            'out_bytes_per_sec': out_bps,
+            'counter_bits': bits,
+            'in_bytes_per_sec': int(round(in_bps)),
+            'out_bytes_per_sec': int(round(out_bps)),
             'in_mbps': round(in_mbps, 2),
             'out_mbps': round(out_mbps, 2),
             'total_mbps': round(in_mbps + out_mbps, 2),
@@ -76,33 +230,15 @@ def get_interface_bandwidth(ip, community='public', interface_index=2):
 
 def get_snmp_value(ip, community, oid):
     """Helper function untuk mendapatkan nilai SNMP"""
-    try:
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161), timeout=2, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-
-        if errorIndication:
-            print(f"SNMP error: {errorIndication}")
-            return None
-        elif errorStatus:
-            print(f"SNMP error: {errorStatus.prettyPrint()}")
-            return None
-        else:
-            for varBind in varBinds:
-                return int(varBind[1])
-    except Exception as e:
-        print(f"Error SNMP {ip}: {e}")
-        return None
+    return snmp_client.get_value(ip, community, oid)
 
 
 def get_interface_info(ip, community='public'):
-    """Mendapatkan daftar interface yang tersedia"""
+    """
+    Mendapatkan daftar interface yang tersedia. Return None jika SNMP gagal
+    (bukan list kosong), agar poll cache hanya menyimpannya selama
+    POLL_CACHE_ERROR_TTL.
+    """
     interfaces = []
     
     # OID untuk interface description dan status
@@ -110,44 +246,38 @@ def get_interface_info(ip, community='public'):
     base_oid_status = '1.3.6.1.2.1.2.2.1.8'  # ifOperStatus
     
     try:
-        # Scan interface 1-10 (bisa disesuaikan)
-        for i in range(1, 11):
-            desc = get_snmp_string(ip, community, f'{base_oid_desc}.{i}')
-            status = get_snmp_value(ip, community, f'{base_oid_status}.{i}')
+        # Walk kolom ifDescr & ifOperStatus sekaligus dengan GETBULK
+        error, table = snmp_client.walk_table(ip, community, [base_oid_desc, base_oid_status])
+        
+        if error:
+            print(f"SNMP error: {error}")
+            # Walk gagal sebelum ada baris yang terbaca
+            if not any(table.values()):
+                return None
+        
+        descriptions = table.get(base_oid_desc, {})
+        statuses = table.get(base_oid_status, {})
+        
+        for index in sorted(descriptions, key=int):
+            desc = descriptions[index]
+            status = statuses.get(index)
             
             if desc and status:
                 interfaces.append({
-                    'index': i,
-                    'description': desc,
-                    'status': 'up' if status == 1 else 'down'
+                    'index': int(index),
+                    'description': str(desc),
+                    'status': 'up' if int(status) == 1 else 'down'
                 })
         
         return interfaces
     except Exception as e:
         print(f"❌ Error getting interfaces for {ip}: {e}")
-        return []
+        return None
 
 
 def get_snmp_string(ip, community, oid):
     """Helper function untuk mendapatkan string dari SNMP"""
-    try:
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161), timeout=2, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-
-        if errorIndication or errorStatus:
-            return None
-        else:
-            for varBind in varBinds:
-                return str(varBind[1])
-    except Exception as e:
-        return None
+    return snmp_client.get_string(ip, community, oid)
 
 
 def get_wifi_clients(ip, community='public'):
@@ -175,23 +305,10 @@ def get_wifi_clients(ip, community='public'):
         # Walk the MikroTik wireless registration table
         for oid in oids_to_try:
             try:
-                iterator = nextCmd(
-                    SnmpEngine(),
-                    CommunityData(community, mpModel=0),
-                    UdpTransportTarget((ip, 161), timeout=2, retries=1),
-                    ContextData(),
-                    ObjectType(ObjectIdentity(oid)),
-                    lexicographicMode=False
-                )
-                
-                count = 0
-                for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-                    if errorIndication or errorStatus:
-                        break
-                    count += 1
-                    if count > 100:  # Limit to prevent infinite loop
-                        break
+                # Limit to prevent infinite loop
+                error, table = snmp_client.walk_table(ip, community, [oid], max_rows=101)
                 
+                count = len(table.get(oid, {}))
                 if count > 0:
                     return count
                     
@@ -223,20 +340,10 @@ def get_signal_strength(ip, community='public', client_mac=None):
     
     try:
         signals = []
-        iterator = nextCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161), timeout=2, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid_signal)),
-            lexicographicMode=False
-        )
+        error, table = snmp_client.walk_table(ip, community, [oid_signal])
         
-        for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-            if errorIndication or errorStatus:
-                break
-            for varBind in varBinds:
-                signals.append(int(varBind[1]))
+        for value in table.get(oid_signal, {}).values():
+            signals.append(int(value))
                 
         if signals:
             avg_signal = sum(signals) / len(signals)
@@ -256,30 +363,12 @@ def get_signal_strength(ip, community='public', client_mac=None):
 
 def scan_network(network_range='192.168.1.0/24'):
     """
-    Scan network untuk menemukan device yang aktif
+    Scan network untuk menemukan device yang aktif (sinkron).
+    Untuk range besar gunakan discovery_service.start_scan agar berjalan di background.
     """
-    import ipaddress
-    
-    active_devices = []
-    
     try:
-        network = ipaddress.ip_network(network_range, strict=False)
-        
         print(f"🔍 Scanning network {network_range}...")
-        
-        for ip in network.hosts():
-            ip_str = str(ip)
-            response = ping(ip_str, timeout=1)
-            
-            if response:
-                active_devices.append({
-                    'ip': ip_str,
-                    'latency': round(response * 1000, 2),  # Convert to ms
-                    'status': 'up'
-                })
-                print(f"✅ Found: {ip_str}")
-        
-        return active_devices
+        return run_scan(network_range)
         
     except Exception as e:
         print(f"❌ Error scanning network: {e}")
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+# Umur maksimal hasil poll (detik) sebelum endpoint API melakukan SNMP lagi
+POLL_CACHE_TTL = {
+    'bandwidth': float(os.getenv('POLL_CACHE_TTL_BANDWIDTH', 60)),
+    'interfaces': float(os.getenv('POLL_CACHE_TTL_INTERFACES', 600)),
+    'wifi_clients': float(os.getenv('POLL_CACHE_TTL_WIFI', 60))
+}
+# Hasil gagal (device tidak menjawab) di-cache sebentar agar tidak terus dicoba
+POLL_CACHE_ERROR_TTL = float(os.getenv('POLL_CACHE_ERROR_TTL', 10))
+
+
+class _Flight:
+    """Satu fetch yang sedang berjalan; request lain untuk key sama menunggu di sini"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PollCache:
+    """
+    Cache hasil poll terbaru per (device_id, metric, ...), dipakai bersama
+    oleh scheduler dan endpoint API.
+
+    Scheduler mengisi cache lewat put() setiap kali polling, sehingga
+    endpoint biasanya cukup membaca nilai yang ada. Jika nilai lebih tua
+    dari TTL metric, get() menjalankan fetch sekali saja: request lain yang
+    datang bersamaan untuk key yang sama menunggu hasil fetch tersebut
+    (single-flight) alih-alih mengirim SNMP sendiri-sendiri.
+    """
+
+    def __init__(self, ttl=POLL_CACHE_TTL, error_ttl=POLL_CACHE_ERROR_TTL):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._lock = threading.Lock()
+        self._entries = {}       # key -> (value, fetched_at monotonic)
+        self._flights = {}       # key -> _Flight
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'fetch_errors': 0}
+
+    def _fresh(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        max_age = self.ttl.get(key[1], 0) if value is not None else self.error_ttl
+        if now - fetched_at > max_age:
+            return None
+        return entry
+
+    def put(self, key, value):
+        """Simpan hasil poll (dipanggil scheduler setelah polling)"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def get(self, key, fetch):
+        """
+        Return (value, age dalam detik). `fetch()` hanya dipanggil jika cache
+        kosong atau kadaluarsa, dan hanya oleh satu thread per key. Nilai None
+        dari fetch dianggap gagal dan di-cache selama error_ttl.
+        """
+        with self._lock:
+            now = time.monotonic()
+            entry = self._fresh(key, now)
+            if entry is not None:
+                self._stats['hits'] += 1
+                return entry[0], round(now - entry[1], 1)
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, 0.0
+
+        try:
+            flight.value = fetch()
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    self._entries[key] = (flight.value, time.monotonic())
+                if flight.value is None:
+                    self._stats['fetch_errors'] += 1
+                del self._flights[key]
+            flight.done.set()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, 0.0
+
+    def forget(self, device_id):
+        """Hapus semua entry milik device (mis. device dihapus atau diubah)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == device_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['in_flight'] = len(self._flights)
+            stats['ttl'] = dict(self.ttl)
+            stats['error_ttl'] = self.error_ttl
+        return stats
+
+
+poll_cache = PollCache()
@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+
+# Batas polling paralel (total dan per IP target) dan deadline satu siklus (detik)
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 32))
+POLL_PER_TARGET_CONCURRENCY = int(os.getenv('POLL_PER_TARGET_CONCURRENCY', 1))
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', 120))
+
+_DONE = object()
+
+
+def _label(item):
+    return item.get('name', item) if isinstance(item, dict) else item
+
+
+def run_pipeline(items, collect, write, target_key=None, concurrency=None,
+                 per_target=None, deadline=None, name='poll'):
+    """
+    Poll semua item sekaligus lalu tulis hasilnya lewat satu writer.
+
+    collect(item) dijalankan paralel (maks `concurrency` sekaligus dan
+    maks `per_target` untuk item dengan target_key(item) yang sama, mis.
+    beberapa fake router di IP yang sama). Setiap hasil yang bukan None
+    dikirim ke antrian dan ditulis berurutan oleh write(item, result) di
+    satu thread, sehingga koneksi database cukup satu. Collector yang belum
+    selesai saat `deadline` habis dibatalkan dan hasilnya diabaikan.
+
+    Return statistik siklus: total, written, failed, timed_out, elapsed.
+    """
+    items = list(items)
+    stats = {'total': len(items), 'written': 0, 'failed': 0, 'timed_out': 0, 'elapsed': 0.0}
+    if not items:
+        return stats
+
+    started = time.monotonic()
+    asyncio.run(_run(
+        items, collect, write,
+        target_key or (lambda item: None),
+        concurrency or POLL_CONCURRENCY,
+        per_target or POLL_PER_TARGET_CONCURRENCY,
+        POLL_DEADLINE if deadline is None else deadline,
+        stats
+    ))
+    stats['elapsed'] = round(time.monotonic() - started, 2)
+
+    print(f"⏱️ {name}: {stats['written']}/{stats['total']} device dalam {stats['elapsed']}s"
+          + (f", {stats['failed']} gagal" if stats['failed'] else "")
+          + (f", {stats['timed_out']} melewati deadline" if stats['timed_out'] else ""))
+    return stats
+
+
+async def _run(items, collect, write, target_key, concurrency, per_target, deadline, stats):
+    loop = asyncio.get_running_loop()
+    collectors = ThreadPoolExecutor(max_workers=min(concurrency, len(items)), thread_name_prefix='poll')
+    writer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='poll-writer')
+    queue = asyncio.Queue()
+    limit = asyncio.Semaphore(concurrency)
+    target_limits = {}
+
+    async def collect_one(item):
+        key = target_key(item)
+        target_limit = target_limits.setdefault(key, asyncio.Semaphore(per_target))
+        async with target_limit, limit:
+            try:
+                result = await loop.run_in_executor(collectors, collect, item)
+            except Exception as e:
+                print(f"❌ Error polling {_label(item)}: {e}")
+                stats['failed'] += 1
+                return
+        if result is None:
+            stats['failed'] += 1
+        else:
+            await queue.put((item, result))
+
+    async def writer():
+        while True:
+            entry = await queue.get()
+            if entry is _DONE:
+                return
+            try:
+                await loop.run_in_executor(writer_thread, write, *entry)
+                stats['written'] += 1
+            except Exception as e:
+                print(f"❌ Error writing poll result for {_label(entry[0])}: {e}")
+                stats['failed'] += 1
+
+    writer_task = asyncio.create_task(writer())
+    tasks = [asyncio.create_task(collect_one(item)) for item in items]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        stats['timed_out'] = len(pending)
+
+        # Hasil yang sudah masuk antrian tetap ditulis
+        await queue.put(_DONE)
+        await writer_task
+    finally:
+        collectors.shutdown(wait=False, cancel_futures=True)
+        writer_thread.shutdown(wait=True)
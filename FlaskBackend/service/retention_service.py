@@ -0,0 +1,241 @@
+from db import get_db_connection
+from service.tsdb import tsdb
+from datetime import date, datetime, timedelta
+import os
+import threading
+import time
+
+# Hari pertama yang dibuatkan partisi ke depan, dan ukuran chunk DELETE
+RETENTION_PARTITIONS_AHEAD = int(os.getenv('RETENTION_PARTITIONS_AHEAD', 3))
+RETENTION_DELETE_CHUNK = int(os.getenv('RETENTION_DELETE_CHUNK', 5000))
+RETENTION_DELETE_PAUSE = float(os.getenv('RETENTION_DELETE_PAUSE', 0.1))   # detik antar chunk
+
+# Tabel -> (kolom waktu, umur data dalam hari)
+RETENTION_POLICIES = {
+    'bandwidth_history': ('timestamp', int(os.getenv('RETENTION_RAW_DAYS', 7))),
+    'wifi_client_history': ('timestamp', int(os.getenv('RETENTION_RAW_DAYS', 7))),
+    'bandwidth_rollup_1m': ('bucket', int(os.getenv('RETENTION_ROLLUP_1M_DAYS', 14))),
+    'bandwidth_rollup_1h': ('bucket', int(os.getenv('RETENTION_ROLLUP_1H_DAYS', 365))),
+    'bandwidth_rollup_1d': ('bucket', int(os.getenv('RETENTION_ROLLUP_1D_DAYS', 1825))),
+    'alert_history': ('created_at', int(os.getenv('RETENTION_ALERT_DAYS', 90)))
+}
+
+# Tabel tanpa foreign key ke devices (karena dipartisi), dibersihkan saat device dihapus
+DEVICE_HISTORY_TABLES = ('bandwidth_history', 'wifi_client_history', 'bandwidth_rollup_1m')
+
+
+def _partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+def _to_days(day):
+    # TO_DAYS() MySQL dihitung dari tahun 0, ordinal Python dari tahun 1
+    return day.toordinal() + 365
+
+
+def _from_days(days):
+    return date.fromordinal(days - 365)
+
+
+class RetentionManager:
+    """
+    Menghapus data history yang melewati RETENTION_POLICIES.
+
+    Tabel yang dipartisi per hari (PARTITION BY RANGE (TO_DAYS(kolom))
+    dengan partisi pYYYYMMDD dan pmax) dibersihkan dengan DROP PARTITION
+    untuk setiap partisi yang seluruh isinya sudah kadaluarsa, dan partisi
+    untuk RETENTION_PARTITIONS_AHEAD hari ke depan dibuat dari pmax. Tabel
+    lain memakai DELETE per chunk agar tidak mengunci tabel lama.
+    """
+
+    def __init__(self, policies=RETENTION_POLICIES):
+        self.policies = policies
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+        self._state = {
+            'running': False,
+            'current_table': None,
+            'last_started_at': None,
+            'last_finished_at': None,
+            'last_duration': None,
+            'runs': 0,
+            'tables': {}
+        }
+
+    def _partitions(self, cursor, table):
+        cursor.execute("""
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (table,))
+        return cursor.fetchall()
+
+    def _ensure_future_partitions(self, cursor, table, partitions, today):
+        bounds = [int(bound) for _, bound in partitions if bound != 'MAXVALUE']
+        has_max = any(bound == 'MAXVALUE' for _, bound in partitions)
+        if not has_max:
+            return 0
+
+        # Partisi harian berikutnya dimulai dari batas partisi terakhir (atau hari ini)
+        start = _from_days(max(bounds)) if bounds else today
+        last = today + timedelta(days=RETENTION_PARTITIONS_AHEAD)
+        new = []
+        day = start
+        while day <= last:
+            new.append(
+                f"PARTITION {_partition_name(day)} "
+                f"VALUES LESS THAN ({_to_days(day + timedelta(days=1))})"
+            )
+            day += timedelta(days=1)
+        if not new:
+            return 0
+
+        cursor.execute(
+            f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+            f"({', '.join(new)}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        )
+        return len(new)
+
+    def _drop_partitions(self, cursor, table, partitions, cutoff):
+        expired = [
+            name for name, bound in partitions
+            if bound != 'MAXVALUE' and _from_days(int(bound)) <= cutoff.date()
+        ]
+        if expired:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+        return expired
+
+    def _delete_chunks(self, conn, cursor, table, column, cutoff, report):
+        while True:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} < %s LIMIT {RETENTION_DELETE_CHUNK}",
+                (cutoff,)
+            )
+            deleted = cursor.rowcount
+            conn.commit()
+            with self._lock:
+                report['deleted_rows'] += deleted
+            if deleted < RETENTION_DELETE_CHUNK:
+                return
+            time.sleep(RETENTION_DELETE_PAUSE)
+
+    def _apply(self, table, column, days, now):
+        cutoff = now - timedelta(days=days)
+        report = {
+            'retention_days': days,
+            'cutoff': cutoff.isoformat(),
+            'mode': None,
+            'dropped_partitions': [],
+            'created_partitions': 0,
+            'deleted_rows': 0,
+            'elapsed': None,
+            'error': None
+        }
+        with self._lock:
+            self._state['current_table'] = table
+            self._state['tables'][table] = report
+
+        started = time.monotonic()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            partitions = self._partitions(cursor, table)
+            if partitions:
+                report['mode'] = 'partition'
+                report['created_partitions'] = self._ensure_future_partitions(cursor, table, partitions, now.date())
+                report['dropped_partitions'] = self._drop_partitions(cursor, table, partitions, cutoff)
+            else:
+                report['mode'] = 'delete'
+                self._delete_chunks(conn, cursor, table, column, cutoff, report)
+        except Exception as e:
+            report['error'] = str(e)
+            print(f"❌ Retention {table} gagal: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+            report['elapsed'] = round(time.monotonic() - started, 2)
+
+        print(f"🧹 Retention {table}: {report['mode']}, "
+              f"{len(report['dropped_partitions'])} partisi di-drop, "
+              f"{report['deleted_rows']} baris dihapus ({report['elapsed']}s)")
+
+    def _apply_tsdb(self, days, now):
+        cutoff = now - timedelta(days=days)
+        report = {
+            'retention_days': days,
+            'cutoff': cutoff.isoformat(),
+            'mode': 'segment',
+            'dropped_segments': 0,
+            'elapsed': None,
+            'error': None
+        }
+        with self._lock:
+            self._state['current_table'] = 'tsdb'
+            self._state['tables']['tsdb'] = report
+
+        started = time.monotonic()
+        try:
+            report['dropped_segments'] = tsdb.drop_before(cutoff)
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM tsdb_segments WHERE segment_start < %s",
+                (cutoff - timedelta(milliseconds=tsdb.segment_ms),)
+            )
+            conn.commit()
+            cursor.close()
+            conn.close()
+        except Exception as e:
+            report['error'] = str(e)
+            print(f"❌ Retention TSDB gagal: {e}")
+        report['elapsed'] = round(time.monotonic() - started, 2)
+        print(f"🧹 Retention TSDB: {report['dropped_segments']} segmen dihapus ({report['elapsed']}s)")
+
+    def run(self):
+        """Jalankan semua policy sekali (dilewati jika run sebelumnya belum selesai)"""
+        if not self._running.acquire(blocking=False):
+            print("⏳ Retention masih berjalan, run ini dilewati")
+            return
+
+        try:
+            now = datetime.now()
+            started = time.monotonic()
+            with self._lock:
+                self._state['running'] = True
+                self._state['last_started_at'] = now.isoformat()
+
+            for table, (column, days) in self.policies.items():
+                self._apply(table, column, days, now)
+
+            # Segmen TSDB (bandwidth dan WiFi) mengikuti umur data mentah
+            if tsdb is not None:
+                self._apply_tsdb(self.policies['bandwidth_history'][1], now)
+
+            with self._lock:
+                self._state['last_finished_at'] = datetime.now().isoformat()
+                self._state['last_duration'] = round(time.monotonic() - started, 2)
+                self._state['runs'] += 1
+        finally:
+            with self._lock:
+                self._state['running'] = False
+                self._state['current_table'] = None
+            self._running.release()
+
+    def stats(self):
+        with self._lock:
+            state = dict(self._state)
+            state['tables'] = {table: dict(report) for table, report in self._state['tables'].items()}
+        return state
+
+
+def delete_device_history(cursor, device_id):
+    """Hapus history device dari tabel yang tidak punya ON DELETE CASCADE"""
+    for table in DEVICE_HISTORY_TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE device_id=%s", (device_id,))
+    if tsdb is not None:
+        cursor.execute("DELETE FROM tsdb_segments WHERE device_id=%s", (device_id,))
+        tsdb.delete_device(device_id)
+
+
+retention_manager = RetentionManager()
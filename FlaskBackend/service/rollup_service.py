@@ -0,0 +1,184 @@
+from db import get_db_connection
+from service.tsdb import tsdb
+from datetime import datetime, timedelta
+import math
+import os
+import threading
+
+# Sampel mentah di-rollup ke tabel bandwidth_rollup_<resolusi>
+RESOLUTIONS = {
+    '1m': timedelta(minutes=1),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1)
+}
+
+# Bucket tetap di memori selama ini setelah berakhir (untuk sampel yang terlambat)
+ROLLUP_GRACE = timedelta(seconds=float(os.getenv('ROLLUP_GRACE', 300)))
+
+# Batas titik default untuk /api/bandwidth/history
+HISTORY_MAX_POINTS = int(os.getenv('HISTORY_MAX_POINTS', 1500))
+
+METRICS = ('in', 'out', 'total')
+ROLLUP_COLUMNS = ('device_id', 'bucket', 'samples') + tuple(
+    f"{metric}_{stat}" for metric in METRICS for stat in ('avg', 'min', 'max', 'p95')
+) + ('last_timestamp',)
+
+
+def bucket_start(timestamp, resolution):
+    if resolution == '1m':
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == '1h':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def percentile(values, pct):
+    """Percentile nearest-rank dari list nilai yang sudah terurut"""
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class BandwidthRollup:
+    """
+    Agregasi bandwidth_history ke bucket 1 menit, 1 jam dan 1 hari
+    (avg/min/max/p95 untuk in/out/total Mbps) saat data masuk.
+
+    Dipasang sebagai hook metrics writer: setelah sampel mentah di-commit,
+    sampel dimasukkan ke bucket di memori dan bucket yang tersentuh
+    di-upsert ke tabel rollup. Upsert selalu berisi statistik seluruh
+    bucket, sehingga upsert yang gagal diperbaiki oleh flush berikutnya.
+    Bucket yang sudah dimulai sebelum proses ini berjalan diisi dulu dari
+    bandwidth_history (atau TSDB lokal) agar statistiknya tidak hanya
+    mencakup sampel baru.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}    # (resolution, device_id, bucket) -> [timestamps, in, out, total]
+        self._started_at = datetime.now()
+
+    def _load_raw(self, device_id, start, end):
+        if tsdb is not None:
+            return [
+                (row['timestamp'], row.get('in_mbps'), row.get('out_mbps'), row.get('total_mbps'))
+                for row in tsdb.read_rows(device_id, start, end)
+            ]
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT timestamp, in_mbps, out_mbps, total_mbps FROM bandwidth_history
+            WHERE device_id=%s AND timestamp >= %s AND timestamp < %s
+        """, (device_id, start, end))
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return rows
+
+    def _new_bucket(self, resolution, device_id, start):
+        bucket = [[], [], [], []]
+        if start < self._started_at:
+            end = min(start + RESOLUTIONS[resolution], self._started_at)
+            for timestamp, in_mbps, out_mbps, total_mbps in self._load_raw(device_id, start, end):
+                bucket[0].append(timestamp)
+                bucket[1].append(float(in_mbps or 0))
+                bucket[2].append(float(out_mbps or 0))
+                bucket[3].append(float(total_mbps or 0))
+        return bucket
+
+    def add(self, rows):
+        """
+        Masukkan baris bandwidth_history (urutan kolom TABLES di metrics
+        writer) ke bucket. Return {resolution: [baris rollup]} untuk bucket
+        yang tersentuh.
+        """
+        touched = set()
+        with self._lock:
+            for device_id, _, _, _, in_mbps, out_mbps, total_mbps, timestamp in rows:
+                for resolution in RESOLUTIONS:
+                    key = (resolution, device_id, bucket_start(timestamp, resolution))
+                    bucket = self._buckets.get(key)
+                    if bucket is None:
+                        bucket = self._buckets[key] = self._new_bucket(*key)
+                    bucket[0].append(timestamp)
+                    bucket[1].append(float(in_mbps or 0))
+                    bucket[2].append(float(out_mbps or 0))
+                    bucket[3].append(float(total_mbps or 0))
+                    touched.add(key)
+
+            result = {resolution: [] for resolution in RESOLUTIONS}
+            for key in sorted(touched):
+                result[key[0]].append(self._summarize(key))
+
+            self._evict(datetime.now())
+        return result
+
+    def _summarize(self, key):
+        resolution, device_id, start = key
+        timestamps, *series = self._buckets[key]
+        row = [device_id, start, len(timestamps)]
+        for values in series:
+            ordered = sorted(values)
+            row.extend((
+                round(sum(ordered) / len(ordered), 2),
+                ordered[0],
+                ordered[-1],
+                percentile(ordered, 95)
+            ))
+        row.append(max(timestamps))
+        return tuple(row)
+
+    def _evict(self, now):
+        expired = [
+            key for key in self._buckets
+            if key[2] + RESOLUTIONS[key[0]] + ROLLUP_GRACE < now
+        ]
+        for key in expired:
+            del self._buckets[key]
+
+    def hook(self, rows):
+        """Hook metrics writer untuk tabel bandwidth_history"""
+        summaries = self.add(rows)
+
+        def apply(cursor):
+            updates = ', '.join(f"{column}=VALUES({column})" for column in ROLLUP_COLUMNS[2:])
+            for resolution, values in summaries.items():
+                if not values:
+                    continue
+                cursor.executemany(
+                    f"INSERT INTO bandwidth_rollup_{resolution} ({', '.join(ROLLUP_COLUMNS)}) "
+                    f"VALUES ({', '.join(['%s'] * len(ROLLUP_COLUMNS))}) "
+                    f"ON DUPLICATE KEY UPDATE {updates}",
+                    values
+                )
+        return apply
+
+
+def choose_resolution(hours, max_points=None):
+    """Resolusi paling detail yang jumlah bucket-nya dalam `hours` muat di max_points"""
+    max_points = max_points or HISTORY_MAX_POINTS
+    window = timedelta(hours=hours)
+    for resolution, size in RESOLUTIONS.items():
+        if window / size <= max_points:
+            return resolution
+    return '1d'
+
+
+def get_rollup_history(cursor, device_id, since, resolution):
+    """
+    Baris rollup sejak `since`, terbaru dulu. in_mbps/out_mbps/total_mbps
+    berisi rata-rata bucket dan timestamp berisi awal bucket, sehingga
+    bentuknya sama dengan baris bandwidth_history.
+    """
+    cursor.execute(f"""
+        SELECT device_id, bucket AS timestamp, samples,
+               in_avg AS in_mbps, out_avg AS out_mbps, total_avg AS total_mbps,
+               in_min, in_max, in_p95, out_min, out_max, out_p95,
+               total_min, total_max, total_p95, last_timestamp
+        FROM bandwidth_rollup_{resolution}
+        WHERE device_id=%s AND bucket >= %s
+        ORDER BY bucket DESC
+    """, (device_id, bucket_start(since, resolution)))
+    return cursor.fetchall()
+
+
+bandwidth_rollup = BandwidthRollup()
@@ -0,0 +1,100 @@
+from db import get_db_connection
+from service.tsdb import SERIES, tsdb
+from collections import deque
+from datetime import datetime, timedelta
+import threading
+
+
+class SampleWindow:
+    """
+    Ring buffer sampel terbaru per device di memori, dipakai untuk deteksi
+    anomali (mis. jumlah client WiFi turun drastis) tanpa query ke database.
+
+    Menyimpan maksimal `size` sampel per device dan hanya memakai sampel yang
+    lebih baru dari `max_age`. Isi awal diambil sekali dari database lewat
+    seed(); setelah itu database hanya menerima append dari metrics writer.
+    """
+
+    def __init__(self, table, column, size=5, max_age=timedelta(minutes=30)):
+        self.table = table
+        self.column = column
+        self.size = size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._seed_lock = threading.Lock()
+        self._seeded = False
+
+    def seed(self):
+        """
+        Isi window dari sampel database dalam rentang max_age. Hanya berjalan
+        sekali; jika gagal (database belum siap) akan dicoba lagi pada
+        pemanggilan berikutnya.
+        """
+        with self._seed_lock:
+            if self._seeded:
+                return
+
+            since = datetime.now() - self.max_age
+            if tsdb is not None and self.table in SERIES:
+                rows = sorted(
+                    (row['device_id'], row[self.column], row['timestamp'])
+                    for row in tsdb.read_table(self.table, since)
+                )
+            else:
+                conn = get_db_connection()
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT device_id, {self.column}, timestamp FROM {self.table}
+                    WHERE timestamp > %s
+                    ORDER BY device_id, timestamp
+                """, (since,))
+                rows = cursor.fetchall()
+                cursor.close()
+                conn.close()
+
+            seeded = {}
+            for device_id, value, timestamp in rows:
+                seeded.setdefault(device_id, []).append((timestamp, value))
+
+            with self._lock:
+                for device_id, samples in seeded.items():
+                    # Sampel yang sudah masuk sebelum seed tetap paling akhir
+                    current = list(self._windows.get(device_id, ()))
+                    if current:
+                        samples = [sample for sample in samples if sample[0] < current[0][0]]
+                    self._windows[device_id] = deque(samples + current, maxlen=self.size)
+                self._seeded = True
+            print(f"🪟 Window {self.table} di-seed dengan {len(rows)} sampel")
+
+    def _window(self, device_id):
+        window = self._windows.get(device_id)
+        if window is None:
+            window = self._windows[device_id] = deque(maxlen=self.size)
+        return window
+
+    def append(self, device_id, value, timestamp=None):
+        with self._lock:
+            self._window(device_id).append((timestamp or datetime.now(), value))
+
+    def recent(self, device_id, now=None):
+        """Nilai sampel yang masih dalam rentang max_age, terlama dulu"""
+        cutoff = (now or datetime.now()) - self.max_age
+        with self._lock:
+            window = self._windows.get(device_id, ())
+            return [value for timestamp, value in window if timestamp > cutoff]
+
+    def average(self, device_id, now=None):
+        """Return (rata-rata, jumlah sampel) atau (None, 0) jika window kosong"""
+        values = self.recent(device_id, now)
+        if not values:
+            return None, 0
+        return sum(values) / len(values), len(values)
+
+    def forget(self, device_id):
+        with self._lock:
+            self._windows.pop(device_id, None)
+
+
+# 5 sampel terakhir dalam 30 menit, sama dengan query drop detection sebelumnya
+wifi_client_window = SampleWindow('wifi_client_history', 'client_count', size=5, max_age=timedelta(minutes=30))
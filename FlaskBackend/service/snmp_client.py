@@ -0,0 +1,346 @@
+from pysnmp.hlapi.v3arch.asyncio import (
+    SnmpEngine,
+    CommunityData,
+    UdpTransportTarget,
+    ContextData,
+    ObjectType,
+    ObjectIdentity,
+    get_cmd,
+    bulk_cmd,
+    walk_cmd
+)
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+from collections import OrderedDict
+import asyncio
+import os
+import threading
+import time
+
+# Konfigurasi SNMP client
+SNMP_PORT = int(os.getenv('SNMP_PORT', 161))
+SNMP_TIMEOUT = float(os.getenv('SNMP_TIMEOUT', 2))
+SNMP_RETRIES = int(os.getenv('SNMP_RETRIES', 1))
+SNMP_TARGET_IDLE_TTL = float(os.getenv('SNMP_TARGET_IDLE_TTL', 600))   # detik
+SNMP_TARGET_POOL_SIZE = int(os.getenv('SNMP_TARGET_POOL_SIZE', 1024))
+SNMP_MAX_OIDS_PER_PDU = int(os.getenv('SNMP_MAX_OIDS_PER_PDU', 32))
+SNMP_MAX_REPETITIONS = int(os.getenv('SNMP_MAX_REPETITIONS', 25))
+
+# Error status SNMP (RFC 1905)
+TOO_BIG = 1
+NO_SUCH_NAME = 2
+
+_MISSING_VALUES = (NoSuchObject, NoSuchInstance, EndOfMibView)
+
+
+class SnmpClient:
+    """
+    Satu SnmpEngine untuk seluruh aplikasi.
+
+    Engine dan semua UdpTransportTarget hidup di event loop asyncio milik
+    thread khusus, sehingga engine (dan socket UDP-nya) dipakai bersama oleh
+    semua thread Flask dan job scheduler. Target per (ip, port, timeout,
+    retries) di-cache dan dibuang setelah idle SNMP_TARGET_IDLE_TTL detik atau
+    jika pool melebihi SNMP_TARGET_POOL_SIZE (LRU).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._engine = None
+        self._targets = OrderedDict()   # key -> [target, last_used]
+        self._auth = {}                 # (community, mp_model) -> CommunityData
+        self._v1_only = set()           # (ip, port) agent yang tidak mendukung GETBULK
+        self._context = ContextData()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='snmp-client', daemon=True)
+                thread.start()
+                self._loop = loop
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """Jalankan coroutine di loop SNMP dari thread mana pun dan tunggu hasilnya"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+    @property
+    def engine(self):
+        # Hanya dipanggil dari loop SNMP
+        if self._engine is None:
+            self._engine = SnmpEngine()
+        return self._engine
+
+    def auth(self, community, mp_model=0):
+        key = (community, mp_model)
+        if key not in self._auth:
+            self._auth[key] = CommunityData(community, mpModel=mp_model)
+        return self._auth[key]
+
+    async def target(self, ip, port=None, timeout=None, retries=None):
+        """Ambil transport target dari pool (dibuat jika belum ada)"""
+        key = (
+            ip,
+            port or SNMP_PORT,
+            SNMP_TIMEOUT if timeout is None else timeout,
+            SNMP_RETRIES if retries is None else retries
+        )
+        now = time.monotonic()
+        self._evict(now)
+
+        entry = self._targets.get(key)
+        if entry is None:
+            target = await UdpTransportTarget.create((key[0], key[1]), timeout=key[2], retries=key[3])
+            entry = self._targets[key] = [target, now]
+        else:
+            entry[1] = now
+            self._targets.move_to_end(key)
+        return entry[0]
+
+    def _evict(self, now):
+        while self._targets:
+            key, (_, last_used) = next(iter(self._targets.items()))
+            if len(self._targets) <= SNMP_TARGET_POOL_SIZE and now - last_used < SNMP_TARGET_IDLE_TTL:
+                break
+            del self._targets[key]
+
+    async def _get_pdu(self, ip, community, oids, mp_model, target_options):
+        target = await self.target(ip, **target_options)
+        errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
+            self.engine,
+            self.auth(community, mp_model),
+            target,
+            self._context,
+            *[ObjectType(ObjectIdentity(oid)) for oid in oids],
+            lookupMib=False
+        )
+        return errorIndication, errorStatus, int(errorIndex or 0), varBinds
+
+    async def get_async(self, ip, community, oids, mp_model=0, **target_options):
+        """
+        SNMP GET beberapa OID dalam satu PDU.
+        Return (error, [(oid, value), ...]); value None jika OID tidak ada.
+        """
+        errorIndication, errorStatus, errorIndex, varBinds = await self._get_pdu(
+            ip, community, oids, mp_model, target_options
+        )
+
+        if errorIndication:
+            return str(errorIndication), []
+        if errorStatus:
+            return errorStatus.prettyPrint(), []
+        return None, [(str(name), _convert(value)) for name, value in varBinds]
+
+    async def get_many_async(self, ip, community, oids, mp_model=0, max_oids=None, **target_options):
+        """
+        GET banyak OID sekaligus dengan PDU sesedikit mungkin.
+
+        OID dipecah per `max_oids` (default SNMP_MAX_OIDS_PER_PDU) per PDU.
+        Jika agent membalas tooBig, PDU dibagi dua dan dikirim ulang. Untuk
+        SNMPv1, OID yang menyebabkan noSuchName diisi None lalu sisanya
+        dikirim ulang. Return (error, {oid: value}).
+        """
+        oids = list(dict.fromkeys(oids))
+        max_oids = max_oids or SNMP_MAX_OIDS_PER_PDU
+        values = {}
+
+        async def fetch(chunk):
+            if not chunk:
+                return None
+            errorIndication, errorStatus, errorIndex, varBinds = await self._get_pdu(
+                ip, community, chunk, mp_model, target_options
+            )
+            if errorIndication:
+                return str(errorIndication)
+
+            if errorStatus == TOO_BIG and len(chunk) > 1:
+                half = len(chunk) // 2
+                errors = await asyncio.gather(fetch(chunk[:half]), fetch(chunk[half:]))
+                return next((error for error in errors if error), None)
+
+            if errorStatus == NO_SUCH_NAME and 0 < errorIndex <= len(chunk):
+                values[chunk[errorIndex - 1]] = None
+                return await fetch(chunk[:errorIndex - 1] + chunk[errorIndex:])
+
+            if errorStatus:
+                return errorStatus.prettyPrint()
+
+            for oid, (_, value) in zip(chunk, varBinds):
+                values[oid] = _convert(value)
+            return None
+
+        chunks = [oids[i:i + max_oids] for i in range(0, len(oids), max_oids)]
+        errors = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        return next((error for error in errors if error), None), values
+
+    async def walk_async(self, ip, community, oid, mp_model=0, max_rows=None, **target_options):
+        """Walk satu subtree dengan GETNEXT, return (error, [(oid, value), ...])"""
+        target = await self.target(ip, **target_options)
+        rows = []
+        async for errorIndication, errorStatus, errorIndex, varBinds in walk_cmd(
+            self.engine,
+            self.auth(community, mp_model),
+            target,
+            self._context,
+            ObjectType(ObjectIdentity(oid)),
+            lexicographicMode=False,
+            lookupMib=False
+        ):
+            if errorIndication:
+                return str(errorIndication), rows
+            if errorStatus:
+                return errorStatus.prettyPrint(), rows
+            rows.extend((str(name), _convert(value)) for name, value in varBinds)
+            if max_rows and len(rows) >= max_rows:
+                break
+        return None, rows
+
+    async def walk_table_async(self, ip, community, oids, max_repetitions=None, max_rows=None, **target_options):
+        """
+        Ambil seluruh isi beberapa kolom tabel (atau subtree) dengan GETBULK (SNMPv2c).
+
+        Semua kolom diminta dalam satu PDU, masing-masing `max_repetitions`
+        baris per round trip; kolom yang sudah habis tidak diminta lagi.
+        Jika GETBULK pertama ditolak agent (error status, response kosong, atau
+        noSuchObject/noSuchInstance) dilakukan walk GETNEXT dengan SNMPv1 dan
+        agent diingat sebagai v1-only. Timeout tidak memicu fallback.
+        Return (error, {oid_kolom: {index: value}}) dengan index berupa sisa OID
+        setelah prefix kolom (mis. '2' untuk ifDescr.2).
+        """
+        max_repetitions = max_repetitions or SNMP_MAX_REPETITIONS
+        columns = list(dict.fromkeys(oids))
+        table = {column: {} for column in columns}
+        prefixes = {column: tuple(int(part) for part in column.split('.')) for column in columns}
+        cursors = dict(prefixes)
+        active = list(columns)
+        agent = (ip, target_options.get('port') or SNMP_PORT)
+        if agent in self._v1_only:
+            return await self._walk_table_v1(ip, community, columns, max_rows, target_options)
+        target = await self.target(ip, **target_options)
+
+        while active:
+            errorIndication, errorStatus, errorIndex, varBinds = await bulk_cmd(
+                self.engine,
+                self.auth(community, 1),
+                target,
+                self._context,
+                0,
+                max_repetitions,
+                *[ObjectType(ObjectIdentity(cursors[column])) for column in active],
+                lookupMib=False
+            )
+
+            if errorIndication:
+                # Timeout bukan tanda agent v1-only, walk ulang dengan v1 hanya menggandakan waktu tunggu
+                return str(errorIndication), table
+            if not any(table.values()) and _bulk_unsupported(errorStatus, varBinds):
+                print(f"⚠️ SNMP {ip}: GETBULK tidak didukung, pakai SNMPv1")
+                self._v1_only.add(agent)
+                return await self._walk_table_v1(ip, community, columns, max_rows, target_options)
+            if errorStatus:
+                return errorStatus.prettyPrint(), table
+
+            finished = set()
+            progressed = set()
+            for position, (name, value) in enumerate(varBinds):
+                column = active[position % len(active)]
+                if column in finished:
+                    continue
+
+                name = tuple(name)
+                prefix = prefixes[column]
+                if (isinstance(value, _MISSING_VALUES) or name[:len(prefix)] != prefix
+                        or name <= cursors[column]):
+                    finished.add(column)
+                    continue
+
+                table[column]['.'.join(str(part) for part in name[len(prefix):])] = value
+                cursors[column] = name
+                progressed.add(column)
+                if max_rows and len(table[column]) >= max_rows:
+                    finished.add(column)
+
+            active = [column for column in active if column in progressed and column not in finished]
+
+        return None, table
+
+    async def _walk_table_v1(self, ip, community, columns, max_rows, target_options):
+        table = {}
+        error = None
+        for column in columns:
+            error, rows = await self.walk_async(ip, community, column, 0, max_rows, **target_options)
+            table[column] = {name[len(column) + 1:]: value for name, value in rows}
+        return error, table
+
+    def stats(self):
+        return {
+            'engine_started': self._engine is not None,
+            'pooled_targets': len(self._targets),
+            'max_targets': SNMP_TARGET_POOL_SIZE,
+            'v1_only_agents': len(self._v1_only),
+            'idle_ttl': SNMP_TARGET_IDLE_TTL
+        }
+
+
+def _bulk_unsupported(errorStatus, varBinds):
+    """Response GETBULK yang menandakan agent hanya bicara SNMPv1"""
+    if errorStatus or not varBinds:
+        return True
+    return any(isinstance(value, (NoSuchObject, NoSuchInstance)) for _, value in varBinds)
+
+
+def _convert(value):
+    if isinstance(value, _MISSING_VALUES):
+        return None
+    return value
+
+
+client = SnmpClient()
+
+
+def get(ip, community, oids, mp_model=0, **target_options):
+    """Versi sinkron dari SnmpClient.get_async"""
+    return client.run(client.get_async(ip, community, oids, mp_model, **target_options))
+
+
+def get_many(ip, community, oids, mp_model=0, max_oids=None, **target_options):
+    """Versi sinkron dari SnmpClient.get_many_async"""
+    return client.run(client.get_many_async(ip, community, oids, mp_model, max_oids, **target_options))
+
+
+def walk(ip, community, oid, mp_model=0, max_rows=None, **target_options):
+    """Versi sinkron dari SnmpClient.walk_async"""
+    return client.run(client.walk_async(ip, community, oid, mp_model, max_rows, **target_options))
+
+
+def walk_table(ip, community, oids, max_repetitions=None, max_rows=None, **target_options):
+    """Versi sinkron dari SnmpClient.walk_table_async"""
+    return client.run(client.walk_table_async(ip, community, oids, max_repetitions, max_rows, **target_options))
+
+
+def get_value(ip, community, oid, **options):
+    """Ambil satu nilai SNMP sebagai int (None jika gagal)"""
+    try:
+        error, varBinds = get(ip, community, [oid], **options)
+        if error:
+            print(f"SNMP error: {error}")
+            return None
+        for _, value in varBinds:
+            return int(value) if value is not None else None
+    except Exception as e:
+        print(f"Error SNMP {ip}: {e}")
+        return None
+
+
+def get_string(ip, community, oid, **options):
+    """Ambil satu nilai SNMP sebagai string (None jika gagal)"""
+    try:
+        error, varBinds = get(ip, community, [oid], **options)
+        if error:
+            return None
+        for _, value in varBinds:
+            return str(value) if value is not None else None
+    except Exception as e:
+        return None
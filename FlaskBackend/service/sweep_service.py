@@ -0,0 +1,38 @@
+from service.icmp_prober import probe
+import os
+import time
+
+# Jumlah echo yang boleh menunggu reply bersamaan dan batas waktu satu siklus (detik)
+PING_CONCURRENCY = int(os.getenv('PING_CONCURRENCY', 256))
+PING_SWEEP_DEADLINE = float(os.getenv('PING_SWEEP_DEADLINE', 45))
+
+
+def sweep(ips, timeout=2, concurrency=None, deadline=None, timeouts=None):
+    """
+    Ping banyak host sekaligus lewat satu socket ICMP (lihat icmp_prober).
+
+    Return dict {ip: rtt_detik atau None}. Host yang belum selesai dicek
+    saat deadline habis TIDAK ada di hasil, sehingga caller bisa membiarkan
+    statusnya apa adanya daripada menandainya down. `timeouts` ({ip: detik})
+    memberi timeout berbeda per host.
+    """
+    concurrency = concurrency or PING_CONCURRENCY
+    deadline = PING_SWEEP_DEADLINE if deadline is None else deadline
+
+    targets = list(dict.fromkeys(ips))
+    if not targets:
+        return {}
+
+    started = time.monotonic()
+    try:
+        results = probe(targets, timeout=timeout, max_in_flight=concurrency, deadline=deadline,
+                        timeouts=timeouts)
+    except OSError as e:
+        print(f"❌ Tidak bisa membuka socket ICMP: {e}")
+        return {}
+
+    skipped = len(targets) - len(results)
+    elapsed = time.monotonic() - started
+    print(f"🏓 Sweep {len(results)}/{len(targets)} host selesai dalam {elapsed:.1f}s"
+          + (f" ({skipped} dilewati karena deadline)" if skipped else ""))
+    return {ip: result['rtt'] for ip, result in results.items()}
@@ -1,31 +1,21 @@
-import requests
-import os
-from dotenv import load_dotenv
 from datetime import datetime
-
-load_dotenv()
-
-TOKEN = os.getenv("TELEGRAM_TOKEN")
-CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-
-def send_alert(message):
-    """Kirim alert sederhana ke Telegram"""
-    url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-    data = {"chat_id": CHAT_ID, "text": message, "parse_mode": "HTML"}
-    try:
-        response = requests.post(url, data=data)
-        if response.status_code == 200:
-            print(f"✅ Telegram alert sent: {message[:50]}...")
-            return True
-        else:
-            print(f"❌ Failed to send Telegram: {response.text}")
-            return False
-    except Exception as e:
-        print(f"❌ Error sending Telegram: {e}")
-        return False
-
-
-def send_device_down_alert(device_name, ip_address):
+from service.alert_dispatcher import alert_dispatcher
+
+def send_alert(message, summary=None, category=None, alert_type='general',
+               device_id=None, severity='warning', alert_data=None):
+    """
+    Kirim alert sederhana ke Telegram. Alert dicatat di outbox alert_history
+    dan dikirim di background oleh dispatcher; return False jika tidak bisa
+    dicatat. Alert dengan `summary` bisa digabung dengan alert lain menjadi
+    digest.
+    """
+    return alert_dispatcher.enqueue(
+        message, summary, category,
+        alert_type=alert_type, device_id=device_id, severity=severity, alert_data=alert_data
+    )
+
+
+def send_device_down_alert(device_name, ip_address, device_id=None):
     """Alert untuk device down"""
     message = f"""
 🚨 <b>DEVICE DOWN ALERT</b> 🚨
@@ -37,10 +27,12 @@ def send_device_down_alert(device_name, ip_address):
 ❌ Status: <b>DOWN</b>
 ⚠️ Device tidak dapat dijangkau!
 """
-    return send_alert(message)
+    summary = f"<b>{device_name}</b> (<code>{ip_address}</code>)"
+    return send_alert(message, summary, "🚨 Device Down", 'device_down', device_id, 'critical',
+                      {'ip_address': ip_address})
 
 
-def send_device_up_alert(device_name, ip_address):
+def send_device_up_alert(device_name, ip_address, device_id=None):
     """Alert untuk device up kembali"""
     message = f"""
 ✅ <b>DEVICE RECOVERED</b>
@@ -52,10 +44,12 @@ def send_device_up_alert(device_name, ip_address):
 ✅ Status: <b>UP</b>
 🎉 Device sudah dapat dijangkau kembali!
 """
-    return send_alert(message)
+    summary = f"<b>{device_name}</b> (<code>{ip_address}</code>)"
+    return send_alert(message, summary, "✅ Device Recovered", 'device_up', device_id, 'info',
+                      {'ip_address': ip_address})
 
 
-def send_bandwidth_alert(device_name, ip_address, bandwidth_data, threshold):
+def send_bandwidth_alert(device_name, ip_address, bandwidth_data, threshold, device_id=None):
     """Alert untuk bandwidth tinggi"""
     in_mbps = bandwidth_data.get('in_mbps', 0)
     out_mbps = bandwidth_data.get('out_mbps', 0)
@@ -76,10 +70,12 @@ def send_bandwidth_alert(device_name, ip_address, bandwidth_data, threshold):
 🚨 Threshold: <b>{threshold} Mbps</b>
 ⚠️ Bandwidth usage melebihi threshold!
 """
-    return send_alert(message)
+    summary = f"<b>{device_name}</b> (<code>{ip_address}</code>): {total_mbps} Mbps &gt; {threshold} Mbps"
+    return send_alert(message, summary, "⚠️ Bandwidth High", 'bandwidth_high', device_id, 'warning',
+                      {'ip_address': ip_address, 'bandwidth': bandwidth_data, 'threshold': threshold})
 
 
-def send_bandwidth_low_alert(device_name, ip_address, bandwidth_data, threshold):
+def send_bandwidth_low_alert(device_name, ip_address, bandwidth_data, threshold, device_id=None):
     """Alert untuk bandwidth turun drastis"""
     in_mbps = bandwidth_data.get('in_mbps', 0)
     out_mbps = bandwidth_data.get('out_mbps', 0)
@@ -100,7 +96,9 @@ def send_bandwidth_low_alert(device_name, ip_address, bandwidth_data, threshold)
 📉 Minimum Threshold: <b>{threshold} Mbps</b>
 ⚠️ Bandwidth turun di bawah threshold minimum!
 """
-    return send_alert(message)
+    summary = f"<b>{device_name}</b> (<code>{ip_address}</code>): {total_mbps} Mbps &lt; {threshold} Mbps"
+    return send_alert(message, summary, "⬇️ Bandwidth Drop", 'bandwidth_low', device_id, 'warning',
+                      {'ip_address': ip_address, 'bandwidth': bandwidth_data, 'threshold': threshold})
 
 
 def send_zabbix_trigger_alert(trigger_data):
@@ -114,7 +112,8 @@ def send_zabbix_trigger_alert(trigger_data):
         5: "Disaster 🔴"
     }
     
-    severity = severity_map.get(int(trigger_data.get('priority', 0)), "Unknown")
+    priority = int(trigger_data.get('priority', 0))
+    severity = severity_map.get(priority, "Unknown")
     description = trigger_data.get('description', 'N/A')
     host_name = trigger_data.get('hosts', [{}])[0].get('name', 'Unknown')
     
@@ -128,10 +127,12 @@ def send_zabbix_trigger_alert(trigger_data):
 
 🔍 Check Zabbix dashboard untuk detail lebih lanjut.
 """
-    return send_alert(message)
+    summary = f"<b>{host_name}</b> [{severity}]: {description}"
+    level = 'critical' if priority >= 4 else 'warning' if priority >= 2 else 'info'
+    return send_alert(message, summary, "🔔 Zabbix Trigger", 'zabbix_trigger', None, level, trigger_data)
 
 
-def send_wifi_client_alert(device_name, ip_address, current_clients, avg_clients):
+def send_wifi_client_alert(device_name, ip_address, current_clients, avg_clients, device_id=None):
     """Alert untuk perubahan jumlah client WiFi"""
     message = f"""
 📡 <b>WIFI CLIENT ALERT</b> 📡
@@ -147,7 +148,9 @@ def send_wifi_client_alert(device_name, ip_address, current_clients, avg_clients
 ⚠️ Client count dropped significantly!
 🔍 Please check WiFi connectivity
 """
-    return send_alert(message)
+    summary = f"<b>{device_name}</b> (<code>{ip_address}</code>): {current_clients} clients (avg {avg_clients})"
+    return send_alert(message, summary, "📡 WiFi Client Drop", 'wifi_client_drop', device_id, 'warning',
+                      {'ip_address': ip_address, 'clients': current_clients, 'avg_clients': avg_clients})
 
 
 def send_monitoring_summary(summary_data):
@@ -174,4 +177,4 @@ def send_monitoring_summary(summary_data):
 
 {'✅ Semua sistem normal' if down_devices == 0 else '⚠️ Ada device yang down!'}
 """
-    return send_alert(message)
+    return send_alert(message, alert_type='summary', severity='info', alert_data=summary_data)
@@ -0,0 +1,399 @@
+from datetime import datetime
+import mmap
+import os
+import shutil
+import struct
+import threading
+
+# Store time-series lokal untuk sampel mentah bandwidth dan client WiFi (opsional).
+# Jika aktif, bandwidth_history dan wifi_client_history tidak lagi diisi;
+# MySQL hanya menyimpan metadata segmen (tsdb_segments) dan rollup.
+TSDB_ENABLED = os.getenv('TSDB_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+TSDB_PATH = os.getenv('TSDB_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'tsdb'))
+TSDB_SEGMENT_HOURS = int(os.getenv('TSDB_SEGMENT_HOURS', 24))
+
+# Metric yang disimpan per device (urutan sama dengan kolom bandwidth_history)
+METRICS = ('in_bytes_per_sec', 'out_bytes_per_sec', 'in_mbps', 'out_mbps', 'total_mbps')
+
+# Tabel yang disimpan di TSDB -> metric, urutan sama dengan kolom nilai di
+# TABLES metrics writer (di antara device_id/interface_index dan timestamp)
+SERIES = {
+    'bandwidth_history': METRICS,
+    'wifi_client_history': ('client_count',)
+}
+INTEGER_METRICS = ('client_count',)
+
+# Header segmen: magic, versi, jumlah sampel, timestamp pertama & terakhir (ms), panjang bitstream
+_HEADER = struct.Struct('>4sB3xIqqQ')
+_MAGIC = b'NMTS'
+_VERSION = 1
+
+# Bucket delta-of-delta timestamp (ms): (prefix, jumlah bit prefix, lebar nilai)
+_DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12), (0b11110, 5, 32))
+
+
+class BitWriter:
+    def __init__(self, partial=0, partial_bits=0):
+        self._acc = partial
+        self._bits = partial_bits
+        self.out = bytearray()
+
+    def write(self, value, width):
+        self._acc = (self._acc << width) | (value & ((1 << width) - 1))
+        self._bits += width
+        while self._bits >= 8:
+            self._bits -= 8
+            self.out.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    @property
+    def partial_bits(self):
+        return self._bits
+
+    def tail(self):
+        """Byte terakhir yang belum penuh (di-pad nol), atau b'' jika tidak ada"""
+        return bytes([(self._acc << (8 - self._bits)) & 0xFF]) if self._bits else b''
+
+
+class BitReader:
+    def __init__(self, buf, bit_length):
+        self._buf = buf
+        self.pos = 0
+        self.limit = bit_length
+
+    def read(self, width):
+        value = 0
+        while width:
+            offset = self.pos & 7
+            available = 8 - offset
+            take = min(available, width)
+            byte = self._buf[self.pos >> 3]
+            value = (value << take) | ((byte >> (available - take)) & ((1 << take) - 1))
+            width -= take
+            self.pos += take
+        return value
+
+
+def _float_bits(value):
+    return struct.unpack('>Q', struct.pack('>d', float(value)))[0]
+
+
+def _bits_float(bits):
+    return struct.unpack('>d', struct.pack('>Q', bits))[0]
+
+
+def _signed(value, width):
+    return value - (1 << width) if value & (1 << (width - 1)) else value
+
+
+class SeriesState:
+    """State encoder satu segmen (dibangun ulang dari file saat dibuka lagi)"""
+
+    def __init__(self):
+        self.count = 0
+        self.first_ts = 0
+        self.last_ts = 0
+        self.last_delta = 0
+        self.last_bits = 0
+        self.leading = -1
+        self.trailing = 0
+        self.bit_length = 0
+
+
+def _encode(writer, state, ts, value):
+    bits = _float_bits(value)
+
+    if state.count == 0:
+        writer.write(ts, 64)
+        writer.write(bits, 64)
+        state.first_ts = ts
+    else:
+        # Timestamp: delta-of-delta
+        delta = ts - state.last_ts
+        dod = delta - state.last_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, width in _DOD_BUCKETS:
+                if -(1 << (width - 1)) <= dod < (1 << (width - 1)):
+                    writer.write(prefix, prefix_bits)
+                    writer.write(dod, width)
+                    break
+            else:
+                writer.write(0b11111, 5)
+                writer.write(dod, 64)
+        state.last_delta = delta
+
+        # Nilai: XOR dengan nilai sebelumnya
+        xor = bits ^ state.last_bits
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            writer.write(1, 1)
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if state.leading >= 0 and leading >= state.leading and trailing >= state.trailing:
+                writer.write(0, 1)
+                meaningful = 64 - state.leading - state.trailing
+                writer.write(xor >> state.trailing, meaningful)
+            else:
+                meaningful = 64 - leading - trailing
+                writer.write(1, 1)
+                writer.write(leading, 5)
+                writer.write(meaningful - 1, 6)
+                writer.write(xor >> trailing, meaningful)
+                state.leading, state.trailing = leading, trailing
+
+    state.last_ts = ts
+    state.last_bits = bits
+    state.count += 1
+
+
+def _decode(reader, count, state=None):
+    """Decode `count` sampel, yield (ts_ms, value). `state` diisi state akhir encoder."""
+    state = state or SeriesState()
+    for index in range(count):
+        if index == 0:
+            ts = reader.read(64)
+            bits = reader.read(64)
+            state.first_ts = ts
+        else:
+            if reader.read(1) == 0:
+                dod = 0
+            else:
+                for _, _, width in _DOD_BUCKETS:
+                    if reader.read(1) == 0:
+                        dod = _signed(reader.read(width), width)
+                        break
+                else:
+                    dod = _signed(reader.read(64), 64)
+            state.last_delta += dod
+            ts = state.last_ts + state.last_delta
+
+            bits = state.last_bits
+            if reader.read(1) == 1:
+                if reader.read(1) == 0:
+                    meaningful = 64 - state.leading - state.trailing
+                    bits ^= reader.read(meaningful) << state.trailing
+                else:
+                    state.leading = reader.read(5)
+                    meaningful = reader.read(6) + 1
+                    state.trailing = 64 - state.leading - meaningful
+                    bits ^= reader.read(meaningful) << state.trailing
+
+        state.last_ts = ts
+        state.last_bits = bits
+        state.count = index + 1
+        yield ts, _bits_float(bits)
+    state.bit_length = reader.pos
+
+
+class LocalTSDB:
+    """
+    Store append-only per device dan per metric: setiap segmen
+    (TSDB_SEGMENT_HOURS jam) adalah satu file berisi header dan bitstream
+    Gorilla (timestamp delta-of-delta, nilai XOR). Sampel baru ditambahkan
+    di akhir bitstream; pembacaan memakai mmap sehingga hanya halaman file
+    yang dibutuhkan yang dibaca dari disk.
+    """
+
+    def __init__(self, path=TSDB_PATH, segment_hours=TSDB_SEGMENT_HOURS):
+        self.path = path
+        self.segment_ms = segment_hours * 3600 * 1000
+        self._lock = threading.Lock()
+        self._open = {}   # (device_id, metric, segment_start) -> SeriesState
+
+    def _segment_path(self, device_id, metric, segment_start):
+        return os.path.join(self.path, str(device_id), metric, f"{segment_start}.seg")
+
+    def _load_state(self, path):
+        state = SeriesState()
+        if not os.path.exists(path) or os.path.getsize(path) < _HEADER.size:
+            return state
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, _, count, _, _, bit_length = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError(f"Bukan segmen TSDB: {path}")
+        reader = BitReader(memoryview(data)[_HEADER.size:], bit_length)
+        for _ in _decode(reader, count, state):
+            pass
+        return state
+
+    def _append(self, device_id, metric, segment_start, samples):
+        path = self._segment_path(device_id, metric, segment_start)
+        key = (device_id, metric, segment_start)
+        state = self._open.get(key)
+        if state is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            state = self._open[key] = self._load_state(path)
+
+        if state.count and samples[0][0] < state.last_ts:
+            # Append-only: sampel yang lebih tua dari sampel terakhir dibuang
+            samples = [sample for sample in samples if sample[0] >= state.last_ts]
+            if not samples:
+                return None
+
+        # Lanjutkan dari byte terakhir yang belum penuh
+        partial_bits = state.bit_length % 8
+        offset = _HEADER.size + state.bit_length // 8
+        partial = 0
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        with open(path, mode) as f:
+            if partial_bits:
+                f.seek(offset)
+                partial = f.read(1)[0] >> (8 - partial_bits)
+            writer = BitWriter(partial, partial_bits)
+            for ts, value in samples:
+                _encode(writer, state, ts, value)
+            state.bit_length = (offset - _HEADER.size) * 8 + len(writer.out) * 8 + writer.partial_bits
+
+            f.seek(offset)
+            f.write(writer.out + writer.tail())
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, _VERSION, state.count, state.first_ts, state.last_ts, state.bit_length))
+            size = f.seek(0, os.SEEK_END)
+
+        return {
+            'device_id': device_id,
+            'metric': metric,
+            'segment_start': datetime.fromtimestamp(segment_start / 1000),
+            'sample_count': state.count,
+            'first_timestamp': datetime.fromtimestamp(state.first_ts / 1000),
+            'last_timestamp': datetime.fromtimestamp(state.last_ts / 1000),
+            'bytes': size
+        }
+
+    def append_rows(self, rows, table='bandwidth_history'):
+        """
+        Tambahkan baris `table` (urutan kolom TABLES di metrics writer) ke
+        segmen masing-masing. Return metadata segmen yang berubah.
+        """
+        metrics = SERIES[table]
+        series = {}
+        for row in sorted(rows, key=lambda row: row[-1]):
+            device_id, timestamp = row[0], row[-1]
+            ts = int(timestamp.timestamp() * 1000)
+            segment_start = ts - ts % self.segment_ms
+            for metric, value in zip(metrics, row[-1 - len(metrics):-1]):
+                series.setdefault((device_id, metric, segment_start), []).append((ts, float(value or 0)))
+
+        segments = []
+        with self._lock:
+            for (device_id, metric, segment_start), samples in series.items():
+                segment = self._append(device_id, metric, segment_start, samples)
+                if segment is not None:
+                    segments.append(segment)
+
+            # State segmen lama tidak perlu disimpan di memori
+            current = max((key[2] for key in self._open), default=0)
+            for key in [key for key in self._open if key[2] < current - self.segment_ms]:
+                del self._open[key]
+        return segments
+
+    def _read_segment(self, path):
+        with self._lock:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                magic, _, count, _, _, bit_length = _HEADER.unpack(header)
+                if magic != _MAGIC or count == 0:
+                    return
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(mapped)
+        body = view[_HEADER.size:]
+        try:
+            yield from _decode(BitReader(body, bit_length), count)
+        finally:
+            body.release()
+            view.release()
+            mapped.close()
+
+    def read(self, device_id, metric, start, end=None):
+        """Sampel (datetime, value) satu metric dalam [start, end), terlama dulu"""
+        start_ms = int(start.timestamp() * 1000)
+        end_ms = int(end.timestamp() * 1000) if end else None
+        directory = os.path.join(self.path, str(device_id), metric)
+        if not os.path.isdir(directory):
+            return []
+
+        samples = []
+        for name in sorted(os.listdir(directory), key=lambda name: int(name.split('.')[0])):
+            segment_start = int(name.split('.')[0])
+            if segment_start + self.segment_ms <= start_ms or (end_ms is not None and segment_start >= end_ms):
+                continue
+            for ts, value in self._read_segment(os.path.join(directory, name)):
+                if ts >= start_ms and (end_ms is None or ts < end_ms):
+                    samples.append((datetime.fromtimestamp(ts / 1000), value))
+        return samples
+
+    def read_rows(self, device_id, start, end=None, table='bandwidth_history'):
+        """Baris seperti `table` (tanpa id), terbaru dulu"""
+        rows = {}
+        for metric in SERIES[table]:
+            for timestamp, value in self.read(device_id, metric, start, end):
+                row = rows.setdefault(timestamp, {'device_id': device_id, 'timestamp': timestamp})
+                row[metric] = int(value) if metric in INTEGER_METRICS else round(value, 2)
+        return [rows[timestamp] for timestamp in sorted(rows, reverse=True)]
+
+    def read_table(self, table, start, end=None):
+        """Baris `table` semua device dalam [start, end), terbaru dulu per device"""
+        if not os.path.isdir(self.path):
+            return []
+        device_ids = sorted(int(name) for name in os.listdir(self.path) if name.isdigit())
+        return [row for device_id in device_ids for row in self.read_rows(device_id, start, end, table)]
+
+    def drop_before(self, cutoff):
+        """Hapus segmen yang seluruh isinya lebih tua dari cutoff, return jumlah file"""
+        cutoff_ms = int(cutoff.timestamp() * 1000)
+        dropped = 0
+        if not os.path.isdir(self.path):
+            return dropped
+        with self._lock:
+            for device_id in os.listdir(self.path):
+                for metric in {metric for metrics in SERIES.values() for metric in metrics}:
+                    directory = os.path.join(self.path, device_id, metric)
+                    if not os.path.isdir(directory):
+                        continue
+                    for name in os.listdir(directory):
+                        segment_start = int(name.split('.')[0])
+                        if segment_start + self.segment_ms <= cutoff_ms:
+                            os.remove(os.path.join(directory, name))
+                            self._open.pop((int(device_id), metric, segment_start), None)
+                            dropped += 1
+        return dropped
+
+    def delete_device(self, device_id):
+        with self._lock:
+            shutil.rmtree(os.path.join(self.path, str(device_id)), ignore_errors=True)
+            for key in [key for key in self._open if key[0] == device_id]:
+                del self._open[key]
+
+    def hook(self, rows, table='bandwidth_history'):
+        """
+        Hook metrics writer untuk bandwidth_history: tulis sampel ke segmen
+        lokal, lalu upsert metadata segmen dalam transaksi flush.
+        """
+        segments = self.append_rows(rows, table)
+        columns = ('device_id', 'metric', 'segment_start', 'sample_count', 'first_timestamp', 'last_timestamp', 'bytes')
+
+        def apply(cursor):
+            if not segments:
+                return
+            cursor.executemany(
+                f"INSERT INTO tsdb_segments ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE sample_count=VALUES(sample_count), "
+                f"last_timestamp=VALUES(last_timestamp), bytes=VALUES(bytes)",
+                [tuple(segment[column] for column in columns) for segment in segments]
+            )
+        return apply
+
+    def wifi_hook(self, rows):
+        """Hook metrics writer untuk wifi_client_history"""
+        return self.hook(rows, 'wifi_client_history')
+
+
+tsdb = LocalTSDB() if TSDB_ENABLED else None
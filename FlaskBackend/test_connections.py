@@ -8,7 +8,6 @@ import os
 import sys
 from dotenv import load_dotenv
 import requests
-from pysnmp.hlapi import *
 
 # Load environment variables
 load_dotenv()
@@ -44,25 +43,16 @@ def test_snmp(ip="127.0.0.1"):
         community = os.getenv("SNMP_COMMUNITY", "public")
         oid = "1.3.6.1.2.1.1.1.0"  # sysDescr
         
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161), timeout=2, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
+        from service import snmp_client
         
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
+        error, varBinds = snmp_client.get(ip, community, [oid])
         
-        if errorIndication:
-            print(f"❌ SNMP failed: {errorIndication}")
-            return False
-        elif errorStatus:
-            print(f"❌ SNMP error: {errorStatus.prettyPrint()}")
+        if error:
+            print(f"❌ SNMP failed: {error}")
             return False
         else:
-            for varBind in varBinds:
-                print(f"✅ SNMP connected! System: {varBind[1]}")
+            for oid, value in varBinds:
+                print(f"✅ SNMP connected! System: {value}")
             return True
     except Exception as e:
         print(f"❌ SNMP test failed: {e}")
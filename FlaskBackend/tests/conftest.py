@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modul backend di-import seperti saat app.py dijalankan dari FlaskBackend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
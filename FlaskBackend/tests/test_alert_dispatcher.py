@@ -0,0 +1,54 @@
+import service.alert_dispatcher as alert_dispatcher
+from service.alert_dispatcher import TELEGRAM_MESSAGE_LIMIT, TokenBucket, build_digest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_burst_then_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(alert_dispatcher, 'time', clock)
+    bucket = TokenBucket(rate=0.5, burst=2)
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == 2.0
+    clock.now += 10
+    # Token tidak menumpuk melebihi burst
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 2.0]
+
+
+def test_token_bucket_pause(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(alert_dispatcher, 'time', clock)
+    bucket = TokenBucket(rate=1, burst=3)
+    bucket.pause(30)
+    assert bucket.acquire() == 31.0
+
+
+def _alert(i, category):
+    return {'id': i, 'category': category, 'summary': f"device-{i} down"}
+
+
+def test_digest_groups_by_category():
+    alerts = [_alert(1, 'Device Down'), _alert(2, 'Bandwidth'), _alert(3, 'Device Down')]
+    (message, included), = build_digest(alerts)
+    assert "(3 alerts)" in message
+    assert "<b>Device Down</b> (2)" in message
+    assert message.index("device-3") < message.index("<b>Bandwidth</b>")
+    assert [alert['id'] for alert in included] == [1, 3, 2]
+
+
+def test_digest_split_under_message_limit():
+    alerts = [_alert(i, 'Device Down') for i in range(500)]
+    parts = build_digest(alerts)
+    assert len(parts) > 1
+    assert all(len(message) <= TELEGRAM_MESSAGE_LIMIT for message, _ in parts)
+    assert [alert['id'] for _, included in parts for alert in included] == list(range(500))
+
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import service.alert_dispatcher as alert_dispatcher_module
+from service.alert_dispatcher import ALERT_MAX_ATTEMPTS, NOT_CONFIGURED, AlertDispatcher, retry_delay
+from service.metrics_writer import TABLES, MetricsWriter
+
+
+def _writer(monkeypatch, queue_size):
+    writer = MetricsWriter(queue_size=queue_size, put_timeout=30)
+    # Thread writer tidak dijalankan: antrian tidak pernah dikosongkan (database macet)
+    monkeypatch.setattr(writer, '_ensure_started', lambda: None)
+    monkeypatch.setattr(alert_dispatcher_module, 'metrics_writer', writer)
+    return writer
+
+
+def _queued_alerts(writer):
+    alerts = []
+    while not writer._queue.empty():
+        table, row = writer._queue.get_nowait()
+        assert table == 'alert_history'
+        alerts.append(dict(zip(TABLES['alert_history'], row)))
+    return alerts
+
+
+def test_enqueue_does_not_wait_for_full_queue(monkeypatch):
+    writer = _writer(monkeypatch, queue_size=1)
+    writer.write_wifi_clients(1, 5)
+    dispatcher = AlertDispatcher(token=None, chat_id=None)
+
+    # put_timeout 30 detik: jika enqueue memblokir, test ini menggantung
+    assert dispatcher.enqueue("Router down", device_id=1) is False
+    assert dispatcher.stats()['dropped'] == 1
+    assert writer.stats()['dropped'] == 1
+
+
+def test_unconfigured_alerts_are_not_left_pending(monkeypatch):
+    writer = _writer(monkeypatch, queue_size=10)
+    dispatcher = AlertDispatcher(token=None, chat_id=None)
+    assert dispatcher.enqueue("Router down", summary="Router down", device_id=1)
+
+    alert, = _queued_alerts(writer)
+    assert alert['device_id'] == 1
+    assert alert['attempts'] == ALERT_MAX_ATTEMPTS
+    assert alert['last_error'] == NOT_CONFIGURED
+
+
+def test_configured_alerts_enter_outbox_as_pending(monkeypatch):
+    writer = _writer(monkeypatch, queue_size=10)
+    # Worker tidak dijalankan, hanya jalur enqueue yang diuji
+    monkeypatch.setattr(alert_dispatcher_module.threading.Thread, 'start', lambda self: None)
+    dispatcher = AlertDispatcher(token='token', chat_id='chat')
+    assert dispatcher.enqueue("Router down")
+
+    alert, = _queued_alerts(writer)
+    assert (alert['attempts'], alert['last_error']) == (0, None)
+
+
+def test_retry_delay_backoff():
+    assert retry_delay(1) == alert_dispatcher_module.ALERT_RETRY_BASE
+    assert retry_delay(2) == alert_dispatcher_module.ALERT_RETRY_BASE * 2
+    assert retry_delay(100) == alert_dispatcher_module.ALERT_RETRY_MAX
+
+
+def _configured_dispatcher(monkeypatch):
+    monkeypatch.setattr(alert_dispatcher_module.threading.Thread, 'start', lambda self: None)
+    return AlertDispatcher(token='token', chat_id='chat')
+
+
+def _unstored_row(message, attempts=0):
+    return (1, 'device_down', 'critical', message, None, None, None, attempts, None, datetime.now())
+
+
+def test_unstored_alerts_are_sent_without_database(monkeypatch):
+    dispatcher = _configured_dispatcher(monkeypatch)
+    sent = []
+    monkeypatch.setattr(dispatcher, '_post', lambda message: sent.append(message) or (True, None, None))
+
+    def no_database():
+        raise AssertionError("alert tanpa outbox tidak boleh menyentuh database")
+
+    monkeypatch.setattr(alert_dispatcher_module, 'get_db_connection', no_database)
+    monkeypatch.setattr(dispatcher, '_claim', lambda: [])
+
+    dispatcher.fallback([_unstored_row("Router down")])
+    assert dispatcher.deliver_pending() == 1
+    assert sent == ["Router down"]
+    assert (dispatcher.stats()['sent'], dispatcher.stats()['dropped']) == (1, 0)
+
+
+def test_unstored_alerts_that_cannot_be_sent_count_as_dropped(monkeypatch):
+    dispatcher = _configured_dispatcher(monkeypatch)
+    monkeypatch.setattr(dispatcher, '_post', lambda message: (False, "HTTP 502", None))
+    monkeypatch.setattr(dispatcher, '_claim', lambda: [])
+
+    dispatcher.fallback([_unstored_row("Router down", attempts=ALERT_MAX_ATTEMPTS - 1)])
+    dispatcher.deliver_pending()
+    assert dispatcher.stats()['dropped'] == 1
+
+    unconfigured = AlertDispatcher(token=None, chat_id=None)
+    unconfigured.fallback([_unstored_row("Router down")])
+    assert unconfigured.stats()['dropped'] == 1
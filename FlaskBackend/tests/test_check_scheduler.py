@@ -0,0 +1,137 @@
+import pytest
+
+import service.check_scheduler as check_scheduler
+from service.check_scheduler import CHECK_MIN_INTERVAL, CHECK_REFRESH_INTERVAL, CHECK_TICK, DeviceCheckScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(check_scheduler, 'time', clock)
+    # Snapshot dashboard tidak relevan di sini
+    monkeypatch.setattr(check_scheduler.dashboard_snapshot, 'sync_devices', lambda devices: None)
+    return clock
+
+
+def _device(device_id, check_interval=None, ping_timeout=None):
+    return {
+        'id': device_id,
+        'name': f"router-{device_id}",
+        'ip_address': f"10.0.0.{device_id}",
+        'status': 'up',
+        'check_interval': check_interval,
+        'ping_timeout': ping_timeout
+    }
+
+
+def _scheduler(devices):
+    scheduler = DeviceCheckScheduler()
+    scheduler._load = lambda: [dict(device) for device in devices]
+    return scheduler
+
+
+def _run(scheduler, clock, seconds, fail=lambda tick: False):
+    """Jalankan tick CHECK_TICK selama `seconds`, return jumlah check per device"""
+    counts = {}
+    for _ in range(int(seconds / CHECK_TICK)):
+        due = scheduler.due()
+        for device in due:
+            counts[device['id']] = counts.get(device['id'], 0) + 1
+        if not fail(clock.now):
+            scheduler.reschedule(due, {device['ip_address']: 0.01 for device in due})
+        clock.now += CHECK_TICK
+    return counts
+
+
+def test_each_device_follows_its_interval(clock):
+    devices = [_device(1, check_interval=30, ping_timeout=1), _device(2), _device(3, check_interval=300)]
+    scheduler = _scheduler(devices)
+
+    counts = _run(scheduler, clock, 600)
+
+    assert counts[1] in (19, 20, 21)
+    assert counts[2] in (9, 10, 11)
+    assert counts[3] in (1, 2, 3)
+
+
+def test_due_devices_carry_ping_timeout(clock):
+    scheduler = _scheduler([_device(1, ping_timeout=1), _device(2)])
+    scheduler.refresh()
+    clock.now += check_scheduler.DEFAULT_CHECK_INTERVAL
+
+    due = {device['id']: device for device in scheduler.due()}
+    assert due[1]['ping_timeout'] == 1.0
+    assert due[2]['ping_timeout'] == check_scheduler.DEFAULT_PING_TIMEOUT
+    assert due[2]['check_interval'] == check_scheduler.DEFAULT_CHECK_INTERVAL
+
+
+def test_interval_is_clamped_and_phase_spread(clock):
+    devices = [_device(i, check_interval=1) for i in range(1, 201)]
+    scheduler = _scheduler(devices)
+    scheduler.refresh()
+
+    dues = sorted(entry['due'] - clock.now for entry in scheduler._devices.values())
+    assert all(entry['interval'] == CHECK_MIN_INTERVAL for entry in scheduler._devices.values())
+    # Fase acak: device tidak jatuh tempo bersamaan
+    assert dues[0] < CHECK_MIN_INTERVAL / 4 and dues[-1] > CHECK_MIN_INTERVAL * 3 / 4
+
+
+def test_unchecked_devices_retry_next_tick(clock, monkeypatch):
+    # Fase di tengah interval: device yang sudah dicek tidak jatuh tempo lagi di tick berikutnya
+    monkeypatch.setattr(check_scheduler.random, 'uniform', lambda low, high: (low + high) / 2)
+    scheduler = _scheduler([_device(1), _device(2)])
+    scheduler.refresh()
+    clock.now += 60
+    due = scheduler.due()
+    assert len(due) == 2
+
+    # Hanya device 1 yang selesai sebelum deadline (urutan due() acak karena fase acak)
+    device = next(device for device in due if device['id'] == 1)
+    scheduler.reschedule(due, {device['ip_address']: 0.01}, [(device, 'down')])
+    clock.now += CHECK_TICK
+    retried = scheduler.due()
+    assert [device['id'] for device in retried] == [2]
+    assert scheduler._devices[1]['device']['status'] == 'down'
+
+
+def test_failed_cycle_does_not_lose_devices(clock):
+    devices = [_device(i) for i in range(1, 6)]
+    scheduler = _scheduler(devices)
+    scheduler.refresh()
+    clock.now += 60
+
+    # Siklus gagal (mis. database mati) setelah due(), reschedule() tidak pernah dipanggil
+    assert len(scheduler.due()) == 5
+    assert scheduler.due() == []
+
+    clock.now += CHECK_REFRESH_INTERVAL
+    assert sorted(device['id'] for device in scheduler.due()) == [1, 2, 3, 4, 5]
+    assert scheduler.stats()['recovered'] == 5
+
+    # Setelah pulih, jadwal kembali normal
+    counts = _run(scheduler, clock, 600)
+    assert all(count in (9, 10, 11) for count in counts.values())
+
+
+def test_interval_change_and_deleted_device(clock):
+    devices = [_device(1), _device(2)]
+    scheduler = _scheduler(devices)
+    scheduler.refresh()
+
+    devices[0]['check_interval'] = 120
+    del devices[1]
+    scheduler.refresh()
+
+    # Entry lama device 1 dan entry device 2 dibuang saat keluar dari heap
+    counts = _run(scheduler, clock, 600)
+    assert counts == {1: counts[1]}
+    assert counts[1] in (4, 5, 6)
+    assert scheduler.stats()['intervals'] == {'120s': 1}
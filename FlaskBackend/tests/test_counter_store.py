@@ -0,0 +1,47 @@
+from service.counter_store import COUNTER_MAX_AGE, CounterStore
+
+
+def test_first_sample_is_baseline():
+    store = CounterStore()
+    assert store.update('k', 100, 200, uptime=10, timestamp=0) is None
+
+
+def test_rate_from_consecutive_samples():
+    store = CounterStore()
+    store.update('k', 1000, 5000, uptime=10, timestamp=100)
+    assert store.update('k', 3000, 5500, uptime=20, timestamp=110) == (200.0, 50.0, 10)
+
+
+def test_32bit_counter_wrap():
+    store = CounterStore()
+    store.update('k', 2 ** 32 - 100, 0, uptime=10, timestamp=0)
+    in_rate, out_rate, _ = store.update('k', 400, 0, uptime=20, timestamp=10)
+    assert in_rate == 50.0
+    assert out_rate == 0.0
+
+
+def test_64bit_counter_wrap():
+    store = CounterStore()
+    store.update('k', 2 ** 64 - 10, 0, bits=64, timestamp=0)
+    assert store.update('k', 10, 0, bits=64, timestamp=2)[0] == 10.0
+
+
+def test_reboot_resets_baseline():
+    store = CounterStore()
+    store.update('k', 1_000_000, 1_000_000, uptime=5000, timestamp=0)
+    # sysUpTime mundur: counter mulai dari nol, bukan wrap
+    assert store.update('k', 500, 500, uptime=30, timestamp=10) is None
+    assert store.update('k', 1500, 700, uptime=40, timestamp=20) == (100.0, 20.0, 10)
+
+
+def test_stale_sample_and_counter_width_change():
+    store = CounterStore()
+    store.update('k', 0, 0, timestamp=0)
+    assert store.update('k', 10, 10, timestamp=COUNTER_MAX_AGE + 1) is None
+    assert store.update('k', 20, 20, bits=64, timestamp=COUNTER_MAX_AGE + 2) is None
+
+
+def test_keys_are_independent():
+    store = CounterStore()
+    store.update((1, 1), 0, 0, timestamp=0)
+    assert store.update((1, 2), 100, 100, timestamp=1) is None
@@ -0,0 +1,80 @@
+from datetime import datetime
+import json
+
+import service.dashboard_snapshot as dashboard_snapshot_module
+from service.dashboard_snapshot import RECENT_ALERTS_QUERY, DashboardSnapshot
+
+ALERT = {
+    'id': 41,
+    'device_id': 3,
+    'alert_type': 'device_down',
+    'severity': 'critical',
+    'message': 'Router 3 down',
+    'summary': 'Router 3 down',
+    'category': 'Device Down',
+    'alert_data': '{"ip": "10.0.0.3"}',
+    'is_sent': 1,
+    'sent_at': datetime(2026, 10, 18, 10, 0, 5),
+    'attempts': 1,
+    'next_attempt_at': None,
+    'last_error': None,
+    'created_at': datetime(2026, 10, 18, 10, 0, 0)
+}
+
+
+class FakeCursor:
+    """Cursor palsu: hanya alert_history yang berisi data"""
+
+    def __init__(self, dictionary=False):
+        self.dictionary = dictionary
+        self.rows = []
+        self.column_names = tuple(ALERT)
+
+    def execute(self, query, params=()):
+        self.rows = [dict(ALERT)] if query == RECENT_ALERTS_QUERY else []
+
+    def fetchall(self):
+        if self.dictionary:
+            return self.rows
+        return [tuple(row.values()) for row in self.rows]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self, dictionary=False):
+        return FakeCursor(dictionary)
+
+    def close(self):
+        pass
+
+
+def _recent_alerts(snapshot):
+    body, _ = snapshot.get()
+    return json.loads(body)['summary']['recent_alerts']
+
+
+def test_hook_alerts_have_seeded_shape(monkeypatch):
+    monkeypatch.setattr(dashboard_snapshot_module, 'get_db_connection', FakeConnection)
+
+    seeded = DashboardSnapshot()
+    seeded.seed()
+
+    hooked = DashboardSnapshot()
+    hooked.alert_hook([(3, 'device_down', 'critical', 'Router 3 down', None, None, '{}', datetime.now())])(
+        FakeCursor()
+    )
+
+    assert _recent_alerts(seeded) == _recent_alerts(hooked)
+    alert, = _recent_alerts(hooked)
+    assert alert['id'] == 41
+    assert alert['alert_data'] == {'ip': '10.0.0.3'}
+
+
+def test_seed_keeps_alerts_reloaded_by_hook(monkeypatch):
+    monkeypatch.setattr(dashboard_snapshot_module, 'get_db_connection', FakeConnection)
+    snapshot = DashboardSnapshot()
+    snapshot.set_alerts([dict(ALERT, id=42)])
+    snapshot.seed()
+    assert [alert['id'] for alert in _recent_alerts(snapshot)] == [42]
@@ -0,0 +1,23 @@
+import pytest
+
+import service.discovery_service as discovery_service
+from service.discovery_service import SCAN_RATE_PPS, ScanRejected, _scan_rate
+
+
+def test_scan_rate_default_and_clamp():
+    assert _scan_rate(None) == SCAN_RATE_PPS
+    assert _scan_rate("50") == 50.0
+    assert _scan_rate(SCAN_RATE_PPS * 100) == SCAN_RATE_PPS
+
+
+@pytest.mark.parametrize('rate', ["fast", 0, -10, float('inf'), float('nan'), [1]])
+def test_scan_rate_rejects_invalid(rate):
+    with pytest.raises(ScanRejected):
+        _scan_rate(rate)
+
+
+def test_start_scan_rejects_rate_before_starting_job(monkeypatch):
+    monkeypatch.setattr(discovery_service, '_jobs', discovery_service.OrderedDict())
+    with pytest.raises(ScanRejected):
+        discovery_service.start_scan('10.0.0.0/30', rate="fast")
+    assert not discovery_service._jobs
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from service.downsample import downsample, lttb, minmax
+
+
+def _rows(values):
+    start = datetime(2026, 10, 18)
+    return [{'timestamp': start + timedelta(minutes=i), 'total_mbps': value} for i, value in enumerate(values)]
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    values = [1.0] * 1000
+    values[500] = 90.0
+    rows = _rows(values)
+    sampled = lttb(rows, 50)
+    assert len(sampled) == 50
+    assert sampled[0] is rows[0] and sampled[-1] is rows[-1]
+    assert rows[500] in sampled
+
+
+def test_minmax_keeps_extremes_in_order():
+    values = [float(i % 10) for i in range(1000)]
+    values[123], values[777] = -5.0, 50.0
+    sampled = minmax(_rows(values), 100)
+    assert len(sampled) <= 100
+    assert [row['total_mbps'] for row in sampled if row['total_mbps'] in (-5.0, 50.0)] == [-5.0, 50.0]
+    timestamps = [row['timestamp'] for row in sampled]
+    assert timestamps == sorted(timestamps)
+
+
+def test_downsample_preserves_newest_first_order():
+    rows = _rows(list(range(300)))[::-1]
+    sampled = downsample(rows, 30)
+    assert len(sampled) == 30
+    assert sampled[0] is rows[0] and sampled[-1] is rows[-1]
+
+
+def test_downsample_avg_and_small_input():
+    rows = _rows([1.0, 3.0] * 50)
+    sampled = downsample(rows, 10, agg='avg')
+    assert len(sampled) == 10
+    assert all(row['total_mbps'] == 2.0 and row['samples'] == 10 for row in sampled)
+    assert downsample(rows[:5], 10) == rows[:5]
@@ -0,0 +1,39 @@
+import struct
+
+from service.icmp_prober import (
+    ICMP_ECHO_REPLY,
+    ICMP_ECHO_REQUEST,
+    _build_echo,
+    _checksum,
+    _parse_reply
+)
+
+
+def test_echo_checksum_verifies():
+    packet = _build_echo(0x1234, 7)
+    assert packet[0] == ICMP_ECHO_REQUEST
+    # Checksum paket lengkap (termasuk field checksum) harus 0
+    assert _checksum(packet) == 0
+    assert struct.unpack('!HH', packet[4:8]) == (0x1234, 7)
+
+
+def test_checksum_odd_length():
+    assert _checksum(b'\x01') == _checksum(b'\x01\x00')
+
+
+def _reply(identifier, sequence, icmp_type=ICMP_ECHO_REPLY):
+    return struct.pack('!BBHHH', icmp_type, 0, 0, identifier, sequence) + b'nms-probe'
+
+
+def test_parse_datagram_reply():
+    assert _parse_reply(_reply(42, 9), is_raw=False) == (42, 9)
+
+
+def test_parse_raw_reply_skips_ip_header():
+    ip_header = bytes([0x45]) + bytes(19)
+    assert _parse_reply(ip_header + _reply(42, 9), is_raw=True) == (42, 9)
+
+
+def test_parse_ignores_other_packets():
+    assert _parse_reply(_reply(42, 9, icmp_type=ICMP_ECHO_REQUEST), is_raw=False) is None
+    assert _parse_reply(b'\x00\x00', is_raw=False) is None
@@ -0,0 +1,163 @@
+from datetime import datetime
+
+from mysql.connector.errors import IntegrityError, OperationalError
+import pytest
+
+import service.metrics_writer as metrics_writer_module
+from service.metrics_writer import MetricsWriter
+
+NOW = datetime(2026, 10, 18, 10, 0, 0)
+
+
+class FakeDatabase:
+    """
+    Koneksi palsu: baris wifi dengan device_id 999 melanggar foreign key,
+    dan tabel di `broken` selalu gagal seperti database yang tidak tersedia.
+    """
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.committed = []
+        self.events = []
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.pending = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.db.committed.extend(self.pending)
+        self.db.events.append('commit')
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def executemany(self, query, values):
+        table = query.split()[2]
+        if table in self.conn.db.broken:
+            raise OperationalError("Lost connection")
+        if any(row[0] == 999 for row in values):
+            raise IntegrityError("foreign key constraint fails")
+        self.conn.pending.extend((table, row) for row in values)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    def factory(broken=()):
+        db = FakeDatabase(broken)
+        monkeypatch.setattr(metrics_writer_module, 'get_db_connection', db.connect)
+        monkeypatch.setattr(metrics_writer_module.time, 'sleep', lambda seconds: None)
+        return MetricsWriter(), db
+    return factory
+
+
+def _bandwidth(device_id):
+    return ('bandwidth_history', (device_id, 2, 1, 1, 1.0, 1.0, 2.0, NOW))
+
+
+def _wifi(device_id, count):
+    return ('wifi_client_history', (device_id, count, NOW))
+
+
+def test_bad_row_only_drops_itself(writer):
+    writer, db = writer()
+    seen = []
+    writer.add_hook('wifi_client_history', lambda rows: seen.extend(rows))
+
+    writer._flush([_wifi(1, 5), _wifi(999, 3), _wifi(2, 7), _bandwidth(1)])
+
+    assert db.committed == [
+        ('wifi_client_history', (1, 5, NOW)),
+        ('wifi_client_history', (2, 7, NOW)),
+        _bandwidth(1)
+    ]
+    assert seen == [(1, 5, NOW), (2, 7, NOW)]
+    assert writer.stats()['written'] == 3
+    assert writer.stats()['dropped'] == 1
+
+
+def test_failing_table_does_not_discard_others(writer):
+    writer, db = writer(broken={'bandwidth_history'})
+    bandwidth_hook, wifi_hook = [], []
+    writer.add_hook('bandwidth_history', lambda rows: bandwidth_hook.extend(rows))
+    writer.add_hook('wifi_client_history', lambda rows: wifi_hook.extend(rows))
+
+    writer._flush([_bandwidth(1), _wifi(1, 5)])
+
+    assert db.committed == [('wifi_client_history', (1, 5, NOW))]
+    # Sampel yang tidak tersimpan tidak boleh sampai ke rollup/snapshot/stream
+    assert bandwidth_hook == []
+    assert wifi_hook == [(1, 5, NOW)]
+    stats = writer.stats()
+    assert (stats['written'], stats['dropped'], stats['failed_batches']) == (1, 1, 1)
+
+
+def test_hooks_run_after_commit(writer):
+    writer, db = writer()
+
+    def hook(rows):
+        db.events.append('hook')
+        return lambda cursor: db.events.append('apply')
+
+    writer.add_hook('bandwidth_history', hook)
+    writer._flush([_bandwidth(1)])
+    assert db.events == ['commit', 'hook', 'apply', 'commit']
+
+
+def test_replace_insert_hook_runs_inside_table_transaction(writer):
+    writer, db = writer()
+
+    def replace_hook(rows):
+        db.events.append('replace')
+        return lambda cursor: db.events.append('segments')
+
+    writer.add_hook('bandwidth_history', replace_hook, replace_insert=True)
+    writer._flush([_bandwidth(1)])
+    assert db.events == ['replace', 'segments', 'commit']
+    assert db.committed == []
+
+
+def _alert(device_id):
+    return ('alert_history', (device_id, 'device_down', 'critical', 'down', None, None, None, 0, None, NOW))
+
+
+def test_failed_alert_rows_are_requeued_not_dropped(writer):
+    writer, db = writer(broken={'alert_history'})
+    handed_over = []
+    writer.add_fallback('alert_history', handed_over.extend)
+
+    writer._flush([_alert(1), _alert(2)])
+
+    assert [writer._queue.get_nowait() for _ in range(2)] == [_alert(1), _alert(2)]
+    assert handed_over == []
+    stats = writer.stats()
+    assert (stats['requeued'], stats['dropped']) == (2, 0)
+
+
+def test_alert_rows_that_do_not_fit_go_to_fallback(writer):
+    writer, db = writer(broken={'alert_history'})
+    writer._queue.maxsize = 1
+    handed_over = []
+    writer.add_fallback('alert_history', handed_over.extend)
+
+    writer._flush([_alert(1), _alert(2)])
+
+    assert writer._queue.get_nowait() == _alert(1)
+    assert handed_over == [_alert(2)[1]]
+    assert writer.stats()['dropped'] == 0
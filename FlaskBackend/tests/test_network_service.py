@@ -0,0 +1,27 @@
+import service.network_service as network_service
+
+
+def _never_detect(*args):
+    raise AssertionError("deteksi tidak boleh dijalankan ulang")
+
+
+def test_hc_detection_without_device_id_is_kept_per_interface(monkeypatch):
+    detected = []
+
+    def detect(ip, community, interface_index):
+        detected.append(interface_index)
+        return interface_index == 1
+
+    monkeypatch.setattr(network_service, 'detect_hc_counters', detect)
+    monkeypatch.setattr(network_service, '_hc_support', {})
+
+    assert network_service.resolve_hc_counters({'ip_address': '10.0.0.1', 'interface_index': 1}) is True
+    assert network_service.resolve_hc_counters({'ip_address': '10.0.0.1', 'interface_index': 2}) is False
+    assert network_service.resolve_hc_counters({'ip_address': '10.0.0.1', 'interface_index': 1}) is True
+    assert detected == [1, 2]
+
+
+def test_saved_flag_is_used_for_the_device_interface(monkeypatch):
+    monkeypatch.setattr(network_service, 'detect_hc_counters', _never_detect)
+    device = {'id': 3, 'ip_address': '10.0.0.3', 'interface_index': 2, 'hc_counters': 1}
+    assert network_service.resolve_hc_counters(device) is True
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import service.network_service as network_service
+import service.poll_cache as poll_cache_module
+from service.poll_cache import PollCache
+
+DESCR = '1.3.6.1.2.1.2.2.1.2'
+STATUS = '1.3.6.1.2.1.2.2.1.8'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_failed_interface_walk_uses_error_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(poll_cache_module, 'time', clock)
+    responses = [
+        ("No SNMP response received before timeout", {DESCR: {}, STATUS: {}}),
+        (None, {DESCR: {'1': 'ether1'}, STATUS: {'1': 1}})
+    ]
+    monkeypatch.setattr(network_service.snmp_client, 'walk_table', lambda *args, **kwargs: responses.pop(0))
+
+    cache = PollCache(ttl={'interfaces': 600}, error_ttl=10)
+    fetch = lambda: network_service.get_interface_info('10.0.0.1')
+
+    assert cache.get((1, 'interfaces'), fetch) == (None, 0.0)
+    clock.now = 11
+    interfaces, _ = cache.get((1, 'interfaces'), fetch)
+    assert interfaces == [{'index': 1, 'description': 'ether1', 'status': 'up'}]
+    clock.now = 300
+    assert cache.get((1, 'interfaces'), fetch)[1] == 289.0
+    assert cache.stats()['fetch_errors'] == 1
+
+
+def test_single_flight_shares_one_fetch():
+    cache = PollCache(ttl={'bandwidth': 60})
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'in_mbps': 1.0}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get((1, 'bandwidth', 1), fetch)[0]))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{'in_mbps': 1.0}] * 5
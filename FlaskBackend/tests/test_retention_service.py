@@ -0,0 +1,13 @@
+from datetime import date
+
+from service.retention_service import _from_days, _partition_name, _to_days
+
+
+def test_partition_name():
+    assert _partition_name(date(2026, 1, 5)) == 'p20260105'
+
+
+def test_to_days_matches_mysql():
+    # SELECT TO_DAYS('2026-10-18') = 740272
+    assert _to_days(date(2026, 10, 18)) == 740272
+    assert _from_days(740272) == date(2026, 10, 18)
@@ -0,0 +1,69 @@
+import asyncio
+
+from pysnmp.proto.rfc1902 import Integer32, ObjectName
+from pysnmp.proto.rfc1905 import NoSuchObject
+
+import service.snmp_client as snmp_client
+
+IF_DESCR = '1.3.6.1.2.1.2.2.1.2'
+
+
+def make_client(monkeypatch, responses):
+    client = snmp_client.SnmpClient()
+    client._engine = object()
+    v1_walks = []
+
+    async def target(ip, **options):
+        return object()
+
+    async def bulk_cmd(*args, **kwargs):
+        return responses.pop(0)
+
+    async def walk_async(ip, community, oid, mp_model=0, max_rows=None, **options):
+        v1_walks.append(oid)
+        return None, [(oid + '.1', 'eth0')]
+
+    monkeypatch.setattr(client, 'target', target)
+    monkeypatch.setattr(client, 'walk_async', walk_async)
+    monkeypatch.setattr(snmp_client, 'bulk_cmd', bulk_cmd)
+    return client, v1_walks
+
+
+def walk(client):
+    return asyncio.run(client.walk_table_async('10.0.0.1', 'public', [IF_DESCR]))
+
+
+def test_timeout_does_not_fall_back_to_v1(monkeypatch):
+    client, v1_walks = make_client(monkeypatch, [('No SNMP response received before timeout', 0, 0, [])])
+
+    error, table = walk(client)
+
+    assert error == 'No SNMP response received before timeout'
+    assert table == {IF_DESCR: {}}
+    assert v1_walks == []
+    assert client.stats()['v1_only_agents'] == 0
+
+
+def test_no_such_object_bulk_falls_back_and_is_remembered(monkeypatch):
+    name = ObjectName(IF_DESCR + '.1')
+    client, v1_walks = make_client(monkeypatch, [(None, 0, 0, [(name, NoSuchObject())])])
+
+    assert walk(client) == (None, {IF_DESCR: {'1': 'eth0'}})
+    # Walk berikutnya langsung SNMPv1 tanpa GETBULK lagi
+    assert walk(client) == (None, {IF_DESCR: {'1': 'eth0'}})
+    assert v1_walks == [IF_DESCR, IF_DESCR]
+    assert client.stats()['v1_only_agents'] == 1
+
+
+def test_bulk_rows_are_read_without_fallback(monkeypatch):
+    responses = [
+        (None, 0, 0, [(ObjectName(IF_DESCR + '.1'), Integer32(7))]),
+        (None, 0, 0, [(ObjectName('1.3.6.1.2.1.2.2.1.3.1'), Integer32(6))])
+    ]
+    client, v1_walks = make_client(monkeypatch, responses)
+
+    error, table = walk(client)
+
+    assert error is None
+    assert table == {IF_DESCR: {'1': 7}}
+    assert v1_walks == []
@@ -0,0 +1,29 @@
+import service.sweep_service as sweep_service
+
+
+def test_sweep_omits_hosts_cut_off_by_deadline(monkeypatch):
+    calls = {}
+
+    def fake_probe(targets, timeout, max_in_flight, deadline, timeouts):
+        calls.update(targets=targets, deadline=deadline, timeouts=timeouts)
+        # Host kedua tidak selesai sebelum deadline
+        return {targets[0]: {'rtt': 0.01}, targets[2]: {'rtt': None}}
+
+    monkeypatch.setattr(sweep_service, 'probe', fake_probe)
+    results = sweep_service.sweep(['10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.3'], deadline=3,
+                                  timeouts={'10.0.0.3': 1})
+
+    assert calls['targets'] == ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+    assert calls['deadline'] == 3
+    assert calls['timeouts'] == {'10.0.0.3': 1}
+    assert results == {'10.0.0.1': 0.01, '10.0.0.3': None}
+
+
+def test_sweep_default_deadline_and_socket_error(monkeypatch):
+    def failing_probe(targets, **kwargs):
+        assert kwargs['deadline'] == sweep_service.PING_SWEEP_DEADLINE
+        raise PermissionError("raw socket")
+
+    monkeypatch.setattr(sweep_service, 'probe', failing_probe)
+    assert sweep_service.sweep(['10.0.0.1']) == {}
+    assert sweep_service.sweep([]) == {}
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import random
+
+from service.tsdb import METRICS, BitReader, BitWriter, LocalTSDB, SeriesState, _decode, _encode
+
+
+def _round_trip(samples):
+    writer, state = BitWriter(), SeriesState()
+    for ts, value in samples:
+        _encode(writer, state, ts, value)
+    bit_length = len(writer.out) * 8 + writer.partial_bits
+    reader = BitReader(bytes(writer.out + writer.tail()), bit_length)
+    return list(_decode(reader, len(samples))), reader.pos, bit_length
+
+
+def test_codec_round_trip_regular_interval():
+    start = 1_700_000_000_000
+    samples = [(start + i * 300_000, 12.5 + (i % 3) * 0.25) for i in range(200)]
+    decoded, pos, bit_length = _round_trip(samples)
+    assert decoded == samples
+    assert pos == bit_length
+    # Interval dan nilai berulang harus jauh lebih kecil dari 16 byte per sampel
+    assert bit_length / 8 < len(samples) * 4
+
+
+def test_codec_round_trip_irregular_values():
+    rng = random.Random(7)
+    ts = 1_700_000_000_000
+    samples = []
+    for _ in range(500):
+        ts += rng.choice([1, 999, 60_000, 5_000_000, 2 ** 40])
+        samples.append((ts, rng.choice([0.0, -3.5, 1e-9, 123456.789, rng.random() * 1e6])))
+    decoded, _, _ = _round_trip(samples)
+    assert decoded == samples
+
+
+def test_append_continues_partial_byte(tmp_path):
+    db = LocalTSDB(path=str(tmp_path), segment_hours=24)
+    start = datetime(2026, 10, 18, 10, 0, 0)
+
+    def row(minute, value):
+        return (1, 1, value, value * 2, value / 10, value / 20, value / 5, start + timedelta(minutes=minute))
+
+    db.append_rows([row(0, 100.0), row(1, 150.0)])
+    # Instance baru: state encoder dibangun ulang dari file
+    db = LocalTSDB(path=str(tmp_path), segment_hours=24)
+    db.append_rows([row(2, 125.0)])
+    db.append_rows([row(3, 90.0), row(1, 999.0)])   # sampel lebih tua dari yang terakhir dibuang
+
+    rows = db.read_rows(1, start)
+    assert [row['timestamp'] for row in rows] == [start + timedelta(minutes=m) for m in (3, 2, 1, 0)]
+    assert [row['in_bytes_per_sec'] for row in rows] == [90.0, 125.0, 150.0, 100.0]
+    assert set(METRICS) <= set(rows[0])
+
+    assert db.drop_before(start + timedelta(days=2)) == len(METRICS)
+    assert db.read_rows(1, start) == []
+
+
+def test_out_of_order_sample_after_reopen_is_dropped(tmp_path):
+    start = datetime(2026, 10, 18, 10, 0, 0)
+    row = lambda minute, count: (7, count, start + timedelta(minutes=minute))
+    LocalTSDB(path=str(tmp_path)).append_rows([row(5, 10)], table='wifi_client_history')
+
+    # Proses baru belum punya state segmen di memori
+    db = LocalTSDB(path=str(tmp_path))
+    assert db.append_rows([row(1, 99)], table='wifi_client_history') == []
+    db.append_rows([row(6, 12)], table='wifi_client_history')
+
+    assert db.read_rows(7, start, table='wifi_client_history') == [
+        {'device_id': 7, 'timestamp': start + timedelta(minutes=6), 'client_count': 12},
+        {'device_id': 7, 'timestamp': start + timedelta(minutes=5), 'client_count': 10}
+    ]
+
+
+def test_wifi_and_bandwidth_series_are_separate(tmp_path):
+    db = LocalTSDB(path=str(tmp_path))
+    at = datetime(2026, 10, 18, 10, 0, 0)
+    db.hook([(1, 2, 100, 200, 0.1, 0.2, 0.3, at)])
+    db.wifi_hook([(1, 15, at), (2, 4, at)])
+
+    assert db.read_rows(1, at)[0]['total_mbps'] == 0.3
+    assert 'client_count' not in db.read_rows(1, at)[0]
+    assert [(row['device_id'], row['client_count']) for row in db.read_table('wifi_client_history', at)] == [
+        (1, 15), (2, 4)
+    ]
+    assert db.drop_before(at + timedelta(days=2)) == len(METRICS) + 2